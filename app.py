@@ -10,6 +10,9 @@ from components.settings import render_settings
 from quantiq.logo_manager import render_logo
 from quantiq.download_manager import download_file
 from quantiq import prompt_utils as pu
+from quantiq.zip_manager import warm_up_nlp
+from quantiq.config import ANALYSIS_CONCURRENCY
+from quantiq.jobs import start_local_workers
 from quantiq.logging_setup import set_logging
 
 # Set logging
@@ -65,10 +68,23 @@ defaults = {
     "current_logo": "quantiq_logo_75x75.jpg",
     "logo_clicked": None,
     "analysis_mode": "Standard",
+    "send_full_text": False,
+    "analysis_concurrency": ANALYSIS_CONCURRENCY,
+    "bypass_response_cache": False,
+    "batch_mode": False,
+    "recompute_all": False,
+    "monte_carlo": False,
+    "job_id": None,
 }
 
 initialize_session_state(defaults)
 
+# Load the NER model in the background so ZIP uploads do not wait for it
+warm_up_nlp()
+
+# Start the worker processes that run queued analyses
+start_local_workers()
+
 # Handle query parameters if needed
 if "logo_clicked" not in st.query_params:
     st.query_params["logo_clicked"] = None
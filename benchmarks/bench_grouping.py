@@ -0,0 +1,117 @@
+# benchmarks/bench_grouping.py
+"""
+Benchmarks the file-to-company grouping used for flat ZIP uploads.
+
+Generates synthetic filename sets (company name variants plus document type
+and year) and times name extraction and grouping for each size. Run from the
+repository root:
+
+    python benchmarks/bench_grouping.py
+    python benchmarks/bench_grouping.py --sizes 100 1000 --baseline --spacy
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import fuzz
+from quantiq.zip_manager import extract_company_names, get_nlp, group_company_names
+
+SYLLABLES = [
+    "ac", "me", "ze", "ta", "no", "va", "lu", "mi", "ra", "tek", "pro", "sol", "gen", "tri", "ox", "an",
+    "bel", "cor", "dyn", "fal", "gro", "hel", "ion", "jup", "kin", "lex", "mar", "nex", "orb", "pax",
+    "qua", "rox", "syn", "tor", "umb", "vex", "wil", "xen", "yor", "zul",
+]
+SUFFIXES = ["Inc", "Ltd", "LLC", "Corp", "Group", "Holdings", ""]
+DOC_TYPES = ["Annual Report", "10-K", "Balance Sheet", "Income Statement", "Cash Flow", "Q3 Results"]
+
+
+def synthetic_filenames(count, files_per_company=5, seed=0):
+    """
+    Returns ``count`` synthetic filenames and the true company of each.
+    """
+    rng = random.Random(seed)
+    companies = []
+    while len(companies) < max(1, count // files_per_company):
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4))).capitalize()
+        if name not in companies:
+            companies.append(name)
+
+    filenames, labels = [], []
+    for i in range(count):
+        company = companies[i % len(companies)]
+        variant = f"{company} {rng.choice(SUFFIXES)}".strip()
+        if rng.random() < 0.2:
+            variant = variant.upper()
+        filenames.append(f"{variant} {rng.choice(DOC_TYPES)} {rng.randint(2018, 2024)}.pdf")
+        labels.append(company)
+    return filenames, labels
+
+
+def greedy_baseline(company_names, similarity_threshold=80):
+    """
+    The original O(n^2) greedy clustering, kept for comparison.
+    """
+    clusters = []
+    clustered = [False] * len(company_names)
+    for i, name_i in enumerate(company_names):
+        if clustered[i]:
+            continue
+        cluster = [i]
+        clustered[i] = True
+        for j in range(i + 1, len(company_names)):
+            if not clustered[j] and fuzz.token_set_ratio(name_i, company_names[j]) >= similarity_threshold:
+                cluster.append(j)
+                clustered[j] = True
+        clusters.append(cluster)
+    return clusters
+
+
+def purity(clusters, labels):
+    """
+    Share of files whose cluster's majority company is their own company.
+    """
+    correct = 0
+    for cluster in clusters:
+        cluster_labels = [labels[i] for i in cluster]
+        correct += max(cluster_labels.count(label) for label in set(cluster_labels))
+    return correct / len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--spacy", action="store_true", help="Extract names with spaCy NER (requires en_core_web_sm)")
+    parser.add_argument("--baseline", action="store_true", help="Also time the original greedy clustering")
+    args = parser.parse_args()
+
+    nlp = get_nlp() if args.spacy else None
+
+    print(f"{'files':>7} {'extract_s':>10} {'group_s':>9} {'clusters':>9} {'purity':>7} {'baseline_s':>11}")
+    for size in args.sizes:
+        filenames, labels = synthetic_filenames(size)
+
+        start = time.perf_counter()
+        names = extract_company_names(filenames, nlp=nlp)
+        extract_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        clusters = group_company_names(names)
+        group_s = time.perf_counter() - start
+
+        baseline = "-"
+        if args.baseline:
+            start = time.perf_counter()
+            greedy_baseline(names)
+            baseline = f"{time.perf_counter() - start:.3f}"
+
+        print(f"{size:>7} {extract_s:>10.3f} {group_s:>9.3f} {len(clusters):>9} "
+              f"{purity(clusters, labels):>7.3f} {baseline:>11}")
+
+
+if __name__ == "__main__":
+    main()
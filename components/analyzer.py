@@ -3,12 +3,69 @@
 import os
 import streamlit as st
 from utils.file_handler import handle_file_upload
-from anthropic import Anthropic
-from quantiq.orchestrator import process_bulk_directory
+from quantiq.config import RunConfig
+from quantiq.jobs import get_job, get_job_events, submit_job
 from quantiq.utils import reset_run
 from quantiq.download_manager import download_zip_file
 import logging
 
+# Events shown under a running job.
+JOB_EVENTS_SHOWN = 8
+
+
+def _job_active():
+    job = get_job(st.session_state.get("job_id")) if st.session_state.get("job_id") else None
+    return job is not None and job["status"] in ("queued", "running")
+
+
+@st.fragment(run_every=2)
+def _job_progress():
+    """
+    Polls the running job and redraws its progress without rerunning the page.
+    """
+    job = get_job(st.session_state.job_id)
+    if job is None:
+        return
+    if job["status"] not in ("queued", "running"):
+        st.rerun(scope="app")
+
+    if job["status"] == "queued":
+        st.info("Waiting for a worker to pick up the analysis...")
+        return
+    st.progress(job["progress"], text=job["status_message"] or "Analyzing...")
+    for event in get_job_events(job["id"])[-JOB_EVENTS_SHOWN:]:
+        {"error": st.error, "warning": st.warning}.get(event["level"], st.text)(event["message"])
+    if job["live_text"]:
+        with st.expander(job["live_label"], expanded=True):
+            st.markdown(job["live_text"])
+
+
+def render_job_status():
+    """
+    Shows the progress of the session's analysis job, or its outcome once
+    it has finished. The job runs in a worker process, so closing the page
+    does not stop it.
+    """
+    job = get_job(st.session_state.job_id)
+    if job is None:
+        st.session_state.job_id = None
+        return
+    if job["status"] in ("queued", "running"):
+        _job_progress()
+        return
+
+    for event in get_job_events(job["id"]):
+        if event["level"] != "info" or event["message"].startswith(("Pipeline", "Response cache")):
+            {"error": st.error, "warning": st.warning}.get(event["level"], st.caption)(event["message"])
+    if job["status"] == "succeeded":
+        st.success("Analysis complete!")
+    else:
+        st.error(f"Analysis failed: {job['error']}")
+    st.session_state.job_id = None
+    st.session_state.bulk_file_uploaded = False
+    st.session_state["files"] = []
+    st.session_state.reset_clicked = False
+
 
 def render_analyzer():
     st.subheader("Financial Statement Analyzer")
@@ -43,21 +100,14 @@ def render_analyzer():
             st.rerun()
 
     if st.session_state["bulk_file_uploaded"] and st.session_state["files"]:
-        if st.button("Analyze", type="primary"):
-            with st.spinner("Analyzing..."):
-                client = Anthropic(api_key=st.session_state.anthropic_api_key)
-                if mode == "Comparative":
-                    from quantiq.comparative import run_comparative_analysis
-                    run_comparative_analysis(client)
-                elif mode == "DCF Valuation":
-                    from quantiq.dcf import run_dcf_analysis
-                    run_dcf_analysis(client)
-                else:
-                    process_bulk_directory(client)
-            st.session_state.bulk_file_uploaded = False
-            st.session_state["files"] = []
-            st.session_state.reset_clicked = False
-            st.success("Analysis complete!")
+        if st.button("Analyze", type="primary", disabled=_job_active()):
+            st.session_state.job_id = submit_job(
+                RunConfig.from_session(), api_key=st.session_state.anthropic_api_key
+            )
+            logging.info(f"Submitted analysis job {st.session_state.job_id}.")
+
+        if st.session_state.get("job_id"):
+            render_job_status()
 
         col1, col2, buffer = st.columns([3, 3, 5])
         with col1:
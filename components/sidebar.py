@@ -39,5 +39,57 @@ def render_sidebar():
                     "and runs a sensitivity analysis. Upload financial statements for one company."
                 ),
             )
+            st.session_state.send_full_text = st.checkbox(
+                "Send full document text",
+                value=st.session_state.get("send_full_text", False),
+                help=(
+                    "By default only the PDF pages most likely to contain financial statements "
+                    "(income statement, balance sheet, cash flow, notes) are sent to the model. "
+                    "Check this to send every page instead."
+                ),
+            )
+            st.session_state.analysis_concurrency = st.number_input(
+                "Concurrent analyses",
+                min_value=1,
+                max_value=16,
+                value=int(st.session_state.get("analysis_concurrency", 4)),
+                help="Number of companies analyzed at the same time in Standard and Comparative modes.",
+            )
+            st.session_state.bypass_response_cache = st.checkbox(
+                "Bypass response cache",
+                value=st.session_state.get("bypass_response_cache", False),
+                help=(
+                    "Identical requests are normally answered from the local response cache. "
+                    "Check this to call the model again for this run; the cache is refreshed "
+                    "with the new responses."
+                ),
+            )
+            st.session_state.batch_mode = st.checkbox(
+                "Batch mode",
+                value=st.session_state.get("batch_mode", False),
+                help=(
+                    "Standard mode only. Submits every company through the Message Batches API "
+                    "and renders the reports once the batch ends. Cheaper and higher throughput "
+                    "for large portfolios, but a batch can take up to 24 hours."
+                ),
+            )
+            st.session_state.monte_carlo = st.checkbox(
+                "Monte Carlo valuation",
+                value=st.session_state.get("monte_carlo", False),
+                help=(
+                    "DCF Valuation mode only. Adds a distribution of valuations to the report: "
+                    "growth, margin, WACC and terminal growth are drawn around the base case for "
+                    "100,000 scenarios, shown as percentile bands and a histogram."
+                ),
+            )
+            st.session_state.recompute_all = st.checkbox(
+                "Recompute all reports",
+                value=st.session_state.get("recompute_all", False),
+                help=(
+                    "Standard mode normally reuses the existing report of a company whose files, "
+                    "prompt and settings have not changed since the last run. Check this to "
+                    "analyze every company again."
+                ),
+            )
 
     return selected
@@ -0,0 +1,121 @@
+# quantiq/__main__.py
+"""
+Command-line entry point for headless runs, e.g. a nightly batch:
+
+    python -m quantiq bulk/ --mode standard --output-dir bulk_output
+
+Runs the same pipeline as the app, without a Streamlit session. Exits with
+status 1 if any company or the run as a whole failed.
+"""
+
+import os
+import sys
+import logging
+import argparse
+from quantiq.config import ANALYSIS_CONCURRENCY, RunConfig, resolve_api_key
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLI_MODES = {
+    "standard": "Standard",
+    "comparative": "Comparative",
+    "dcf": "DCF Valuation",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m quantiq",
+        description="Analyse financial documents without the Streamlit app.",
+    )
+    parser.add_argument("input_dir", help="Directory of documents, one subdirectory per company")
+    parser.add_argument("--mode", choices=sorted(CLI_MODES), default="standard", help="Analysis mode")
+    parser.add_argument("--prompt-file", help="System prompt for the company reports (default: built-in prompt)")
+    parser.add_argument("--output-dir", default="bulk_output", help="Directory the PDF reports are written to")
+    parser.add_argument(
+        "--concurrency", type=int, default=ANALYSIS_CONCURRENCY, help="Company analyses in flight at once"
+    )
+    parser.add_argument("--full-text", action="store_true", help="Send every page instead of the statement pages")
+    parser.add_argument("--batch", action="store_true", help="Use the Message Batches API (standard mode)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--recompute-all", action="store_true", help="Re-analyse companies whose inputs are unchanged")
+    parser.add_argument("--monte-carlo", action="store_true", help="Add a Monte Carlo distribution (dcf mode)")
+    parser.add_argument("--stream", action="store_true", help="Print report text as it streams in")
+    parser.add_argument("--verbose", action="store_true", help="Show log messages on the console")
+    return parser.parse_args(argv)
+
+
+def build_config(args):
+    """
+    Builds the run configuration from parsed command-line arguments.
+    """
+    system_prompt = None
+    if args.prompt_file:
+        with open(args.prompt_file, "r", encoding="utf-8") as f:
+            system_prompt = f.read().strip() or None
+    return RunConfig(
+        input_dir=os.path.abspath(args.input_dir),
+        output_dir=os.path.abspath(args.output_dir),
+        mode=CLI_MODES[args.mode],
+        system_prompt=system_prompt,
+        send_full_text=args.full_text,
+        concurrency=max(1, args.concurrency),
+        use_cache=not args.no_cache,
+        batch_mode=args.batch,
+        reuse_reports=not args.recompute_all,
+        monte_carlo=args.monte_carlo,
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.verbose:
+        # Progress goes to stdout; only warnings and errors reach the console log.
+        for handler in logging.getLogger().handlers:
+            if type(handler) is logging.StreamHandler:
+                handler.setLevel(logging.WARNING)
+
+    if not os.path.isdir(args.input_dir):
+        logger.error(f"Input directory not found: {args.input_dir}")
+        return 2
+    try:
+        config = build_config(args)
+    except OSError as e:
+        logger.error(f"Cannot read prompt file: {e}")
+        return 2
+
+    # Prompts, templates and saved secrets are read relative to the project
+    # directory, as when the app runs; the config already holds absolute paths.
+    os.chdir(PROJECT_DIR)
+    api_key = resolve_api_key()
+    if not api_key:
+        logger.error("No API key: set ANTHROPIC_API_KEY or save one from the app's Settings page.")
+        return 2
+
+    from quantiq.llm import LLMClient
+    from quantiq.orchestrator import run_mode
+    from quantiq.progress import ConsoleReporter
+
+    os.makedirs(config.output_dir, exist_ok=True)
+
+    reporter = ConsoleReporter(stream_text=args.stream)
+    client = LLMClient(api_key=api_key, use_cache=config.use_cache)
+    try:
+        run_mode(client, config, reporter)
+    except Exception as e:
+        reporter.failure(f"Run failed: {e}", fatal=True)
+    if config.use_cache:
+        reporter.info(f"Response cache: {client.cache_stats.summary()}.")
+
+    if reporter.failures:
+        print(f"Finished with {len(reporter.failures)} failure(s).", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,56 +1,268 @@
 # quantiq/analysis.py
 
 import os
+import asyncio
 import logging
+from itertools import chain
 import streamlit as st
 from anthropic import Anthropic
 from quantiq.reporting import output_report
-from quantiq.file_handler import ingest_files
+from quantiq.file_handler import PAGE_SELECTION_BUDGET_TOKENS, iter_ingest
+from quantiq.text_utils import estimate_tokens, split_by_tokens
+from quantiq.llm import cached_system
 from quantiq.logging_setup import set_logging
 
 # Initialize logger
 logger = set_logging()
 
+MODEL = "claude-sonnet-4-6"
 
-def quantiq_analysis(client, file_paths, report_name):
+DEFAULT_SYSTEM_PROMPT = "You are a financial analyst. Prepare comprehensive reports based on the provided financial documents."
+
+# Inputs estimated above this many tokens are analysed in map-reduce mode.
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("QUANTIQ_MAP_REDUCE_THRESHOLD_TOKENS", 150000))
+
+# Token budget of each chunk sent to the map step.
+MAP_CHUNK_TOKENS = int(os.getenv("QUANTIQ_MAP_CHUNK_TOKENS", 60000))
+
+# Number of map requests in flight at once.
+MAP_WORKERS = int(os.getenv("QUANTIQ_MAP_WORKERS", 4))
+
+
+def _load_prompt(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return f.read()
+    return ""
+
+
+def analysis_settings(system_prompt=None, send_full_text=None):
+    """
+    Resolves the analysis settings, falling back to the current session.
+
+    Session state is only available on the Streamlit script thread, so
+    callers that analyse from worker threads or an event loop resolve the
+    settings once up front and pass them along.
+
+    Returns:
+    - tuple: ``(system_prompt, page_budget)``, where ``page_budget`` is None
+      when the full document text should be sent.
+    """
+    if system_prompt is None:
+        system_prompt = st.session_state.get("editor_content", "") or DEFAULT_SYSTEM_PROMPT
+    if send_full_text is None:
+        send_full_text = st.session_state.get("send_full_text", False)
+    # Send only the pages most likely to hold financial statements, unless
+    # the full text was requested. Selection wins over map-reduce: the budget
+    # is capped at the threshold, so selected pages always fit one request.
+    page_budget = None if send_full_text else min(PAGE_SELECTION_BUDGET_TOKENS, MAP_REDUCE_THRESHOLD_TOKENS)
+    return system_prompt, page_budget
+
+
+def map_request(report_name, index, total, chunk):
+    """
+    Builds the map-step request that condenses one chunk of the document data.
+    """
+    return dict(
+        model=MODEL,
+        max_tokens=2048,
+        system=_load_prompt("prompts/map_extraction.txt"),
+        messages=[
+            {
+                "role": "user",
+                "content": "".join(
+                    [
+                        f"Section {index} of {total} of the document data for {report_name}:\n\n",
+                        chunk,
+                    ]
+                ),
+            },
+        ],
+    )
+
+
+def reduce_request(report_name, notes, system_prompt):
+    """
+    Builds the request that turns the map-step notes into the final report.
+    """
+    total = len(notes)
+    message = "".join(
+        [
+            f"Please prepare a comprehensive report for {report_name} based on the following notes, "
+            f"extracted from {total} sections of the document data:",
+            *(f"\n\n--- Section {idx} of {total} ---\n{note}" for idx, note in enumerate(notes, start=1)),
+        ]
+    )
+    return dict(
+        model=MODEL,
+        max_tokens=4096,
+        system=cached_system(system_prompt),
+        messages=[
+            {
+                "role": "user",
+                "content": message,
+            },
+        ],
+    )
+
+
+def report_request(report_name, chunks, system_prompt):
+    """
+    Builds the single request that turns the document data into the report.
+    """
+    # Join the document data into the message once
+    message = "".join(
+        [
+            f"Please prepare a comprehensive report for {report_name} based on the following document data:\n\n",
+            *chunks,
+        ]
+    )
+    return dict(
+        model=MODEL,
+        max_tokens=4096,
+        system=cached_system(system_prompt),
+        messages=[
+            {
+                "role": "user",
+                "content": message,
+            },
+        ],
+    )
+
+
+def needs_map_reduce(chunks, report_name):
+    """
+    Returns True if the ingested data is too large for a single request.
+    """
+    input_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+    if input_tokens > MAP_REDUCE_THRESHOLD_TOKENS:
+        logger.info(
+            f"Input for {report_name} is ~{input_tokens} tokens, above the "
+            f"{MAP_REDUCE_THRESHOLD_TOKENS} token threshold; using map-reduce."
+        )
+        return True
+    return False
+
+
+def quantiq_analysis(client, file_paths, report_name, system_prompt=None, send_full_text=None, on_text=None):
     """
     Analyze one or multiple files using the Anthropic client and prepare a report.
 
+    A blocking wrapper around ``quantiq_analysis_async``, for callers outside
+    an event loop; it sends exactly the same requests.
+
     Parameters:
-    - client: Anthropic client instance.
+    - client: ``LLMClient`` instance.
     - file_paths: List of file paths to process.
     - report_name: Name to use in the report and output filename.
+    - system_prompt: System prompt; defaults to the prompt in the editor.
+    - send_full_text: Send every page instead of the selected statement
+      pages; defaults to the session setting.
+    - on_text: Optional ``on_text(text, done)`` callback that receives the
+      report as it streams in.
 
     Returns:
     - str: Content of the analysis report.
     """
-    try:
-        # Extract text content from all files
-        report_data = ingest_files(file_paths)
+    # Resolved here: session state is not available inside the event loop.
+    system_prompt, page_budget = analysis_settings(system_prompt, send_full_text)
 
-        prompt_instructions = st.session_state.get("editor_content", "")
+    async def analyse():
+        async with client.aio() as async_client:
+            return await quantiq_analysis_async(
+                async_client, file_paths, report_name, system_prompt, page_budget is None, on_text
+            )
 
-        response = client.messages.create(
-            model="claude-sonnet-4-6",
-            max_tokens=4096,
-            system=prompt_instructions if prompt_instructions else "You are a financial analyst. Prepare comprehensive reports based on the provided financial documents.",
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Please prepare a comprehensive report for {report_name} based on the following document data:\n\n{report_data}",
-                },
-            ],
+    return asyncio.run(analyse())
+
+
+async def _map_chunk_async(client, semaphore, report_name, index, total, chunk):
+    async with semaphore:
+        response = await client.messages.create(**map_request(report_name, index, total, chunk))
+    logger.info(f"Map step {index}/{total} complete for {report_name}")
+    return response.content[0].text
+
+
+async def map_reduce_analysis_async(client, chunks, report_name, system_prompt, on_text=None):
+    """
+    Analyze document data too large for a single request.
+
+    The data is split into token-budgeted chunks, each chunk is condensed into
+    notes by concurrent map requests (at most ``MAP_WORKERS`` of one report in
+    flight at once), and the notes are reduced into the final report with the
+    regular system prompt.
+
+    Parameters:
+    - client: AsyncLLMClient instance (see ``LLMClient.aio``).
+    - chunks: Ingested text chunks in document order.
+    - report_name: Name to use in the report.
+    - system_prompt: System prompt for the final report.
+    - on_text: Optional streaming callback for the final report (see ``LLMClient``).
+
+    Returns:
+    - str: Content of the analysis report.
+    """
+    pieces = split_by_tokens(chunks, MAP_CHUNK_TOKENS)
+    total = len(pieces)
+    logger.info(f"Map-reduce analysis for {report_name}: {total} chunks")
+
+    semaphore = asyncio.Semaphore(MAP_WORKERS)
+    notes = await asyncio.gather(
+        *(
+            _map_chunk_async(client, semaphore, report_name, idx, total, piece)
+            for idx, piece in enumerate(pieces, start=1)
+        )
+    )
+
+    response = await client.messages.create(
+        **reduce_request(report_name, notes, system_prompt), on_text=on_text
+    )
+    return response.content[0].text
+
+
+async def quantiq_analysis_async(client, file_paths, report_name, system_prompt, send_full_text, on_text=None):
+    """
+    Analyze one or multiple files with the async client and prepare a report.
+
+    Ingestion runs in a worker thread so other analyses keep making progress
+    meanwhile.
+    Settings are passed explicitly (see ``analysis_settings``) because session
+    state is not available off the script thread.
+
+    Parameters:
+    - client: AsyncLLMClient instance (see ``LLMClient.aio``).
+    - file_paths: List of file paths to process.
+    - report_name: Name to use in the report and output filename.
+    - system_prompt: System prompt for the report.
+    - send_full_text: Send every page instead of the selected statement pages.
+    - on_text: Optional ``on_text(text, done)`` streaming callback.
+
+    Returns:
+    - str: Content of the analysis report.
+    """
+    try:
+        system_prompt, page_budget = analysis_settings(system_prompt, send_full_text)
+        chunks = await asyncio.to_thread(
+            lambda: list(iter_ingest(file_paths, page_budget_tokens=page_budget))
         )
 
-        message_content = response.content[0].text
-        logger.debug(f"Received message content: {message_content[:100]}...")
+        if needs_map_reduce(chunks, report_name):
+            message_content = await map_reduce_analysis_async(
+                client, chunks, report_name, system_prompt, on_text
+            )
+        else:
+            request = report_request(report_name, chunks, system_prompt)
+            del chunks
+            response = await client.messages.create(**request, on_text=on_text)
+            message_content = response.content[0].text
+
         logger.info(
             f"Analysis completed for files: {', '.join([os.path.basename(fp) for fp in file_paths])}"
         )
         return message_content
 
     except Exception as e:
-        logger.error(f"Error in quantiq_analysis function: {e}")
+        logger.error(f"Error in quantiq_analysis_async for {report_name}: {e}")
         return None
 
 
@@ -68,16 +280,18 @@ def quantiq_analysis_(client, file_paths, report_name):
     """
     try:
         prompt_instructions = st.session_state.editor_content
-        report_data = ingest_files(file_paths)
+        message = "".join(
+            chain([f"Company: {report_name}. Report data:"], iter_ingest(file_paths))
+        )
 
         response = client.messages.create(
-            model="claude-sonnet-4-6",
+            model=MODEL,
             max_tokens=4096,
-            system=prompt_instructions,
+            system=cached_system(prompt_instructions),
             messages=[
                 {
                     "role": "user",
-                    "content": f"Company: {report_name}. Report data:" + report_data,
+                    "content": message,
                 },
             ],
         )
@@ -0,0 +1,192 @@
+# quantiq/batch.py
+
+import os
+import json
+import time
+from quantiq.analysis import (
+    MAP_CHUNK_TOKENS,
+    analysis_settings,
+    map_request,
+    needs_map_reduce,
+    reduce_request,
+    report_request,
+)
+from quantiq.file_handler import iter_ingest
+from quantiq.llm import lookup_response, response_text
+from quantiq.response_cache import put_cached_response
+from quantiq.text_utils import split_by_tokens
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# Seconds between status checks of a submitted batch.
+BATCH_POLL_SECONDS = float(os.getenv("QUANTIQ_BATCH_POLL_SECONDS", 30))
+
+# Requests and payload bytes per submitted batch, below the API limits of
+# 100,000 requests and 256 MB.
+BATCH_MAX_REQUESTS = int(os.getenv("QUANTIQ_BATCH_MAX_REQUESTS", 10000))
+BATCH_MAX_BYTES = int(os.getenv("QUANTIQ_BATCH_MAX_MB", 200)) * 1024 * 1024
+
+# Retries of the batch API calls themselves (create, retrieve, results).
+BATCH_API_RETRIES = 5
+
+
+def _split_batches(requests):
+    """
+    Splits ``(custom_id, params)`` pairs into groups within the batch limits.
+    """
+    groups = []
+    current = []
+    current_bytes = 0
+    for custom_id, params in requests:
+        size = len(json.dumps(params, ensure_ascii=False).encode("utf-8"))
+        if current and (len(current) >= BATCH_MAX_REQUESTS or current_bytes + size > BATCH_MAX_BYTES):
+            groups.append(current)
+            current = []
+            current_bytes = 0
+        current.append({"custom_id": custom_id, "params": params})
+        current_bytes += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def run_batch(client, requests, poll_seconds=None, on_progress=None):
+    """
+    Runs Messages API requests through the Message Batches API.
+
+    Requests already in the response cache are answered from it; the rest
+    are submitted in one or more batches, which are polled until they end.
+    Successful responses are stored in the response cache.
+
+    Args:
+        client: ``LLMClient`` instance.
+        requests (dict): Request parameters keyed by custom ID (letters,
+            digits, ``-`` and ``_``; at most 64 characters).
+        poll_seconds (float): Seconds between status checks. Defaults to
+            ``BATCH_POLL_SECONDS``.
+        on_progress (callable): Optional ``on_progress(done, total)`` called
+            after every status check.
+
+    Returns:
+        dict: Response message per custom ID, or None for requests that
+            errored, expired or were canceled.
+    """
+    poll_seconds = BATCH_POLL_SECONDS if poll_seconds is None else poll_seconds
+    results = {}
+    keys = {}
+    pending = []
+    for custom_id, params in requests.items():
+        key, cached = lookup_response(client, params)
+        if cached is not None:
+            results[custom_id] = cached
+        else:
+            keys[custom_id] = key
+            pending.append((custom_id, params))
+
+    if not pending:
+        return results
+
+    batches = client.sdk.with_options(max_retries=BATCH_API_RETRIES).messages.batches
+    batch_ids = []
+    for group in _split_batches(pending):
+        batch = batches.create(requests=group)
+        batch_ids.append(batch.id)
+        logger.info(f"Submitted batch {batch.id} with {len(group)} requests.")
+
+    total = len(pending)
+    open_ids = list(batch_ids)
+    done_counts = {}
+    while open_ids:
+        for batch_id in list(open_ids):
+            batch = batches.retrieve(batch_id)
+            counts = batch.request_counts
+            done_counts[batch_id] = counts.succeeded + counts.errored + counts.canceled + counts.expired
+            if batch.processing_status == "ended":
+                open_ids.remove(batch_id)
+                logger.info(
+                    f"Batch {batch_id} ended: {counts.succeeded} succeeded, {counts.errored} errored, "
+                    f"{counts.expired} expired, {counts.canceled} canceled."
+                )
+        if on_progress is not None:
+            on_progress(sum(done_counts.values()), total)
+        if open_ids:
+            time.sleep(poll_seconds)
+
+    for batch_id in batch_ids:
+        for item in batches.results(batch_id):
+            if item.result.type == "succeeded":
+                results[item.custom_id] = item.result.message
+                put_cached_response(keys[item.custom_id], item.result.message)
+            else:
+                error = getattr(item.result, "error", None)
+                logger.error(f"Batch request {item.custom_id} {item.result.type}: {error}")
+                results[item.custom_id] = None
+
+    for custom_id, _ in pending:
+        results.setdefault(custom_id, None)
+    return results
+
+
+def run_batch_analyses(client, companies, system_prompt=None, send_full_text=None, poll_seconds=None, on_progress=None):
+    """
+    Analyses companies through the Message Batches API instead of one
+    request at a time.
+
+    Each company's request is built exactly as in ``quantiq_analysis``.
+    Companies whose data needs map-reduce take two rounds: their map requests
+    go in the first batch with everyone else's report requests, and their
+    reduce requests in a second batch.
+
+    Args:
+        client: ``LLMClient`` instance.
+        companies (list): ``(company_name, file_paths)`` pairs.
+        system_prompt (str): System prompt; defaults to the prompt in the editor.
+        send_full_text (bool): Send every page instead of the selected
+            statement pages; defaults to the session setting.
+        poll_seconds (float): Seconds between batch status checks.
+        on_progress (callable): Optional ``on_progress(stage, done, total)``.
+
+    Returns:
+        dict: Report content (or None on failure) per company, in input order.
+    """
+    system_prompt, page_budget = analysis_settings(system_prompt, send_full_text)
+
+    first_round = {}
+    map_counts = {}
+    for idx, (company_name, file_paths) in enumerate(companies):
+        chunks = list(iter_ingest(file_paths, page_budget_tokens=page_budget))
+        if needs_map_reduce(chunks, company_name):
+            pieces = split_by_tokens(chunks, MAP_CHUNK_TOKENS)
+            map_counts[idx] = len(pieces)
+            for number, piece in enumerate(pieces, start=1):
+                first_round[f"c{idx}-m{number}"] = map_request(company_name, number, len(pieces), piece)
+        else:
+            first_round[f"c{idx}"] = report_request(company_name, chunks, system_prompt)
+
+    def progress(stage):
+        if on_progress is None:
+            return None
+        return lambda done, total: on_progress(stage, done, total)
+
+    responses = run_batch(client, first_round, poll_seconds, progress("Analysis batch"))
+
+    if map_counts:
+        second_round = {}
+        for idx, total in map_counts.items():
+            company_name = companies[idx][0]
+            notes = [responses.get(f"c{idx}-m{number}") for number in range(1, total + 1)]
+            if any(note is None for note in notes):
+                logger.error(f"Map step failed for {company_name}; skipping its report.")
+                continue
+            second_round[f"c{idx}"] = reduce_request(
+                company_name, [response_text(note) for note in notes], system_prompt
+            )
+        responses.update(run_batch(client, second_round, poll_seconds, progress("Reduce batch")))
+
+    results = {}
+    for idx, (company_name, _) in enumerate(companies):
+        response = responses.get(f"c{idx}")
+        results[company_name] = response_text(response) if response is not None else None
+    return results
@@ -0,0 +1,172 @@
+# quantiq/blob_store.py
+
+import os
+import time
+import shutil
+import hashlib
+import threading
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# Directory of the content-addressed store. Uploaded files are kept here once,
+# named by their SHA-256 digest, and company folders hold hardlinks to them.
+BLOB_DIR = os.getenv("QUANTIQ_BLOB_DIR", os.path.join("cache", "blobs"))
+
+# Blobs modified more recently than this are never pruned, so a blob another
+# session has just stored (or deduplicated against) survives until it is linked.
+BLOB_PRUNE_GRACE_SECONDS = float(os.getenv("QUANTIQ_BLOB_PRUNE_GRACE_SECONDS", 3600))
+
+# Digests of linked files, keyed by (device, inode), so a file that is a link
+# to a blob is recognised without hashing it again.
+_known_digests = {}
+_lock = threading.Lock()
+
+
+def blob_path(digest):
+    """
+    Returns the path of the blob with the given digest.
+    """
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def store_stream(stream, chunk_size=1024 * 1024, max_bytes=None):
+    """
+    Writes a stream into the blob store, hashing it while it is written.
+
+    If a blob with the same content already exists, the new copy is discarded.
+
+    Args:
+        stream: Readable binary file object.
+        chunk_size (int): Number of bytes read per chunk.
+        max_bytes (int): Optional size limit; exceeding it raises ValueError.
+
+    Returns:
+        tuple: ``(digest, path, existed)`` — the content digest, the blob
+            path, and whether the content was already stored.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    tmp_path = os.path.join(BLOB_DIR, f".upload.{os.getpid()}.{threading.get_ident()}.tmp")
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise ValueError(f"Upload exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                f.write(chunk)
+
+        hex_digest = digest.hexdigest()
+        path = blob_path(hex_digest)
+        with _lock:
+            existed = os.path.exists(path)
+            if existed:
+                os.remove(tmp_path)
+                # Restarts the prune grace period until the blob is linked.
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        return hex_digest, path, existed
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def link_blob(digest, dest_path):
+    """
+    Places a stored blob at ``dest_path``, as a hardlink where the filesystem
+    allows it and as a copy otherwise.
+
+    Args:
+        digest (str): Digest of the blob.
+        dest_path (str): Path the file should appear at.
+    """
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(blob_path(digest), dest_path)
+    except OSError:
+        shutil.copyfile(blob_path(digest), dest_path)
+        return
+    stat = os.stat(dest_path)
+    with _lock:
+        _known_digests[(stat.st_dev, stat.st_ino)] = digest
+
+
+def store_upload(stream, dest_path, max_bytes=None):
+    """
+    Stores an upload in the blob store and links it at ``dest_path``.
+
+    Args:
+        stream: Readable binary file object.
+        dest_path (str): Path the file should appear at.
+        max_bytes (int): Optional size limit; exceeding it raises ValueError.
+
+    Returns:
+        str: Content digest of the upload.
+    """
+    digest, _, existed = store_stream(stream, max_bytes=max_bytes)
+    link_blob(digest, dest_path)
+    if existed:
+        logger.info(f"Deduplicated {dest_path}: content already stored as {digest[:12]}.")
+    return digest
+
+
+def known_digest(file_path):
+    """
+    Returns the content digest of a file linked from the blob store, or None
+    if the file is not a known link.
+
+    The digest is only trusted while the file is still the same inode as the
+    blob, so a recycled inode number is never mistaken for a stored upload.
+    """
+    try:
+        stat = os.stat(file_path)
+        with _lock:
+            digest = _known_digests.get((stat.st_dev, stat.st_ino))
+        if digest is None:
+            return None
+        blob_stat = os.stat(blob_path(digest))
+    except OSError:
+        return None
+    if (blob_stat.st_dev, blob_stat.st_ino) != (stat.st_dev, stat.st_ino):
+        return None
+    return digest
+
+
+def prune_blobs(grace_seconds=None):
+    """
+    Deletes blobs that no upload links to any more (hardlink count of 1).
+
+    Blobs stored or reused within the last ``grace_seconds`` are kept, since
+    another session may be about to link them, as are uploads still being
+    written.
+
+    Args:
+        grace_seconds (float): Defaults to ``BLOB_PRUNE_GRACE_SECONDS``.
+    """
+    grace_seconds = BLOB_PRUNE_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    if not os.path.isdir(BLOB_DIR):
+        return removed
+    for root, _, files in os.walk(BLOB_DIR):
+        for name in files:
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_nlink == 1 and stat.st_mtime < cutoff:
+                    os.remove(path)
+                    with _lock:
+                        _known_digests.pop((stat.st_dev, stat.st_ino), None)
+                    removed += 1
+            except OSError:
+                continue
+    logger.info(f"Pruned {removed} unreferenced blobs.")
+    return removed
@@ -1,18 +1,24 @@
 # quantiq/comparative.py
 
 import os
-import streamlit as st
-from quantiq.analysis import quantiq_analysis
-from quantiq.reporting import html_to_pdf
+import shutil
+import tempfile
+from quantiq.config import RunConfig
+from quantiq.orchestrator import collect_companies, company_progress, run_company_analyses
+from quantiq.render_pipeline import RenderPipeline, StageTracker, merge_pdfs
 from quantiq.prompt_utils import get_prompt_for_mode
+from quantiq.llm import cached_system
+from quantiq.progress import StreamlitReporter
 from quantiq.logging_setup import set_logging
 
 logger = set_logging()
 
 
-def run_comparative_analysis(client):
-    bulk_dir = st.session_state.bulk_dir
-    output_dir = st.session_state.bulk_output_dir
+def run_comparative_analysis(client, config=None, reporter=None):
+    config = config or RunConfig.from_session()
+    reporter = reporter or StreamlitReporter()
+    bulk_dir = config.input_dir
+    output_dir = config.output_dir
 
     subdirs = [
         d for d in os.listdir(bulk_dir)
@@ -20,69 +26,92 @@ def run_comparative_analysis(client):
     ]
 
     if len(subdirs) < 2:
-        st.error("Comparative analysis requires documents for at least 2 companies. "
-                 "Upload a .zip file with subdirectories per company, or multiple files "
-                 "that will be auto-grouped by company name.")
+        reporter.failure(
+            "Comparative analysis requires documents for at least 2 companies. "
+            "Upload a .zip file with subdirectories per company, or multiple files "
+            "that will be auto-grouped by company name.",
+            fatal=True,
+        )
         return
 
-    # Pass 1: Individual analyses
-    individual_results = {}
-    progress = st.progress(0)
-    total = len(subdirs)
-
-    for idx, subdir in enumerate(subdirs):
-        company_dir = os.path.join(bulk_dir, subdir)
-        file_paths = [
-            os.path.join(company_dir, f)
-            for f in os.listdir(company_dir)
-            if os.path.isfile(os.path.join(company_dir, f))
-            and f.endswith((".pdf", ".docx", ".xlsx", ".csv"))
+    companies = collect_companies(bulk_dir)
+    section_paths = {
+        company: f"section_{idx:03d}.pdf" for idx, (company, _) in enumerate(companies, start=1)
+    }
+    section_dir = tempfile.mkdtemp(prefix="comparative_")
+    section_renders = {}
+    tracker = StageTracker()
+
+    try:
+        # Each individual analysis is rendered as its own section while the
+        # other analyses and the synthesis are still running; the sections
+        # are merged behind the comparison summary at the end.
+        with RenderPipeline(tracker) as pipeline:
+
+            def render_section(company, analysis):
+                section_renders[company] = pipeline.submit(
+                    f"<h1>{company} — Individual Analysis</h1>\n{analysis}",
+                    section_paths[company],
+                    section_dir,
+                )
+
+            # Pass 1: Individual analyses, several companies at a time
+            reporter.progress(0)
+            results = run_company_analyses(
+                client,
+                companies,
+                config,
+                finish=render_section,
+                on_complete=company_progress(reporter),
+                stream=reporter.stream,
+                tracker=tracker,
+            )
+            individual_results = {company: result for company, result in results.items() if result}
+
+            reporter.done()
+
+            if len(individual_results) < 2:
+                reporter.failure("Could not analyze enough companies for comparison.", fatal=True)
+                return
+
+            # Pass 2: Comparative synthesis
+            reporter.info("Generating comparative analysis...")
+            comparative_prompt = get_prompt_for_mode("Comparative")
+
+            companies_block = ""
+            for company, analysis in individual_results.items():
+                companies_block += f"\n\n--- {company} ---\n{analysis}"
+
+            with tracker.track("Model"):
+                response = client.messages.create(
+                    model="claude-sonnet-4-6",
+                    max_tokens=8192,
+                    system=cached_system(comparative_prompt),
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": f"Compare the following {len(individual_results)} companies based on their individual analyses:{companies_block}",
+                        }
+                    ],
+                    on_text=reporter.stream("Comparative analysis"),
+                )
+
+            comparison_html = response.content[0].text
+            comparison_render = pipeline.submit(comparison_html, "comparison.pdf", section_dir)
+
+        # Combined PDF: comparison summary, then each individual analysis
+        sections = [("the comparison", comparison_render, "comparison.pdf")] + [
+            (company, section_renders[company], section_paths[company]) for company in individual_results
         ]
-        if not file_paths:
-            logger.warning(f"No files for {subdir}, skipping")
-            continue
-
-        st.text(f"Analyzing: {subdir} ({idx + 1}/{total})")
-        result = quantiq_analysis(client, file_paths, subdir)
-        if result:
-            individual_results[subdir] = result
-
-        progress.progress((idx + 1) / total)
-
-    progress.empty()
-
-    if len(individual_results) < 2:
-        st.error("Could not analyze enough companies for comparison.")
-        return
-
-    # Pass 2: Comparative synthesis
-    st.text("Generating comparative analysis...")
-    comparative_prompt = get_prompt_for_mode("Comparative")
-
-    companies_block = ""
-    for company, analysis in individual_results.items():
-        companies_block += f"\n\n--- {company} ---\n{analysis}"
-
-    response = client.messages.create(
-        model="claude-sonnet-4-6",
-        max_tokens=8192,
-        system=comparative_prompt,
-        messages=[
-            {
-                "role": "user",
-                "content": f"Compare the following {len(individual_results)} companies based on their individual analyses:{companies_block}",
-            }
-        ],
-    )
-
-    comparison_html = response.content[0].text
-
-    # Build combined PDF: comparison summary + individual analyses with page breaks
-    combined_html = comparison_html
-    for company, analysis in individual_results.items():
-        combined_html += f'<div class="page-break"></div>\n'
-        combined_html += f"<h1>{company} — Individual Analysis</h1>\n"
-        combined_html += analysis
-
-    html_to_pdf(combined_html, "comparative_analysis.pdf", output_dir)
+        rendered = []
+        for label, render, filename in sections:
+            if render.exception() is None:
+                rendered.append(os.path.join(section_dir, filename))
+            else:
+                reporter.failure(f"Could not render {label}; it is missing from the combined PDF.")
+        merge_pdfs(rendered, os.path.join(output_dir, "comparative_analysis.pdf"))
+    finally:
+        shutil.rmtree(section_dir, ignore_errors=True)
+
+    reporter.info(f"Pipeline utilisation: {tracker.describe()}")
     logger.info("Comparative analysis complete.")
@@ -0,0 +1,91 @@
+# quantiq/config.py
+
+import os
+import tomllib
+from dataclasses import asdict, dataclass, fields
+
+# Default number of company analyses in flight at once.
+ANALYSIS_CONCURRENCY = int(os.getenv("QUANTIQ_ANALYSIS_CONCURRENCY", 4))
+
+MODES = ("Standard", "Comparative", "DCF Valuation")
+
+
+@dataclass
+class RunConfig:
+    """
+    Everything an analysis run needs, so the modes can run without a
+    Streamlit session (in a job worker or from the command line).
+
+    Attributes:
+        input_dir: Directory holding the documents, one subdirectory per company.
+        output_dir: Directory the PDF reports are written to.
+        mode: One of ``MODES``.
+        system_prompt: System prompt for the company reports; None uses the
+            default prompt.
+        send_full_text: Send every page instead of the selected statement pages.
+        concurrency: Company analyses in flight at once.
+        use_cache: Answer identical requests from the response cache.
+        batch_mode: Run Standard-mode analyses through the Message Batches API.
+        reuse_reports: Skip companies whose inputs, prompt, model and settings
+            are unchanged since their report was written (Standard mode).
+        monte_carlo: Add a Monte Carlo valuation distribution to the DCF report.
+    """
+
+    input_dir: str
+    output_dir: str
+    mode: str = "Standard"
+    system_prompt: str = None
+    send_full_text: bool = False
+    concurrency: int = ANALYSIS_CONCURRENCY
+    use_cache: bool = True
+    batch_mode: bool = False
+    reuse_reports: bool = True
+    monte_carlo: bool = False
+
+    @classmethod
+    def from_session(cls):
+        """
+        Builds the configuration from the current Streamlit session.
+        """
+        import streamlit as st
+
+        state = st.session_state
+        return cls(
+            input_dir=os.path.abspath(state.bulk_dir),
+            output_dir=os.path.abspath(state.bulk_output_dir),
+            mode=state.get("analysis_mode", "Standard"),
+            system_prompt=state.get("editor_content", "") or None,
+            send_full_text=state.get("send_full_text", False),
+            concurrency=int(state.get("analysis_concurrency", ANALYSIS_CONCURRENCY)),
+            use_cache=not state.get("bypass_response_cache", False),
+            batch_mode=state.get("batch_mode", False),
+            reuse_reports=not state.get("recompute_all", False),
+            monte_carlo=state.get("monte_carlo", False),
+        )
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+def resolve_api_key(secrets_path=".streamlit/secrets.toml"):
+    """
+    Returns the Anthropic API key for runs outside a Streamlit session: the
+    ``ANTHROPIC_API_KEY`` environment variable, or the key saved from the
+    Settings page.
+
+    Returns:
+        str: API key, or an empty string if none is configured.
+    """
+    key = os.getenv("ANTHROPIC_API_KEY", "")
+    if key:
+        return key
+    try:
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f).get("ANTHROPIC_API_KEY", "")
+    except (OSError, tomllib.TOMLDecodeError):
+        return ""
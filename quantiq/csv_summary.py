@@ -0,0 +1,202 @@
+# quantiq/csv_summary.py
+
+import os
+import re
+import csv
+import pandas as pd
+from quantiq.text_utils import encode_table
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# Rows read from the CSV per pandas chunk.
+CSV_CHUNK_ROWS = int(os.getenv("QUANTIQ_CSV_CHUNK_ROWS", 100000))
+
+# Maximum number of accounts listed in the per-account totals.
+CSV_MAX_GROUPS = int(os.getenv("QUANTIQ_CSV_MAX_GROUPS", 200))
+
+ACCOUNT_COLUMN_PATTERN = re.compile(r"account|acct|\bgl\b|ledger|category|cost.?cent", re.I)
+DATE_COLUMN_PATTERN = re.compile(r"date|period|month|posted", re.I)
+IDENTIFIER_COLUMN_PATTERN = re.compile(r"\bid\b|_id\b|\bcode\b|\bno\b|number|reference|\bref\b", re.I)
+AMOUNT_COLUMN_PATTERN = re.compile(r"amount|total|balance|debit|credit|value|net", re.I)
+NUMBER_NOISE = re.compile(r"[,\s$£€]")
+
+
+def sniff_dialect(file_path, sample_bytes=64 * 1024):
+    """
+    Detects the delimiter and quoting of a CSV file from a sample of its content.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        sample_bytes (int): Number of characters sampled from the start of the file.
+
+    Returns:
+        csv.Dialect: Detected dialect, or the standard Excel dialect if detection fails.
+    """
+    with open(file_path, newline="", encoding="utf-8", errors="replace") as f:
+        sample = f.read(sample_bytes)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        return csv.excel
+
+
+def _to_numeric(series):
+    return pd.to_numeric(
+        series.astype(str).str.replace(NUMBER_NOISE, "", regex=True), errors="coerce"
+    )
+
+
+def _detect_columns(chunk):
+    """
+    Picks the numeric, account and date columns of a ledger from its first chunk.
+
+    Account and date columns are recognised by name first, so numeric account
+    codes and compact dates are grouped on rather than summed.
+
+    Returns:
+        tuple: ``(numeric_columns, account_column, date_column)``.
+    """
+    account_column = next(
+        (c for c in chunk.columns if ACCOUNT_COLUMN_PATTERN.search(str(c))), None
+    )
+    date_column = next(
+        (c for c in chunk.columns if c != account_column and DATE_COLUMN_PATTERN.search(str(c))), None
+    )
+
+    numeric_columns = []
+    text_columns = []
+    for column in chunk.columns:
+        if column in (account_column, date_column) or IDENTIFIER_COLUMN_PATTERN.search(str(column)):
+            continue
+        values = chunk[column].dropna()
+        if values.empty:
+            continue
+        if _to_numeric(values).notna().mean() >= 0.9:
+            numeric_columns.append(column)
+        else:
+            text_columns.append(column)
+
+    if date_column is None:
+        for column in text_columns:
+            parsed = pd.to_datetime(chunk[column].dropna(), errors="coerce")
+            if len(parsed) and parsed.notna().mean() >= 0.9:
+                date_column = column
+                break
+
+    # Amount-like columns first, so the account ranking uses the main amount.
+    numeric_columns.sort(key=lambda c: not AMOUNT_COLUMN_PATTERN.search(str(c)))
+    return numeric_columns, account_column, date_column
+
+
+def _format_number(value):
+    return f"{value:,.2f}" if pd.notna(value) else ""
+
+
+def summarise_csv(file_path):
+    """
+    Summarises a large CSV ledger instead of reproducing its rows.
+
+    The file is streamed in chunks of ``CSV_CHUNK_ROWS`` rows with the detected
+    dialect. The summary lists row and column counts, count/sum/min/max/mean for
+    each numeric column, totals per account (when an account-like column is
+    found) and totals per month (when a date column is found).
+
+    Args:
+        file_path (str): Path to the CSV file.
+
+    Returns:
+        str: Text summary of the ledger.
+    """
+    dialect = sniff_dialect(file_path)
+    reader = pd.read_csv(
+        file_path,
+        sep=dialect.delimiter,
+        quotechar=dialect.quotechar,
+        chunksize=CSV_CHUNK_ROWS,
+        dtype=str,
+        encoding="utf-8",
+        encoding_errors="replace",
+        skipinitialspace=True,
+    )
+
+    row_count = 0
+    columns = []
+    numeric_columns = account_column = date_column = None
+    stats = {}
+    account_totals = None
+    period_totals = None
+
+    for chunk in reader:
+        if numeric_columns is None:
+            columns = list(chunk.columns)
+            numeric_columns, account_column, date_column = _detect_columns(chunk)
+            stats = {
+                c: {"count": 0, "sum": 0.0, "min": float("inf"), "max": float("-inf")}
+                for c in numeric_columns
+            }
+
+        row_count += len(chunk)
+        numbers = pd.DataFrame({c: _to_numeric(chunk[c]) for c in numeric_columns})
+
+        for column in numeric_columns:
+            values = numbers[column].dropna()
+            if values.empty:
+                continue
+            stat = stats[column]
+            stat["count"] += len(values)
+            stat["sum"] += values.sum()
+            stat["min"] = min(stat["min"], values.min())
+            stat["max"] = max(stat["max"], values.max())
+
+        if numeric_columns and account_column is not None:
+            grouped = numbers.groupby(chunk[account_column].fillna("(blank)")).sum()
+            account_totals = grouped if account_totals is None else account_totals.add(grouped, fill_value=0)
+
+        if numeric_columns and date_column is not None:
+            periods = pd.to_datetime(chunk[date_column], errors="coerce").dt.to_period("M")
+            grouped = numbers.groupby(periods).sum()
+            period_totals = grouped if period_totals is None else period_totals.add(grouped, fill_value=0)
+
+    blocks = [
+        f"[CSV summary of {os.path.basename(file_path)}: {row_count} rows, {len(columns)} columns]",
+        "Columns: " + ", ".join(str(c) for c in columns),
+    ]
+
+    if numeric_columns:
+        rows = [["column", "count", "sum", "min", "max", "mean"]]
+        for column in numeric_columns:
+            stat = stats[column]
+            if not stat["count"]:
+                continue
+            rows.append([
+                column,
+                stat["count"],
+                _format_number(stat["sum"]),
+                _format_number(stat["min"]),
+                _format_number(stat["max"]),
+                _format_number(stat["sum"] / stat["count"]),
+            ])
+        blocks.append("Numeric columns:\n" + encode_table(rows))
+
+    if account_totals is not None and not account_totals.empty:
+        main_column = numeric_columns[0]
+        ranked = account_totals.reindex(
+            account_totals[main_column].abs().sort_values(ascending=False).index
+        )
+        shown = ranked.head(CSV_MAX_GROUPS)
+        rows = [[account_column, *numeric_columns]]
+        rows += [[account, *(_format_number(v) for v in values)] for account, values in shown.iterrows()]
+        title = f"Totals by {account_column}"
+        if len(ranked) > len(shown):
+            title += f" (top {len(shown)} of {len(ranked)} by |{main_column}|)"
+        blocks.append(f"{title}:\n" + encode_table(rows))
+
+    if period_totals is not None and not period_totals.empty:
+        rows = [["month", *numeric_columns]]
+        rows += [[str(period), *(_format_number(v) for v in values)] for period, values in period_totals.sort_index().iterrows()]
+        blocks.append(f"Totals by month of {date_column}:\n" + encode_table(rows))
+
+    logger.info(f"Summarised CSV {file_path}: {row_count} rows")
+    return "\n".join(blocks) + "\n"
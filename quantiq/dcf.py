@@ -1,13 +1,37 @@
 # quantiq/dcf.py
 
 import os
-import streamlit as st
-from quantiq.file_handler import ingest_files
+import math
+from html import escape
+from itertools import chain
+import numpy as np
+from quantiq.config import RunConfig
+from quantiq.dcf_engine import (
+    ASSUMPTIONS_TOOL,
+    BALANCE_SHEET_ITEMS,
+    CASH_FLOW_ITEMS,
+    FINANCIALS_TOOL,
+    INCOME_STATEMENT_ITEMS,
+    Assumptions,
+    Financials,
+    run_dcf,
+    simulate_dcf,
+)
+from quantiq.file_handler import PAGE_SELECTION_BUDGET_TOKENS, iter_ingest
 from quantiq.reporting import html_to_pdf
+from quantiq.llm import cached_system, cached_text
+from quantiq.progress import StreamlitReporter
 from quantiq.logging_setup import set_logging
 
 logger = set_logging()
 
+# Output budget of each DCF turn. The model returns only structured data and
+# short rationale; the engine computes the valuation.
+DCF_MAX_TOKENS = int(os.getenv("QUANTIQ_DCF_MAX_TOKENS", 2048))
+
+# Extraction turns before giving up on a model that keeps skipping step 1.
+_EXTRACTION_ATTEMPTS = 2
+
 
 def _collect_files(bulk_dir):
     """Collect all processable files from bulk_dir and its subdirectories."""
@@ -26,69 +50,444 @@ def _load_prompt(path):
     return ""
 
 
-def run_dcf_analysis(client):
-    bulk_dir = st.session_state.bulk_dir
-    output_dir = st.session_state.bulk_output_dir
+def _tool_use(response, name):
+    """Returns the response's call of tool ``name``, or None."""
+    for block in response.content:
+        if block.type == "tool_use" and block.name == name:
+            return block
+    return None
+
+
+def _tool_results(response, content="Recorded.", is_error=False):
+    """Returns a tool_result block answering each tool call of ``response``."""
+    results = []
+    for block in response.content:
+        if block.type == "tool_use":
+            result = {"type": "tool_result", "tool_use_id": block.id, "content": content}
+            if is_error:
+                result["is_error"] = True
+            results.append(result)
+    return results
+
+
+def _content_blocks(response):
+    """Returns a response's content as request blocks, to replay it as the assistant turn."""
+    blocks = []
+    for block in response.content:
+        if block.type == "text":
+            blocks.append({"type": "text", "text": block.text})
+        elif block.type == "tool_use":
+            blocks.append({"type": "tool_use", "id": block.id, "name": block.name, "input": block.input})
+    return blocks
+
+
+def _amount(value):
+    if value is None or math.isnan(value):
+        return "N/A"
+    return f"{value:,.1f}" if abs(value) < 1000 else f"{value:,.0f}"
+
+
+def _percent(value):
+    if value is None or math.isnan(value):
+        return "N/A"
+    return f"{value:.1%}"
+
+
+def _table(header, rows):
+    head = "".join(f"<th>{escape(str(cell))}</th>" for cell in header)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>\n" for row in rows
+    )
+    return f'<table border="1">\n<thead><tr>{head}</tr></thead>\n<tbody>\n{body}</tbody>\n</table>\n'
+
+
+def _extraction_html(financials):
+    """Renders the extracted financials as the report's data tables."""
+    years = financials.years
+    units = " ".join(part for part in (financials.currency, financials.units) if part)
+    html = f"<p>Amounts in {escape(units)}.</p>\n" if units else ""
+
+    def series_rows(items):
+        return [
+            [escape(label)]
+            + [(_percent if name == "effective_tax_rate" else _amount)(value) for value in financials.series[name]]
+            for name, label in items
+        ]
+
+    html += "<h2>Income Statement Data</h2>\n" + _table(["Line Item", *years], series_rows(INCOME_STATEMENT_ITEMS))
+    html += "<h2>Balance Sheet Data</h2>\n" + _table(
+        ["Line Item", "Most Recent Year"],
+        [[escape(label), _amount(financials.balance_sheet[name])] for name, label in BALANCE_SHEET_ITEMS],
+    )
+    html += "<h2>Cash Flow Data</h2>\n" + _table(["Line Item", *years], series_rows(CASH_FLOW_ITEMS))
+    if financials.notes:
+        html += f"<p><em>Notes:</em> {escape(financials.notes)}</p>\n"
+    return html
+
+
+_SHOCK_LABELS = {
+    "revenue_growth": "Revenue growth",
+    "ebitda_margin": "EBITDA margin",
+    "wacc": "WACC",
+    "terminal_growth": "Terminal growth",
+}
+
+
+def _histogram_svg(simulation, base_value, width=640, height=220):
+    """Renders the simulated values as an inline SVG histogram with percentile markers."""
+    counts, edges = simulation.histogram
+    left, right, top, bottom = 10, 10, 18, 30
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+    peak = max(int(counts.max()), 1)
+    span = edges[-1] - edges[0] or 1.0
+    bar_width = plot_width / len(counts)
+
+    def x(value):
+        return left + (min(max(value, edges[0]), edges[-1]) - edges[0]) / span * plot_width
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="10">'
+    ]
+    for idx, count in enumerate(counts):
+        bar_height = count / peak * plot_height
+        parts.append(
+            f'<rect x="{left + idx * bar_width:.1f}" y="{top + plot_height - bar_height:.1f}" '
+            f'width="{max(bar_width - 1, 1):.1f}" height="{bar_height:.1f}" fill="#8fa8c8"/>'
+        )
+    markers = [(f"P{p}", simulation.percentiles[p], "#555") for p in (5, 50, 95)]
+    markers.append(("Base", base_value, "#c0392b"))
+    for label, value, colour in markers:
+        if math.isnan(value):
+            continue
+        parts.append(
+            f'<line x1="{x(value):.1f}" y1="{top}" x2="{x(value):.1f}" y2="{top + plot_height}" '
+            f'stroke="{colour}" stroke-width="1.5" stroke-dasharray="4 2"/>'
+            f'<text x="{x(value):.1f}" y="{top - 5}" text-anchor="middle" fill="{colour}">{label}</text>'
+        )
+    axis_y = top + plot_height
+    parts.append(f'<line x1="{left}" y1="{axis_y}" x2="{width - right}" y2="{axis_y}" stroke="#333"/>')
+    for value in np.linspace(edges[0], edges[-1], 5):
+        parts.append(
+            f'<text x="{x(value):.1f}" y="{axis_y + 14}" text-anchor="middle">{value:,.2f}</text>'
+        )
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _monte_carlo_html(simulation, result, years):
+    """Renders the Monte Carlo distribution: percentile bands and a histogram."""
+    measure = "Implied Share Price" if simulation.per_share else "Equity Value"
+    base_value = result.valuation["price_per_share" if simulation.per_share else "equity_value"]
+    fmt = (lambda value: f"{value:,.2f}") if simulation.per_share else _amount
+
+    html = "<h2>Monte Carlo Valuation</h2>\n"
+    dropped = (
+        f"; {simulation.invalid:,} with WACC at or below terminal growth were dropped" if simulation.invalid else ""
+    )
+    html += (
+        f"<p>{simulation.scenarios:,} scenarios drawn around the base case{dropped}. "
+        "Growth and margin shocks move the whole projection path together.</p>\n"
+    )
+    html += _table(
+        ["Assumption", "Shock (offset from base case)"],
+        [
+            [escape(_SHOCK_LABELS.get(name, name)), escape(_describe_distribution(spec))]
+            for name, spec in simulation.distributions.items()
+        ],
+    )
+    html += f"<h3>Distribution of {measure}</h3>\n"
+    html += _table(
+        ["Base Case", "Mean", "Std. Dev.", *(f"P{p}" for p in simulation.percentiles)],
+        [[
+            fmt(base_value),
+            fmt(simulation.mean),
+            fmt(simulation.std),
+            *(fmt(value) for value in simulation.percentiles.values()),
+        ]],
+    )
+    html += _histogram_svg(simulation, base_value)
+    html += "<h3>Free Cash Flow Percentile Bands</h3>\n"
+    html += _table(
+        ["Percentile", *years],
+        [[f"P{p}", *(_amount(value) for value in band)] for p, band in simulation.fcf_bands.items()],
+    )
+    return html
+
+
+def _describe_distribution(spec):
+    kind = spec.get("distribution", "normal")
+    if kind == "normal":
+        mean = f"mean {spec['mean']:+.2%}, " if spec.get("mean") else ""
+        return f"Normal, {mean}sd {spec['sd']:.2%}"
+    if kind == "uniform":
+        return f"Uniform, {spec['low']:+.2%} to {spec['high']:+.2%}"
+    if kind == "triangular":
+        return f"Triangular, {spec['low']:+.2%} / {spec.get('mode', 0.0):+.2%} / {spec['high']:+.2%}"
+    return "Fixed at the base case"
+
+
+def _valuation_html(financials, assumptions, result, simulation=None):
+    """Renders the computed DCF valuation with the model's rationale."""
+    wacc = result.wacc
+    projection = result.projection
+    years = [f"Year {year}" for year in range(1, len(projection["revenue"]) + 1)]
+
+    html = "<h2>WACC Calculation</h2>\n" + _table(
+        ["Component", "Value"],
+        [
+            ["Risk-Free Rate", _percent(assumptions.risk_free_rate)],
+            ["Equity Risk Premium", _percent(assumptions.equity_risk_premium)],
+            ["Beta", f"{assumptions.beta:.2f}"],
+            ["Cost of Equity", _percent(wacc["cost_of_equity"])],
+            ["Cost of Debt (pre-tax)", _percent(assumptions.pre_tax_cost_of_debt)],
+            ["Tax Rate", _percent(assumptions.tax_rate)],
+            ["Cost of Debt (after-tax)", _percent(wacc["after_tax_cost_of_debt"])],
+            ["Debt Weight", _percent(wacc["debt_weight"])],
+            ["Equity Weight", _percent(wacc["equity_weight"])],
+            ["<strong>WACC</strong>", f"<strong>{_percent(wacc['wacc'])}</strong>"],
+        ],
+    )
+    if assumptions.rationale:
+        html += "<h3>Assumptions</h3>\n" + _table(
+            ["Assumption", "Rationale"],
+            [[escape(item["assumption"]), escape(item.get("reason", ""))] for item in assumptions.rationale],
+        )
+
+    rows = [
+        ("Revenue", projection["revenue"], _amount),
+        ("Revenue Growth Rate", assumptions.revenue_growth, _percent),
+        ("EBITDA", projection["ebitda"], _amount),
+        ("EBITDA Margin", assumptions.ebitda_margin, _percent),
+        ("Less: D&A", projection["depreciation"], _amount),
+        ("EBIT", projection["ebit"], _amount),
+        ("Less: Taxes", projection["taxes"], _amount),
+        ("NOPAT", projection["nopat"], _amount),
+        ("Plus: D&A", projection["depreciation"], _amount),
+        ("Less: CapEx", projection["capex"], _amount),
+        ("Less: Change in Working Capital", projection["working_capital"], _amount),
+        ("<strong>Free Cash Flow</strong>", projection["free_cash_flow"], _amount),
+        ("Discount Factor", projection["discount_factor"], lambda value: f"{value:.4f}"),
+        ("PV of FCF", projection["present_value"], _amount),
+    ]
+    html += "<h2>Projected Free Cash Flow</h2>\n" + _table(
+        ["Item", *years], [[label, *(fmt(value) for value in values)] for label, values, fmt in rows]
+    )
+
+    terminal = result.terminal
+    html += "<h2>Terminal Value</h2>\n" + _table(
+        ["Item", "Value"],
+        [
+            ["Terminal Growth Rate", _percent(terminal["growth"])],
+            ["Terminal Year FCF", _amount(terminal["final_year_fcf"])],
+            ["Terminal Value", _amount(terminal["terminal_value"])],
+            ["PV of Terminal Value", _amount(terminal["pv_terminal_value"])],
+        ],
+    )
+
+    valuation = result.valuation
+    price = valuation["price_per_share"]
+    html += "<h2>Valuation Summary</h2>\n" + _table(
+        ["Item", "Value"],
+        [
+            ["Sum of PV of FCFs", _amount(valuation["pv_free_cash_flow"])],
+            ["PV of Terminal Value", _amount(valuation["pv_terminal_value"])],
+            ["<strong>Enterprise Value</strong>", f"<strong>{_amount(valuation['enterprise_value'])}</strong>"],
+            ["Less: Total Debt", _amount(valuation["total_debt"])],
+            ["Plus: Cash", _amount(valuation["cash"])],
+            ["<strong>Equity Value</strong>", f"<strong>{_amount(valuation['equity_value'])}</strong>"],
+            ["Shares Outstanding", _amount(valuation["shares_outstanding"])],
+            [
+                "<strong>Implied Price Per Share</strong>",
+                f"<strong>{'N/A' if math.isnan(price) else f'{price:,.2f}'}</strong>",
+            ],
+        ],
+    )
+
+    sensitivity = result.sensitivity
+    measure = "Implied Share Price" if sensitivity["per_share"] else "Equity Value"
+    fmt = (lambda value: "N/A" if math.isnan(value) else f"{value:,.2f}") if sensitivity["per_share"] else _amount
+    base_row, base_column = sensitivity["base"]
+    grid_rows = []
+    for row, rate in enumerate(sensitivity["wacc"]):
+        cells = [f"<strong>{_percent(rate)}</strong>"]
+        for column, value in enumerate(sensitivity["values"][row]):
+            cell = fmt(value)
+            cells.append(f"<strong>[{cell}]</strong>" if (row, column) == (base_row, base_column) else cell)
+        grid_rows.append(cells)
+    html += f"<h2>Sensitivity Analysis — {measure}</h2>\n"
+    html += "<p>WACC down the rows, terminal growth rate across the columns; the base case is bracketed.</p>\n"
+    html += _table(["WACC / Growth", *(_percent(rate) for rate in sensitivity["growth"])], grid_rows)
+
+    if simulation is not None:
+        html += _monte_carlo_html(simulation, result, years)
+
+    html += "<h2>Key Risks and Limitations</h2>\n<ul>\n"
+    html += "".join(f"<li>{escape(risk)}</li>\n" for risk in assumptions.risks)
+    if assumptions.data_limitations:
+        html += f"<li>{escape(assumptions.data_limitations)}</li>\n"
+    html += "</ul>\n"
+    return html
+
+
+def run_dcf_analysis(client, config=None, reporter=None):
+    config = config or RunConfig.from_session()
+    reporter = reporter or StreamlitReporter()
+    bulk_dir = config.input_dir
+    output_dir = config.output_dir
 
     file_paths = _collect_files(bulk_dir)
     if not file_paths:
-        st.error("No processable files found for DCF analysis.")
+        reporter.failure("No processable files found for DCF analysis.", fatal=True)
         return
 
     # Determine company name from first subdirectory or default
     subdirs = [d for d in os.listdir(bulk_dir) if os.path.isdir(os.path.join(bulk_dir, d))]
     company_name = subdirs[0] if subdirs else "Company"
 
-    st.text(f"Extracting financials for: {company_name}")
-    document_text = ingest_files(file_paths)
+    reporter.info(f"Extracting financials for: {company_name}")
+    page_budget = None if config.send_full_text else PAGE_SELECTION_BUDGET_TOKENS
 
-    extraction_prompt = _load_prompt("prompts/dcf_extraction.txt")
-    dcf_model_prompt = _load_prompt("prompts/dcf_model.txt")
+    # Both turns share one system prompt and the document block, so turn 2
+    # reads them from the prompt cache instead of paying for them again.
+    system = cached_system(
+        "".join(
+            [
+                "You are a financial analyst preparing a DCF valuation in two steps. "
+                "Carry out only the step you are asked for.\n\n",
+                "## Step 1: Financial data extraction\n\n",
+                _load_prompt("prompts/dcf_extraction.txt"),
+                "\n\n## Step 2: DCF valuation model\n\n",
+                _load_prompt("prompts/dcf_model.txt"),
+            ]
+        )
+    )
+
+    tools = [FINANCIALS_TOOL, ASSUMPTIONS_TOOL]
 
     # Turn 1: Extract structured financials
     messages = [
         {
             "role": "user",
-            "content": f"Extract structured financial data for {company_name} from the following documents:\n\n{document_text}",
+            "content": [
+                cached_text(
+                    "".join(
+                        chain(
+                            [f"Documents for {company_name}:\n\n"],
+                            iter_ingest(file_paths, page_budget_tokens=page_budget),
+                        )
+                    )
+                ),
+                {
+                    "type": "text",
+                    "text": f"Step 1: extract the financial data of {company_name} from the documents above "
+                    "and record it with the record_financials tool.",
+                },
+            ],
         }
     ]
 
-    response_1 = client.messages.create(
-        model="claude-sonnet-4-6",
-        max_tokens=4096,
-        system=extraction_prompt,
-        messages=messages,
-    )
-
-    extraction_html = response_1.content[0].text
+    # Both turns offer the same tools with the same tool_choice, so turn 2
+    # still hits the prompt cache for the system prompt and the documents.
+    # Parallel tool use is off so turn 1 records only the financials.
+    tool_choice = {"type": "any", "disable_parallel_tool_use": True}
+    for attempt in range(_EXTRACTION_ATTEMPTS):
+        if attempt:
+            # The model jumped ahead to the assumptions: refuse the call and
+            # ask for step 1 again, keeping the cached prefix intact.
+            logger.warning(f"Step 1 for {company_name} recorded assumptions instead of financials; asking again.")
+            messages.append({"role": "assistant", "content": _content_blocks(response_1)})
+            messages.append({
+                "role": "user",
+                "content": [
+                    *_tool_results(
+                        response_1, "Not recorded: the financial data must be extracted first.", is_error=True
+                    ),
+                    {
+                        "type": "text",
+                        "text": "This is still step 1: record the extracted financial data with the "
+                        "record_financials tool.",
+                    },
+                ],
+            })
+        response_1 = client.messages.create(
+            model="claude-sonnet-4-6",
+            max_tokens=DCF_MAX_TOKENS,
+            system=system,
+            tools=tools,
+            tool_choice=tool_choice,
+            messages=messages,
+        )
+        extraction = _tool_use(response_1, FINANCIALS_TOOL["name"])
+        if extraction is not None or _tool_use(response_1, ASSUMPTIONS_TOOL["name"]) is None:
+            break
+    if extraction is None:
+        reporter.failure(f"No financial data could be extracted for {company_name}.", fatal=True)
+        return
+    financials = Financials.from_tool_input(extraction.input)
     logger.info(f"Financial extraction complete for {company_name}")
 
-    # Turn 2: Build DCF model using extracted data
-    st.text(f"Building DCF model for: {company_name}")
+    # Turn 2: the model proposes the assumptions; the engine does the arithmetic
+    reporter.info(f"Building DCF model for: {company_name}")
 
-    messages.append({"role": "assistant", "content": extraction_html})
+    messages.append({"role": "assistant", "content": _content_blocks(response_1)})
     messages.append({
         "role": "user",
-        "content": "Using the financial data you just extracted, build a complete DCF valuation model. Include all calculations, assumptions, and sensitivity analysis.",
+        "content": [
+            *_tool_results(response_1),
+            {
+                "type": "text",
+                "text": "Step 2: using the financial data you just extracted, record the DCF assumptions "
+                "with the record_assumptions tool.",
+            },
+        ],
     })
 
     response_2 = client.messages.create(
         model="claude-sonnet-4-6",
-        max_tokens=8192,
-        system=dcf_model_prompt,
+        max_tokens=DCF_MAX_TOKENS,
+        system=system,
+        tools=tools,
+        tool_choice=tool_choice,
         messages=messages,
     )
+    proposal = _tool_use(response_2, ASSUMPTIONS_TOOL["name"])
+    if proposal is None:
+        reporter.failure(f"No DCF assumptions were returned for {company_name}.", fatal=True)
+        return
+    assumptions = Assumptions.from_tool_input(proposal.input)
 
-    dcf_html = response_2.content[0].text
+    try:
+        result = run_dcf(financials, assumptions)
+    except ValueError as e:
+        reporter.failure(f"DCF valuation failed for {company_name}: {e}", fatal=True)
+        return
     logger.info(f"DCF model complete for {company_name}")
 
+    simulation = None
+    if config.monte_carlo:
+        try:
+            simulation = simulate_dcf(financials, assumptions)
+        except (OSError, ValueError) as e:
+            reporter.failure(f"Monte Carlo valuation failed for {company_name}: {e}", fatal=True)
+            return
+        reporter.info(
+            f"Simulated {simulation.scenarios:,} scenarios in {simulation.seconds * 1000:.0f} ms "
+            f"(median {simulation.percentiles[50]:,.2f})."
+        )
+
     # Combine extraction + DCF into single PDF
     combined_html = f"<h1>{company_name} — Financial Data Extraction</h1>\n"
-    combined_html += extraction_html
+    combined_html += _extraction_html(financials)
     combined_html += '<div class="page-break"></div>\n'
     combined_html += f"<h1>{company_name} — DCF Valuation Model</h1>\n"
-    combined_html += dcf_html
+    combined_html += _valuation_html(financials, assumptions, result, simulation)
 
     output_filename = f"{company_name}_dcf_valuation.pdf"
-    html_to_pdf(combined_html, output_filename, output_dir)
+    try:
+        html_to_pdf(combined_html, output_filename, output_dir)
+    except Exception as e:
+        reporter.failure(f"Could not render the DCF report for {company_name}: {e}", fatal=True)
+        return
     logger.info(f"DCF report generated: {output_filename}")
@@ -0,0 +1,695 @@
+# quantiq/dcf_engine.py
+"""
+Deterministic DCF valuation.
+
+The model extracts the historical financials and proposes the valuation
+assumptions; every number derived from them (WACC, projected free cash flow,
+terminal value, equity value and the sensitivity table) is computed here with
+NumPy. The calculations broadcast over leading dimensions, so the same
+functions value one scenario or many at once.
+"""
+
+import os
+import json
+import math
+import time
+from dataclasses import dataclass, field
+import numpy as np
+
+# Years projected explicitly before the terminal value.
+PROJECTION_YEARS = 5
+
+# Sensitivity table: WACC from base - spread to base + spread, terminal
+# growth over GROWTH_RANGE, both in STEP increments. The base case is always
+# part of the grid.
+SENSITIVITY_WACC_SPREAD = 0.02
+SENSITIVITY_GROWTH_RANGE = (0.01, 0.04)
+SENSITIVITY_STEP = 0.005
+
+# Monte Carlo mode: scenarios per run, RNG seed (fixed, so a re-run
+# reproduces the report), and an optional JSON file overriding
+# DEFAULT_DISTRIBUTIONS.
+MONTE_CARLO_SCENARIOS = int(os.getenv("QUANTIQ_MONTE_CARLO_SCENARIOS", 100000))
+MONTE_CARLO_SEED = int(os.getenv("QUANTIQ_MONTE_CARLO_SEED", 0))
+MONTE_CARLO_CONFIG = os.getenv("QUANTIQ_MONTE_CARLO_CONFIG", "")
+
+# Shocks applied to the base-case assumptions, as offsets in decimal points.
+# The growth and margin shocks move the whole five-year path together.
+DEFAULT_DISTRIBUTIONS = {
+    "revenue_growth": {"distribution": "normal", "sd": 0.02},
+    "ebitda_margin": {"distribution": "normal", "sd": 0.015},
+    "wacc": {"distribution": "normal", "sd": 0.01},
+    "terminal_growth": {"distribution": "triangular", "low": -0.01, "mode": 0.0, "high": 0.005},
+}
+
+# Percentiles reported for the simulated values.
+MONTE_CARLO_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Historical line items, in report order: (field, label).
+INCOME_STATEMENT_ITEMS = [
+    ("revenue", "Revenue"),
+    ("cogs", "Cost of Goods Sold (COGS)"),
+    ("gross_profit", "Gross Profit"),
+    ("operating_expenses", "Operating Expenses"),
+    ("ebitda", "EBITDA"),
+    ("depreciation_amortization", "Depreciation & Amortization"),
+    ("ebit", "EBIT"),
+    ("interest_expense", "Interest Expense"),
+    ("net_income", "Net Income"),
+    ("effective_tax_rate", "Effective Tax Rate"),
+]
+CASH_FLOW_ITEMS = [
+    ("capital_expenditures", "Capital Expenditures"),
+    ("change_in_working_capital", "Change in Working Capital"),
+    ("operating_cash_flow", "Operating Cash Flow"),
+    ("free_cash_flow", "Free Cash Flow"),
+]
+BALANCE_SHEET_ITEMS = [
+    ("total_debt", "Total Debt"),
+    ("cash", "Cash & Equivalents"),
+    ("total_equity", "Total Equity"),
+    ("current_assets", "Current Assets"),
+    ("current_liabilities", "Current Liabilities"),
+    ("shares_outstanding", "Shares Outstanding"),
+]
+
+_NUMBER = {"type": ["number", "null"]}
+_SERIES = {"type": "array", "items": _NUMBER}
+
+# Scales the share count may be stated in, and the words that name them in
+# the free-text units of the amounts.
+SHARE_UNITS = {"units": 1.0, "thousands": 1e3, "millions": 1e6, "billions": 1e9}
+_SCALE_WORDS = [("billion", 1e9), ("million", 1e6), ("thousand", 1e3)]
+
+# Tool schema the model fills in with the extracted financials.
+FINANCIALS_TOOL = {
+    "name": "record_financials",
+    "description": "Record the historical financial data extracted from the documents.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "currency": {"type": "string", "description": "Currency code, e.g. USD"},
+            "units": {"type": "string", "description": "Units of all amounts, e.g. thousands"},
+            "years": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Fiscal year labels, oldest first; every series follows this order",
+            },
+            **{name: _SERIES for name, _ in INCOME_STATEMENT_ITEMS + CASH_FLOW_ITEMS},
+            **{name: _NUMBER for name, _ in BALANCE_SHEET_ITEMS},
+            "shares_units": {
+                "type": "string",
+                "enum": list(SHARE_UNITS),
+                "description": "Units of shares_outstanding as reported, which may differ from the amounts "
+                "(e.g. amounts in thousands, shares in millions)",
+            },
+            "notes": {
+                "type": "string",
+                "description": "Values that were derived rather than reported, and other caveats",
+            },
+        },
+        "required": ["currency", "units", "years", "revenue"],
+    },
+}
+
+# Tool schema the model fills in with the valuation assumptions and narrative.
+ASSUMPTIONS_TOOL = {
+    "name": "record_assumptions",
+    "description": "Record the DCF assumptions and their rationale. Rates are decimals (0.05 for 5%).",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "risk_free_rate": {"type": "number"},
+            "equity_risk_premium": {"type": "number"},
+            "beta": {"type": "number"},
+            "pre_tax_cost_of_debt": {"type": "number"},
+            "tax_rate": {"type": "number"},
+            "debt_weight": {
+                "type": "number",
+                "description": "Target debt / (debt + equity); used only when the balance sheet lacks debt or equity",
+            },
+            "revenue_growth": {
+                "type": "array",
+                "items": {"type": "number"},
+                "description": "One growth rate per projected year",
+            },
+            "ebitda_margin": {
+                "type": "array",
+                "items": {"type": "number"},
+                "description": "One margin per projected year",
+            },
+            "depreciation_pct_revenue": {"type": "number"},
+            "capex_pct_revenue": {"type": "number"},
+            "working_capital_pct_revenue_change": {
+                "type": "number",
+                "description": "Increase in working capital per unit of revenue growth",
+            },
+            "terminal_growth": {"type": "number"},
+            "rationale": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"assumption": {"type": "string"}, "reason": {"type": "string"}},
+                    "required": ["assumption", "reason"],
+                },
+            },
+            "risks": {"type": "array", "items": {"type": "string"}},
+            "data_limitations": {"type": "string"},
+        },
+        "required": [
+            "risk_free_rate",
+            "equity_risk_premium",
+            "beta",
+            "pre_tax_cost_of_debt",
+            "tax_rate",
+            "revenue_growth",
+            "ebitda_margin",
+            "depreciation_pct_revenue",
+            "capex_pct_revenue",
+            "working_capital_pct_revenue_change",
+            "terminal_growth",
+        ],
+    },
+}
+
+
+def _number(value):
+    """
+    Converts a model-supplied value to float, or NaN when it is missing.
+    """
+    if isinstance(value, str):
+        value = value.replace(",", "").strip()
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number
+
+
+def _series(values, length):
+    series = np.full(length, np.nan)
+    for idx, value in enumerate((values or [])[:length]):
+        series[idx] = _number(value)
+    return series
+
+
+def _amount_scale(units):
+    """
+    Returns the multiplier named by the free-text units of the amounts
+    (1 when they name none, e.g. "USD").
+    """
+    units = (units or "").lower()
+    for word, scale in _SCALE_WORDS:
+        if word in units:
+            return scale
+    return 1.0
+
+
+def _per_year(values, years=PROJECTION_YEARS):
+    """
+    Returns one value per projected year: a scalar is repeated and a short
+    list is extended with its last value.
+    """
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    values = [_number(v) for v in values] or [math.nan]
+    values = values[:years] + [values[-1]] * max(0, years - len(values))
+    return np.array(values)
+
+
+@dataclass
+class Financials:
+    """
+    Historical financials extracted from the documents.
+
+    Attributes:
+        years: Fiscal year labels, oldest first.
+        series: Per-year values (NaN when not reported) by field name.
+        balance_sheet: Most recent balance sheet values by field name. The
+            share count is converted to the units of the amounts, so equity
+            value divided by it is a price per share.
+    """
+
+    years: list
+    currency: str = ""
+    units: str = ""
+    notes: str = ""
+    series: dict = field(default_factory=dict)
+    balance_sheet: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_tool_input(cls, data):
+        years = [str(year) for year in data.get("years") or []]
+        balance_sheet = {name: _number(data.get(name)) for name, _ in BALANCE_SHEET_ITEMS}
+        shares_units = data.get("shares_units")
+        if shares_units in SHARE_UNITS:
+            balance_sheet["shares_outstanding"] *= SHARE_UNITS[shares_units] / _amount_scale(data.get("units"))
+        return cls(
+            years=years,
+            currency=data.get("currency") or "",
+            units=data.get("units") or "",
+            notes=data.get("notes") or "",
+            series={
+                name: _series(data.get(name), len(years))
+                for name, _ in INCOME_STATEMENT_ITEMS + CASH_FLOW_ITEMS
+            },
+            balance_sheet=balance_sheet,
+        )
+
+    def latest(self, name):
+        """
+        Returns the most recent reported value of a series, or NaN.
+        """
+        values = self.series.get(name, np.array([]))
+        reported = values[~np.isnan(values)]
+        return float(reported[-1]) if reported.size else math.nan
+
+
+@dataclass
+class Assumptions:
+    """
+    Valuation assumptions proposed by the model. Rates are decimals; the
+    growth and margin paths hold one value per projected year.
+    """
+
+    risk_free_rate: float
+    equity_risk_premium: float
+    beta: float
+    pre_tax_cost_of_debt: float
+    tax_rate: float
+    revenue_growth: np.ndarray
+    ebitda_margin: np.ndarray
+    depreciation_pct_revenue: float
+    capex_pct_revenue: float
+    working_capital_pct_revenue_change: float
+    terminal_growth: float
+    debt_weight: float = math.nan
+    rationale: list = field(default_factory=list)
+    risks: list = field(default_factory=list)
+    data_limitations: str = ""
+
+    @classmethod
+    def from_tool_input(cls, data):
+        return cls(
+            risk_free_rate=_number(data.get("risk_free_rate")),
+            equity_risk_premium=_number(data.get("equity_risk_premium")),
+            beta=_number(data.get("beta")),
+            pre_tax_cost_of_debt=_number(data.get("pre_tax_cost_of_debt")),
+            tax_rate=_number(data.get("tax_rate")),
+            revenue_growth=_per_year(data.get("revenue_growth")),
+            ebitda_margin=_per_year(data.get("ebitda_margin")),
+            depreciation_pct_revenue=_number(data.get("depreciation_pct_revenue")),
+            capex_pct_revenue=_number(data.get("capex_pct_revenue")),
+            working_capital_pct_revenue_change=_number(data.get("working_capital_pct_revenue_change")),
+            terminal_growth=_number(data.get("terminal_growth")),
+            debt_weight=_number(data.get("debt_weight")),
+            rationale=[
+                item for item in data.get("rationale") or []
+                if isinstance(item, dict) and item.get("assumption")
+            ],
+            risks=[str(risk) for risk in data.get("risks") or []],
+            data_limitations=data.get("data_limitations") or "",
+        )
+
+
+@dataclass
+class DCFResult:
+    """
+    Every figure of a DCF valuation. ``projection`` holds per-year arrays,
+    ``sensitivity`` the implied share price (or equity value when the share
+    count is unknown) for each WACC row and terminal growth column.
+    """
+
+    wacc: dict
+    projection: dict
+    terminal: dict
+    valuation: dict
+    sensitivity: dict
+
+
+def cost_of_capital(assumptions, financials):
+    """
+    Computes the WACC from CAPM and the balance sheet debt weight.
+
+    Returns:
+        dict: ``cost_of_equity``, ``after_tax_cost_of_debt``, ``debt_weight``,
+            ``equity_weight`` and ``wacc``.
+    """
+    cost_of_equity = assumptions.risk_free_rate + assumptions.beta * assumptions.equity_risk_premium
+    after_tax_cost_of_debt = assumptions.pre_tax_cost_of_debt * (1 - assumptions.tax_rate)
+
+    debt = financials.balance_sheet.get("total_debt", math.nan)
+    equity = financials.balance_sheet.get("total_equity", math.nan)
+    if debt >= 0 and equity > 0:
+        debt_weight = debt / (debt + equity)
+    elif not math.isnan(assumptions.debt_weight):
+        debt_weight = min(max(assumptions.debt_weight, 0.0), 1.0)
+    else:
+        debt_weight = 0.0
+
+    return {
+        "cost_of_equity": cost_of_equity,
+        "after_tax_cost_of_debt": after_tax_cost_of_debt,
+        "debt_weight": debt_weight,
+        "equity_weight": 1 - debt_weight,
+        "wacc": (1 - debt_weight) * cost_of_equity + debt_weight * after_tax_cost_of_debt,
+    }
+
+
+def project_free_cash_flow(
+    base_revenue, revenue_growth, ebitda_margin, depreciation_pct, capex_pct, working_capital_pct, tax_rate
+):
+    """
+    Projects unlevered free cash flow.
+
+    Per-year inputs have the projection years as their last axis; scalar
+    inputs may carry the same leading (scenario) dimensions.
+
+    Returns:
+        dict: Arrays ``revenue``, ``ebitda``, ``depreciation``, ``ebit``,
+            ``taxes``, ``nopat``, ``capex``, ``working_capital`` and
+            ``free_cash_flow``.
+    """
+    base_revenue = np.asarray(base_revenue, dtype=float)[..., None]
+    revenue = base_revenue * np.cumprod(1 + np.asarray(revenue_growth, dtype=float), axis=-1)
+    previous = np.concatenate([np.broadcast_to(base_revenue, revenue[..., :1].shape), revenue[..., :-1]], axis=-1)
+
+    ebitda = revenue * np.asarray(ebitda_margin, dtype=float)
+    depreciation = revenue * np.asarray(depreciation_pct, dtype=float)[..., None]
+    ebit = ebitda - depreciation
+    taxes = np.maximum(ebit, 0) * np.asarray(tax_rate, dtype=float)[..., None]
+    nopat = ebit - taxes
+    capex = revenue * np.asarray(capex_pct, dtype=float)[..., None]
+    working_capital = (revenue - previous) * np.asarray(working_capital_pct, dtype=float)[..., None]
+
+    return {
+        "revenue": revenue,
+        "ebitda": ebitda,
+        "depreciation": depreciation,
+        "ebit": ebit,
+        "taxes": taxes,
+        "nopat": nopat,
+        "capex": capex,
+        "working_capital": working_capital,
+        "free_cash_flow": nopat + depreciation - capex - working_capital,
+    }
+
+
+def discount(free_cash_flow, wacc, terminal_growth):
+    """
+    Discounts projected free cash flow (end-of-year convention) and adds a
+    Gordon growth terminal value.
+
+    The terminal value is NaN where WACC does not exceed terminal growth.
+
+    Returns:
+        dict: ``discount_factor`` and ``present_value`` per year, plus
+            ``terminal_value``, ``pv_terminal_value``, ``pv_free_cash_flow``
+            and ``enterprise_value``.
+    """
+    free_cash_flow = np.asarray(free_cash_flow, dtype=float)
+    wacc = np.asarray(wacc, dtype=float)
+    terminal_growth = np.asarray(terminal_growth, dtype=float)
+    years = np.arange(1, free_cash_flow.shape[-1] + 1)
+
+    discount_factor = (1 + wacc[..., None]) ** -years
+    present_value = free_cash_flow * discount_factor
+    spread = wacc - terminal_growth
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terminal_value = np.where(
+            spread > 0, free_cash_flow[..., -1] * (1 + terminal_growth) / spread, np.nan
+        )
+    pv_terminal_value = terminal_value * discount_factor[..., -1]
+    pv_free_cash_flow = present_value.sum(axis=-1)
+
+    return {
+        "discount_factor": discount_factor,
+        "present_value": present_value,
+        "terminal_value": terminal_value,
+        "pv_terminal_value": pv_terminal_value,
+        "pv_free_cash_flow": pv_free_cash_flow,
+        "enterprise_value": pv_free_cash_flow + pv_terminal_value,
+    }
+
+
+def equity_bridge(enterprise_value, total_debt, cash, shares_outstanding):
+    """
+    Returns ``(equity_value, price_per_share)``; the price is NaN when the
+    share count is unknown.
+    """
+    equity_value = enterprise_value - np.nan_to_num(total_debt) + np.nan_to_num(cash)
+    if shares_outstanding > 0:
+        return equity_value, equity_value / shares_outstanding
+    return equity_value, np.full_like(np.asarray(equity_value, dtype=float), np.nan)
+
+
+def _grid(low, high, base):
+    steps = int(round((high - low) / SENSITIVITY_STEP))
+    grid = low + SENSITIVITY_STEP * np.arange(steps + 1)
+    return np.unique(np.round(np.append(grid, base), 6))
+
+
+def run_dcf(financials, assumptions):
+    """
+    Values a company from its extracted financials and the model's
+    assumptions.
+
+    Args:
+        financials (Financials): Historical data; the latest revenue is the
+            base of the projection.
+        assumptions (Assumptions): Rates and paths for the projection.
+
+    Returns:
+        DCFResult: All figures of the valuation.
+
+    Raises:
+        ValueError: If there is no revenue to project from, an assumption is
+            missing, or WACC does not exceed the terminal growth rate.
+    """
+    base_revenue = financials.latest("revenue")
+    if math.isnan(base_revenue):
+        raise ValueError("No historical revenue was extracted, so cash flows cannot be projected.")
+    missing = [
+        name for name, value in vars(assumptions).items()
+        if isinstance(value, (float, np.ndarray)) and name != "debt_weight" and np.isnan(value).any()
+    ]
+    if missing:
+        raise ValueError(f"Missing assumptions: {', '.join(missing)}.")
+
+    wacc = cost_of_capital(assumptions, financials)
+    if wacc["wacc"] <= assumptions.terminal_growth:
+        raise ValueError(
+            f"WACC ({wacc['wacc']:.2%}) must exceed the terminal growth rate ({assumptions.terminal_growth:.2%})."
+        )
+
+    projection = project_free_cash_flow(
+        base_revenue,
+        assumptions.revenue_growth,
+        assumptions.ebitda_margin,
+        assumptions.depreciation_pct_revenue,
+        assumptions.capex_pct_revenue,
+        assumptions.working_capital_pct_revenue_change,
+        assumptions.tax_rate,
+    )
+    discounted = discount(projection["free_cash_flow"], wacc["wacc"], assumptions.terminal_growth)
+    projection["discount_factor"] = discounted["discount_factor"]
+    projection["present_value"] = discounted["present_value"]
+
+    balance_sheet = financials.balance_sheet
+    shares = balance_sheet.get("shares_outstanding", math.nan)
+    equity_value, price = equity_bridge(
+        discounted["enterprise_value"], balance_sheet.get("total_debt"), balance_sheet.get("cash"), shares
+    )
+
+    # Sensitivity: WACC down the rows, terminal growth across the columns.
+    wacc_grid = _grid(wacc["wacc"] - SENSITIVITY_WACC_SPREAD, wacc["wacc"] + SENSITIVITY_WACC_SPREAD, wacc["wacc"])
+    growth_grid = _grid(*SENSITIVITY_GROWTH_RANGE, assumptions.terminal_growth)
+    grid = discount(projection["free_cash_flow"], wacc_grid[:, None], growth_grid[None, :])
+    grid_equity, grid_price = equity_bridge(
+        grid["enterprise_value"], balance_sheet.get("total_debt"), balance_sheet.get("cash"), shares
+    )
+
+    return DCFResult(
+        wacc=wacc,
+        projection=projection,
+        terminal={
+            "growth": assumptions.terminal_growth,
+            "final_year_fcf": float(projection["free_cash_flow"][-1]),
+            "terminal_value": float(discounted["terminal_value"]),
+            "pv_terminal_value": float(discounted["pv_terminal_value"]),
+        },
+        valuation={
+            "pv_free_cash_flow": float(discounted["pv_free_cash_flow"]),
+            "pv_terminal_value": float(discounted["pv_terminal_value"]),
+            "enterprise_value": float(discounted["enterprise_value"]),
+            "total_debt": balance_sheet.get("total_debt", math.nan),
+            "cash": balance_sheet.get("cash", math.nan),
+            "equity_value": float(equity_value),
+            "shares_outstanding": shares,
+            "price_per_share": float(price),
+        },
+        sensitivity={
+            "wacc": wacc_grid,
+            "growth": growth_grid,
+            "values": grid_price if shares > 0 else grid_equity,
+            "per_share": bool(shares > 0),
+            "base": (
+                int(np.argmin(np.abs(wacc_grid - wacc["wacc"]))),
+                int(np.argmin(np.abs(growth_grid - assumptions.terminal_growth))),
+            ),
+        },
+    )
+
+
+def _draw(rng, spec, size):
+    """
+    Draws ``size`` offsets from one distribution spec.
+    """
+    kind = spec.get("distribution", "normal")
+    if kind == "normal":
+        return rng.normal(spec.get("mean", 0.0), spec["sd"], size)
+    if kind == "uniform":
+        return rng.uniform(spec["low"], spec["high"], size)
+    if kind == "triangular":
+        return rng.triangular(spec["low"], spec.get("mode", 0.0), spec["high"], size)
+    if kind == "fixed":
+        return np.zeros(size)
+    raise ValueError(f"Unknown distribution '{kind}'.")
+
+
+def load_distributions(path=None):
+    """
+    Returns the Monte Carlo distributions: ``DEFAULT_DISTRIBUTIONS`` updated
+    with the entries of the JSON file at ``path`` (default
+    ``QUANTIQ_MONTE_CARLO_CONFIG``), e.g.
+    ``{"wacc": {"distribution": "uniform", "low": -0.015, "high": 0.015}}``.
+
+    Raises:
+        ValueError: If the file names an unknown assumption or distribution,
+            or lacks a parameter.
+    """
+    distributions = {name: dict(spec) for name, spec in DEFAULT_DISTRIBUTIONS.items()}
+    path = MONTE_CARLO_CONFIG if path is None else path
+    if not path:
+        return distributions
+    with open(path, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    for name, spec in overrides.items():
+        if name not in distributions:
+            raise ValueError(f"Unknown Monte Carlo assumption '{name}'.")
+        try:
+            _draw(np.random.default_rng(0), spec, 1)
+        except KeyError as e:
+            raise ValueError(f"Distribution of '{name}' lacks parameter {e}.")
+        distributions[name] = spec
+    return distributions
+
+
+@dataclass
+class MonteCarloResult:
+    """
+    Distribution of simulated valuations.
+
+    Attributes:
+        values: Implied share price (or equity value when the share count is
+            unknown) of every valid scenario.
+        percentiles: Value at each of ``MONTE_CARLO_PERCENTILES``.
+        fcf_bands: P10, P50 and P90 of free cash flow per projected year.
+        histogram: ``(counts, edges)`` over the 0.5th-99.5th percentile range.
+        invalid: Scenarios dropped because WACC did not exceed terminal growth.
+    """
+
+    scenarios: int
+    values: np.ndarray
+    per_share: bool
+    percentiles: dict
+    mean: float
+    std: float
+    fcf_bands: dict
+    histogram: tuple
+    invalid: int
+    distributions: dict
+    seconds: float
+
+
+def simulate_dcf(financials, assumptions, scenarios=None, distributions=None, seed=None):
+    """
+    Values the company under many randomly drawn assumption sets at once.
+
+    Revenue growth, EBITDA margin, WACC and terminal growth are shocked around
+    the base case by the given distributions; all scenarios go through the
+    same vectorised projection and discounting as ``run_dcf``.
+
+    Args:
+        financials (Financials): Historical data.
+        assumptions (Assumptions): Base-case assumptions.
+        scenarios (int): Number of scenarios; defaults to ``MONTE_CARLO_SCENARIOS``.
+        distributions (dict): Offsets per assumption; defaults to ``load_distributions()``.
+        seed (int): RNG seed; defaults to ``MONTE_CARLO_SEED``.
+
+    Returns:
+        MonteCarloResult: The simulated distribution.
+
+    Raises:
+        ValueError: If the base case cannot be valued (see ``run_dcf``) or no
+            scenario is valid.
+    """
+    started = time.perf_counter()
+    scenarios = MONTE_CARLO_SCENARIOS if scenarios is None else scenarios
+    distributions = load_distributions() if distributions is None else distributions
+    rng = np.random.default_rng(MONTE_CARLO_SEED if seed is None else seed)
+
+    base_revenue = financials.latest("revenue")
+    if math.isnan(base_revenue):
+        raise ValueError("No historical revenue was extracted, so cash flows cannot be projected.")
+    base_wacc = cost_of_capital(assumptions, financials)["wacc"]
+
+    growth = np.maximum(
+        assumptions.revenue_growth + _draw(rng, distributions["revenue_growth"], scenarios)[:, None], -0.99
+    )
+    margin = assumptions.ebitda_margin + _draw(rng, distributions["ebitda_margin"], scenarios)[:, None]
+    wacc = base_wacc + _draw(rng, distributions["wacc"], scenarios)
+    terminal_growth = assumptions.terminal_growth + _draw(rng, distributions["terminal_growth"], scenarios)
+
+    projection = project_free_cash_flow(
+        base_revenue,
+        growth,
+        margin,
+        assumptions.depreciation_pct_revenue,
+        assumptions.capex_pct_revenue,
+        assumptions.working_capital_pct_revenue_change,
+        assumptions.tax_rate,
+    )
+    discounted = discount(projection["free_cash_flow"], wacc, terminal_growth)
+
+    balance_sheet = financials.balance_sheet
+    shares = balance_sheet.get("shares_outstanding", math.nan)
+    equity_value, price = equity_bridge(
+        discounted["enterprise_value"], balance_sheet.get("total_debt"), balance_sheet.get("cash"), shares
+    )
+    per_share = bool(shares > 0)
+    values = price if per_share else equity_value
+
+    valid = (wacc > 0) & np.isfinite(values)
+    if not valid.any():
+        raise ValueError("No simulated scenario has a WACC above its terminal growth rate.")
+    values = values[valid]
+
+    percentiles = dict(zip(MONTE_CARLO_PERCENTILES, np.percentile(values, MONTE_CARLO_PERCENTILES)))
+    low, high = np.percentile(values, [0.5, 99.5])
+    fcf = projection["free_cash_flow"][valid]
+    bands = np.percentile(fcf, [10, 50, 90], axis=0)
+
+    return MonteCarloResult(
+        scenarios=scenarios,
+        values=values,
+        per_share=per_share,
+        percentiles={p: float(v) for p, v in percentiles.items()},
+        mean=float(values.mean()),
+        std=float(values.std()),
+        fcf_bands={10: bands[0], 50: bands[1], 90: bands[2]},
+        histogram=np.histogram(values, bins=40, range=(low, high)),
+        invalid=int(scenarios - valid.sum()),
+        distributions=distributions,
+        seconds=time.perf_counter() - started,
+    )
@@ -0,0 +1,143 @@
+# quantiq/disk_cache.py
+
+import os
+import json
+import time
+import zlib
+import threading
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# One eviction at a time per cache directory.
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _directory_lock(directory):
+    with _locks_lock:
+        return _locks.setdefault(os.path.abspath(directory), threading.Lock())
+
+
+class CompressedCache:
+    """
+    Directory of zlib-compressed JSON entries, bounded in size.
+
+    A hit refreshes the entry's modification time, which is what the LRU
+    eviction orders by. With ``ttl_seconds``, an entry is served only for that
+    long after it was stored, and eviction deletes entries not read since
+    then. Unreadable entries are deleted and count as misses.
+    """
+
+    def __init__(self, directory, max_bytes, ttl_seconds=None, label="cache"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.label = label
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json.z")
+
+    def get(self, key):
+        """
+        Returns the value stored under ``key``, or None on a miss.
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            if self.ttl_seconds is not None and time.time() - entry["stored"] > self.ttl_seconds:
+                os.remove(path)
+                return None
+            value = entry["value"]
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable {self.label} entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def put(self, key, value):
+        """
+        Stores a JSON-serialisable value under ``key``, then enforces the size bound.
+        """
+        self._write(key, [json.dumps(value).encode("utf-8")])
+
+    def put_list(self, key, items):
+        """
+        Stores ``items`` as a list, compressing them one at a time so a large
+        list is never serialised as a whole.
+        """
+        def pieces():
+            yield b"["
+            for idx, item in enumerate(items):
+                if idx:
+                    yield b","
+                yield json.dumps(item).encode("utf-8")
+            yield b"]"
+
+        self._write(key, pieces())
+
+    def _write(self, key, pieces):
+        path = self.path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            compressor = zlib.compressobj(6)
+            with open(tmp_path, "wb") as f:
+                f.write(compressor.compress(f'{{"stored": {time.time()!r}, "value": '.encode("utf-8")))
+                for piece in pieces:
+                    f.write(compressor.compress(piece))
+                f.write(compressor.compress(b"}"))
+                f.write(compressor.flush())
+            os.replace(tmp_path, path)
+            self.evict()
+        except Exception as e:
+            logger.error(f"Error writing {self.label} entry {path}: {e}")
+
+    def evict(self, max_bytes=None):
+        """
+        Deletes expired entries, then the least recently used ones until the
+        cache fits in max_bytes.
+
+        Args:
+            max_bytes (int): Size bound in bytes. Defaults to ``self.max_bytes``.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        expired_before = time.time() - self.ttl_seconds if self.ttl_seconds is not None else None
+        with _directory_lock(self.directory):
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".z"):
+                        stat = entry.stat()
+                        # An entry not read since it expired cannot be served again.
+                        if expired_before is not None and stat.st_mtime < expired_before:
+                            try:
+                                os.remove(entry.path)
+                            except OSError:
+                                pass
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+
+            if total <= max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.debug(f"Evicted {self.label} entry {path}")
+                except OSError:
+                    continue
+                if total <= max_bytes:
+                    break
+            logger.info(f"{self.label.capitalize()} trimmed to {total} bytes.")
@@ -74,7 +74,7 @@ def download_zip_file(bulk_output_dir, reset_run_callback):
         reset_run_callback (function): Callback function to reset the run after download.
     """
     try:
-        if len([i for i in os.listdir(bulk_output_dir) if not i.endswith(".zip")]) > 0:
+        if any(i.endswith(".pdf") for i in os.listdir(bulk_output_dir)):
             zipdir(bulk_output_dir)
             logger.info("Output files zipped successfully.")
             zip_file_path = os.path.join(bulk_output_dir, "quantiq_results.zip")
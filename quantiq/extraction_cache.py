@@ -0,0 +1,73 @@
+# quantiq/extraction_cache.py
+
+import os
+import hashlib
+from quantiq.disk_cache import CompressedCache
+
+# Directory holding the compressed extraction results.
+CACHE_DIR = os.getenv(
+    "QUANTIQ_EXTRACTION_CACHE_DIR", os.path.join("cache", "extraction")
+)
+
+# Upper bound on the on-disk size of the cache before LRU eviction kicks in.
+CACHE_MAX_BYTES = int(os.getenv("QUANTIQ_EXTRACTION_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """
+    Computes the SHA-256 digest of a file's content, reading it in chunks.
+
+    Args:
+        file_path (str): Path to the file.
+        chunk_size (int): Number of bytes read per chunk.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache():
+    return CompressedCache(CACHE_DIR, CACHE_MAX_BYTES, label="extraction cache")
+
+
+def get_cached_chunks(digest, version):
+    """
+    Looks up the previously extracted text chunks (e.g. PDF pages) of a file.
+
+    Args:
+        digest (str): Content digest of the source file.
+        version (str): Version of the extractor that produced the text.
+
+    Returns:
+        list: Cached text chunks, or None on a miss.
+    """
+    return _cache().get(f"{digest}-{version}")
+
+
+def put_cached_chunks(digest, version, chunks):
+    """
+    Stores extracted text chunks in the cache, compressed, then enforces the
+    size bound.
+
+    Args:
+        digest (str): Content digest of the source file.
+        version (str): Version of the extractor that produced the text.
+        chunks (list): Pieces of the extracted text, compressed in order
+            without joining them first.
+    """
+    _cache().put_list(f"{digest}-{version}", chunks)
+
+
+def evict_cache(max_bytes=None):
+    """
+    Deletes the least recently used entries until the cache fits in max_bytes.
+
+    Args:
+        max_bytes (int): Size bound in bytes. Defaults to ``CACHE_MAX_BYTES``.
+    """
+    _cache().evict(max_bytes)
@@ -1,29 +1,79 @@
 # quantiq/file_handler.py
 
 import os
-import zipfile
 import shutil
 import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import streamlit as st
 from io import BytesIO
 from PIL import Image
 import PyPDF2
 import docx
-import pandas as pd
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+import openpyxl
 import csv
 from bs4 import BeautifulSoup
 import re
+import tracemalloc
+from collections import deque
+from itertools import islice
 from markdown_pdf import MarkdownPdf, Section
 from quantiq.logging_setup import set_logging
+from quantiq.text_utils import encode_table, estimate_tokens, normalise_pages, render_padded_table
+from quantiq.csv_summary import sniff_dialect, summarise_csv
+from quantiq.page_classifier import score_page, select_pages
+from quantiq.extraction_cache import file_digest, get_cached_chunks, put_cached_chunks
+from quantiq.blob_store import known_digest, store_upload
 
 # Initialize logger
 logger = set_logging()
 
+# Number of worker processes used to extract documents in parallel.
+INGEST_WORKERS = int(os.getenv("QUANTIQ_INGEST_WORKERS", os.cpu_count() or 1))
+
+# PDFs longer than this are split into page ranges of this many pages,
+# so a single large annual report is spread across several workers.
+PDF_PAGES_PER_TASK = int(os.getenv("QUANTIQ_PDF_PAGES_PER_TASK", 50))
+
+# Maximum number of non-empty rows read from each worksheet of an XLSX file.
+XLSX_MAX_ROWS_PER_SHEET = int(os.getenv("QUANTIQ_XLSX_MAX_ROWS_PER_SHEET", 5000))
+
+# CSV files larger than this are summarised rather than reproduced row by row.
+CSV_SUMMARY_THRESHOLD_BYTES = int(os.getenv("QUANTIQ_CSV_SUMMARY_THRESHOLD_MB", 20)) * 1024 * 1024
+
+# Token budget for the PDF pages sent to the model when only the pages most
+# likely to hold financial statements are selected. This is the default path;
+# map-reduce (QUANTIQ_MAP_REDUCE_THRESHOLD_TOKENS) handles inputs sent in full
+# and spreadsheets or documents too large even after selection.
+PAGE_SELECTION_BUDGET_TOKENS = int(os.getenv("QUANTIQ_PAGE_SELECTION_BUDGET_TOKENS", 60000))
+
+# Approximate size of the text chunks CSV and DOCX files are streamed in.
+INGEST_CHUNK_CHARS = int(os.getenv("QUANTIQ_INGEST_CHUNK_CHARS", 64 * 1024))
+
+# Bump an extension's version whenever its reader's output changes, so
+# cached extractions produced by the old reader are no longer used.
+EXTRACTOR_VERSIONS = {
+    ".pdf": 2,
+    ".docx": 3,
+    ".xlsx": 2,
+    ".csv": 2,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
 
 def handle_file_upload(uploaded_file, upload_dir):
     """
     Handle the uploaded file, saving it to the specified directory.
 
+    The file is written in chunks into the content-addressed blob store and
+    linked into ``upload_dir``, so identical uploads share one copy on disk.
+
     Args:
         uploaded_file: The file uploaded by the user.
         upload_dir (str): Directory to save the uploaded file.
@@ -33,8 +83,8 @@ def handle_file_upload(uploaded_file, upload_dir):
     """
     try:
         file_path = os.path.join(upload_dir, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        uploaded_file.seek(0)
+        store_upload(uploaded_file, file_path)
         logger.info(f"File {uploaded_file.name} uploaded successfully to {file_path}.")
         return file_path
     except Exception as e:
@@ -55,16 +105,13 @@ def handle_zipped_files(uploaded_file, bulk_dir):
     Returns:
         dict: Subdirectories with their respective files or None if failed.
     """
-    temp_file_path = os.path.join("temp.zip")
+    # Imported here to keep spaCy out of the extraction worker processes
+    from quantiq.zip_manager import extract_zip
+
     try:
-        # Save the uploaded zip file temporarily
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        logger.info(f"Temp zip file created at {temp_file_path}.")
-
-        # Extract the zip file to the bulk directory
-        with zipfile.ZipFile(temp_file_path, "r") as z:
-            z.extractall(bulk_dir)
+        # Extract straight from the uploaded buffer, without a temporary copy
+        uploaded_file.seek(0)
+        extract_zip(uploaded_file, bulk_dir)
         st.success("Files successfully extracted")
         logger.info(f"Files extracted to {bulk_dir}.")
 
@@ -81,9 +128,6 @@ def handle_zipped_files(uploaded_file, bulk_dir):
                 st.toast(f"Extracted {len(files)} files from {relative_dir}")
                 logger.debug(f"Extracted {len(files)} files from {relative_dir}")
 
-        os.remove(temp_file_path)
-        logger.info(f"Temp zip file {temp_file_path} deleted.")
-
         return subdirectories
 
     except Exception as e:
@@ -92,120 +136,611 @@ def handle_zipped_files(uploaded_file, bulk_dir):
         return None
 
 
-def ingest_files(file_paths):
+def _get_pool():
+    """
+    Returns the process-wide extraction pool, creating it on first use.
+
+    The pool always has ``INGEST_WORKERS`` processes and is shared by every
+    caller, including concurrent ones; each call bounds its own parallelism
+    when it submits tasks, so the pool is never resized under another caller.
+
+    Returns:
+        ProcessPoolExecutor: Shared executor for extraction tasks.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS)
+            logger.info(f"Started extraction pool with {INGEST_WORKERS} workers.")
+        return _pool
+
+
+def _discard_pool(pool):
+    """
+    Drops a broken extraction pool so the next call starts a fresh one. A
+    pool another caller has already replaced is left alone.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _count_pdf_pages(file_path):
+    """
+    Returns the number of pages in a PDF, or 0 if it cannot be read.
+    """
+    try:
+        with open(file_path, "rb") as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    except Exception as e:
+        logger.error(f"Error counting pages in PDF {file_path}: {e}")
+        return 0
+
+
+def _plan_tasks(file_path):
+    """
+    Splits a file into extraction tasks.
+
+    Each task is a ``(file_path, start_page, end_page)`` tuple. Large PDFs are
+    split into page ranges of ``PDF_PAGES_PER_TASK`` pages; every other file
+    is a single task with no page range.
+
+    Args:
+        file_path (str): Path of the file to ingest.
+
+    Returns:
+        list: Extraction tasks in page order.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension == ".pdf":
+        page_count = _count_pdf_pages(file_path)
+        if page_count > PDF_PAGES_PER_TASK:
+            return [
+                (file_path, start, min(start + PDF_PAGES_PER_TASK, page_count))
+                for start in range(0, page_count, PDF_PAGES_PER_TASK)
+            ]
+    return [(file_path, None, None)]
+
+
+def _extractor_version(file_path):
+    file_extension = os.path.splitext(file_path)[1].lower()
+    version = f"{file_extension.lstrip('.')}-v{EXTRACTOR_VERSIONS.get(file_extension, 0)}"
+    if file_extension == ".xlsx":
+        version += f"-rows{XLSX_MAX_ROWS_PER_SHEET}"
+    elif file_extension == ".csv":
+        version += f"-summary{CSV_SUMMARY_THRESHOLD_BYTES}"
+    return version
+
+
+def _group_chunks(pieces, chunk_chars=None):
+    """
+    Joins small pieces of text (rows, paragraphs) into chunks of about
+    ``chunk_chars`` characters, so neither one string per file nor one per
+    row is held in memory.
+
+    Yields:
+        str: Consecutive chunks of the concatenated pieces.
+    """
+    chunk_chars = chunk_chars or INGEST_CHUNK_CHARS
+    group = []
+    size = 0
+    for piece in pieces:
+        group.append(piece)
+        size += len(piece)
+        if size >= chunk_chars:
+            yield "".join(group)
+            group = []
+            size = 0
+    if group:
+        yield "".join(group)
+
+
+def _extract_task(task):
+    """
+    Extracts the text for a single task. Runs inside a worker process.
+
+    Args:
+        task (tuple): ``(file_path, start_page, end_page)``.
+
+    Returns:
+        list: Extracted text chunks; raw page text for PDFs, which is
+            normalised once all pages of the document are available, and
+            groups of rows or paragraphs for CSV and DOCX files.
+    """
+    file_path, start, end = task
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    if file_extension == ".pdf":
+        return list(iter_pdf_pages(file_path, start, end))
+    elif file_extension == ".docx":
+        return list(_group_chunks(iter_docx_blocks(file_path)))
+    elif file_extension == ".xlsx":
+        return [read_xlsx(file_path)]
+    elif file_extension == ".csv":
+        return list(_group_chunks(iter_csv(file_path)))
+    else:
+        logger.warning(f"Unsupported file type: {file_extension}")
+        return []
+
+
+def _run_tasks(tasks, max_workers):
+    """
+    Runs extraction tasks, in parallel when more than one worker is allowed.
+
+    At most ``max_workers`` tasks of this call are queued on the shared pool
+    at a time.
+
+    Yields:
+        list: Extracted text chunks for each task, in task order.
+    """
+    workers = min(max_workers or INGEST_WORKERS, INGEST_WORKERS, len(tasks))
+    done = 0
+    if workers > 1:
+        pool = _get_pool()
+        queue = iter(tasks)
+        pending = deque()
+        try:
+            pending.extend(pool.submit(_extract_task, task) for task in islice(queue, workers))
+            while pending:
+                text = pending.popleft().result()
+                done += 1
+                pending.extend(pool.submit(_extract_task, task) for task in islice(queue, 1))
+                yield text
+            logger.info(f"Extracted {len(tasks)} tasks on up to {workers} workers.")
+            return
+        except BrokenProcessPool as e:
+            logger.error(f"Extraction pool failed, falling back to serial extraction: {e}")
+            _discard_pool(pool)
+        finally:
+            for future in pending:
+                future.cancel()
+    for task in tasks[done:]:
+        yield _extract_task(task)
+
+
+def iter_ingest(file_paths, max_workers=None, page_budget_tokens=None):
+    """
+    Streams the content of various file types as text chunks.
+
+    Each file is first looked up in the extraction cache by content digest, so
+    repeat uploads skip parsing. The remaining files are extracted in parallel
+    across a process pool, and large PDFs are further split into page ranges.
+    Chunks are always yielded in the order of ``file_paths`` and page order,
+    so the output is deterministic. Callers should join the chunks once, at
+    the point where the full text is needed.
+
+    When ``page_budget_tokens`` is given, every PDF page is scored for
+    financial-statement content and only the top-scoring pages that fit the
+    budget are yielded (other file types are always kept), after a note
+    telling the model how many pages were omitted. This needs every page up
+    front, so chunks are yielded once extraction is complete.
+
+    Args:
+        file_paths (list): List of file paths to ingest.
+        max_workers (int): Number of worker processes. Defaults to
+            ``INGEST_WORKERS``; 1 extracts in the calling process.
+        page_budget_tokens (int): Token budget for page selection, or None
+            to send the full text.
+
+    Yields:
+        str: Extracted text chunks.
+    """
+    if page_budget_tokens:
+        scored = []
+        for file_path, chunks in _iter_file_chunks(file_paths, max_workers):
+            is_pdf = file_path.lower().endswith(".pdf")
+            scored.extend((chunk, score_page(chunk) if is_pdf else None) for chunk in chunks)
+        texts, dropped = select_pages(scored, page_budget_tokens)
+        if dropped:
+            pages = sum(1 for _, score in scored if score is not None)
+            logger.info(
+                f"Page selection kept {pages - dropped} of {pages} PDF pages "
+                f"within ~{page_budget_tokens} tokens."
+            )
+            yield omitted_pages_note(dropped, pages)
+        yield from texts
+        return
+
+    for _, chunks in _iter_file_chunks(file_paths, max_workers):
+        yield from chunks
+
+
+def omitted_pages_note(dropped, pages):
+    """
+    Returns the note placed before selected pages, so the model does not
+    present partial statements as complete.
+    """
+    return (
+        f"[Note: {dropped} of {pages} PDF pages were omitted; only the pages most likely to "
+        "contain the financial statements are included. Treat figures that are not in the "
+        "text below as unavailable rather than zero, and say so where it matters.]\n\n"
+    )
+
+
+def _iter_file_chunks(file_paths, max_workers):
+    """
+    Extracts files through the cache and the worker pool.
+
+    Yields:
+        tuple: ``(file_path, chunks)`` for each file, in order.
+    """
+    cached = [None] * len(file_paths)
+    digests = [None] * len(file_paths)
+    duplicates = [False] * len(file_paths)
+    tasks = []
+    task_counts = [0] * len(file_paths)
+    seen = {}
+
+    for idx, file_path in enumerate(file_paths):
+        try:
+            digests[idx] = known_digest(file_path) or file_digest(file_path)
+        except OSError as e:
+            logger.error(f"Error hashing {file_path}: {e}")
+
+        # The same document uploaded under another name is only ingested once
+        if digests[idx] is not None and digests[idx] in seen:
+            duplicates[idx] = True
+            logger.info(f"Skipping {file_path}: same content as {seen[digests[idx]]}.")
+            continue
+        if digests[idx] is not None:
+            seen[digests[idx]] = file_path
+            cached[idx] = get_cached_chunks(digests[idx], _extractor_version(file_path))
+        if cached[idx] is None:
+            file_tasks = _plan_tasks(file_path)
+            tasks.extend(file_tasks)
+            task_counts[idx] = len(file_tasks)
+
+    misses = sum(1 for count in task_counts if count)
+    hits = sum(1 for chunks in cached if chunks is not None)
+    logger.info(f"Extraction cache: {hits} hits, {misses} misses, {sum(duplicates)} duplicates.")
+
+    results = _run_tasks(tasks, max_workers)
+    for idx, file_path in enumerate(file_paths):
+        if duplicates[idx]:
+            yield file_path, []
+            continue
+        if cached[idx] is not None:
+            chunks, cached[idx] = cached[idx], None
+            yield file_path, chunks
+            continue
+
+        parts = [chunk for result in islice(results, task_counts[idx]) for chunk in result]
+        if file_path.lower().endswith(".pdf"):
+            parts = _normalise_pdf(parts, file_path)
+        if digests[idx] and any(parts):
+            put_cached_chunks(digests[idx], _extractor_version(file_path), parts)
+        yield file_path, parts
+
+
+def ingest_files(file_paths, max_workers=None, page_budget_tokens=None):
     """
     Reads and combines content from various file types.
 
     Args:
         file_paths (list): List of file paths to ingest.
+        max_workers (int): Number of worker processes. Defaults to
+            ``INGEST_WORKERS``; 1 extracts in the calling process.
+        page_budget_tokens (int): Token budget for page selection, or None
+            to send the full text.
 
     Returns:
         str: Combined content from all files.
     """
-    combined_content = ""
+    return "".join(iter_ingest(file_paths, max_workers, page_budget_tokens))
 
-    for file_path in file_paths:
-        file_extension = os.path.splitext(file_path)[1].lower()
 
-        if file_extension == ".pdf":
-            combined_content += read_pdf(file_path)
-        elif file_extension == ".docx":
-            combined_content += read_docx(file_path)
-        elif file_extension == ".xlsx":
-            combined_content += read_xlsx(file_path)
-        elif file_extension == ".csv":
-            combined_content += read_csv(file_path)
-        else:
-            logger.warning(f"Unsupported file type: {file_extension}")
+def profile_ingestion(file_paths, max_workers=1):
+    """
+    Ingests files while tracing Python memory allocations.
 
-    return combined_content
+    Extraction runs in the calling process by default so that tracemalloc
+    sees every allocation.
 
+    Args:
+        file_paths (list): List of file paths to ingest.
+        max_workers (int): Number of worker processes.
 
-def read_pdf(file_path):
+    Returns:
+        dict: ``chars`` (length of the combined text) and ``peak_bytes``
+            (peak traced memory while ingesting).
     """
-    Extracts text from a PDF file.
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        content = ingest_files(file_paths, max_workers)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    logger.info(f"Ingested {len(content)} chars with peak memory {peak} bytes.")
+    return {"chars": len(content), "peak_bytes": peak}
+
+
+def iter_pdf_pages(file_path, start=None, end=None):
+    """
+    Streams the text of a PDF file page by page, optionally limited to a page range.
 
     Args:
         file_path (str): Path to the PDF file.
+        start (int): First page to extract (0-based). Defaults to the first page.
+        end (int): Page to stop before. Defaults to the last page.
 
-    Returns:
-        str: Extracted text.
+    Yields:
+        str: Text of each page that has any, followed by a newline.
     """
-    content = ""
     try:
         with open(file_path, "rb") as file:
             reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(reader.pages)):
+            page_count = len(reader.pages)
+            start = 0 if start is None else start
+            end = page_count if end is None else min(end, page_count)
+            for page_num in range(start, end):
                 page = reader.pages[page_num]
                 extracted_text = page.extract_text()
                 if extracted_text:
-                    content += extracted_text + "\n"
+                    yield extracted_text + "\n"
         logger.info(f"Extracted text from PDF: {file_path}")
     except Exception as e:
         logger.error(f"Error reading PDF {file_path}: {e}")
-    return content
 
 
-def read_docx(file_path):
+def _normalise_pdf(pages, file_path):
+    """
+    Strips boilerplate and excess whitespace from a PDF's pages and logs the
+    estimated token saving for the document.
+
+    Returns:
+        list: Normalised page text.
+    """
+    normalised = normalise_pages(pages)
+    before = sum(estimate_tokens(page) for page in pages)
+    after = sum(estimate_tokens(page) for page in normalised)
+    if before:
+        logger.info(
+            f"Normalised PDF {file_path}: ~{before} -> ~{after} tokens "
+            f"(saved ~{before - after}, {100 * (before - after) / before:.1f}%)"
+        )
+    return normalised
+
+
+def read_pdf(file_path, start=None, end=None):
     """
-    Extracts text from a DOCX file.
+    Extracts text from a PDF file, optionally limited to a page range.
+
+    Running headers, footers, page numbers and repeated disclaimers are
+    removed and whitespace is collapsed.
 
     Args:
-        file_path (str): Path to the DOCX file.
+        file_path (str): Path to the PDF file.
+        start (int): First page to extract (0-based). Defaults to the first page.
+        end (int): Page to stop before. Defaults to the last page.
 
     Returns:
         str: Extracted text.
     """
+    return "".join(_normalise_pdf(list(iter_pdf_pages(file_path, start, end)), file_path))
+
+
+def _docx_table_rows(table):
+    """
+    Returns the cell text of a DOCX table, with horizontally merged cells
+    reported once rather than repeated for every grid column they span.
+    """
+    rows = []
+    for row in table.rows:
+        cells = []
+        previous = None
+        for cell in row.cells:
+            if cell._tc is not previous:
+                cells.append(cell.text)
+            previous = cell._tc
+        rows.append(cells)
+    return rows
+
+
+def iter_docx_blocks(file_path):
+    """
+    Streams the text of a DOCX file, including tables, in document order.
+
+    Tables are encoded as compact pipe-delimited rows. The token saving over a
+    padded, column-aligned rendering is logged for each document.
+
+    Args:
+        file_path (str): Path to the DOCX file.
+
+    Yields:
+        str: One paragraph or table per block, each ending in a newline.
+    """
     try:
         doc = docx.Document(file_path)
-        content = "\n".join([para.text for para in doc.paragraphs])
+        table_count = 0
+        compact_tokens = 0
+        padded_tokens = 0
+
+        for child in doc.element.body.iterchildren():
+            if child.tag == qn("w:p"):
+                yield Paragraph(child, doc).text + "\n"
+            elif child.tag == qn("w:tbl"):
+                table_count += 1
+                rows = _docx_table_rows(Table(child, doc))
+                encoded = encode_table(rows)
+                compact_tokens += estimate_tokens(encoded)
+                padded_tokens += estimate_tokens(render_padded_table(rows))
+                yield f"[Table {table_count}]\n{encoded}\n"
+
         logger.info(f"Extracted text from DOCX: {file_path}")
-        return content
+        if table_count:
+            logger.info(
+                f"Encoded {table_count} tables from {file_path} in ~{compact_tokens} tokens, "
+                f"saving ~{padded_tokens - compact_tokens} tokens over padded rendering."
+            )
     except Exception as e:
         logger.error(f"Error reading DOCX {file_path}: {e}")
+
+
+def read_docx(file_path):
+    """
+    Extracts text from a DOCX file, including tables, in document order.
+
+    Args:
+        file_path (str): Path to the DOCX file.
+
+    Returns:
+        str: Extracted text.
+    """
+    return "".join(iter_docx_blocks(file_path))
+
+
+def _format_cell(value):
+    """
+    Formats a worksheet cell value compactly, dropping trailing zeros from
+    whole-number floats and the time part from midnight datetimes.
+    """
+    if value is None:
         return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if hasattr(value, "hour") and hasattr(value, "date") and not (
+        value.hour or value.minute or value.second
+    ):
+        return value.date().isoformat()
+    return str(value)
 
 
-def read_xlsx(file_path):
+def read_xlsx(file_path, max_rows_per_sheet=None):
     """
-    Extracts text from an XLSX file.
+    Extracts text from every worksheet of an XLSX file.
+
+    Sheets are streamed in read-only mode, empty rows and columns are dropped,
+    and each sheet is emitted as compact pipe-delimited rows under a sheet
+    header. At most ``max_rows_per_sheet`` non-empty rows are kept per sheet.
 
     Args:
         file_path (str): Path to the XLSX file.
+        max_rows_per_sheet (int): Row cap per sheet. Defaults to
+            ``XLSX_MAX_ROWS_PER_SHEET``.
 
     Returns:
         str: Extracted text.
     """
+    max_rows = max_rows_per_sheet or XLSX_MAX_ROWS_PER_SHEET
     try:
-        excel_data = pd.read_excel(file_path)
-        content = excel_data.to_string(index=False)
-        logger.info(f"Extracted data from XLSX: {file_path}")
-        return content
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        blocks = []
+        compact_tokens = 0
+        padded_tokens = 0
+        try:
+            for sheet in workbook.worksheets:
+                rows = []
+                truncated = False
+                for values in sheet.iter_rows(values_only=True):
+                    cells = [_format_cell(value) for value in values]
+                    if not any(cells):
+                        continue
+                    if len(rows) == max_rows:
+                        truncated = True
+                        break
+                    rows.append(cells)
+
+                if not rows:
+                    continue
+
+                column_count = max(len(row) for row in rows)
+                used_columns = [
+                    col for col in range(column_count)
+                    if any(col < len(row) and row[col] for row in rows)
+                ]
+                rows = [
+                    [row[col] if col < len(row) else "" for col in used_columns]
+                    for row in rows
+                ]
+
+                encoded = encode_table(rows)
+                compact_tokens += estimate_tokens(encoded)
+                padded_tokens += estimate_tokens(render_padded_table(rows))
+                header = f"[Sheet: {sheet.title}]"
+                if truncated:
+                    header += f" (first {max_rows} rows)"
+                    logger.warning(
+                        f"Sheet '{sheet.title}' of {file_path} truncated to {max_rows} rows."
+                    )
+                blocks.append(f"{header}\n{encoded}\n")
+        finally:
+            workbook.close()
+
+        logger.info(
+            f"Extracted data from XLSX: {file_path} ({len(blocks)} sheets, ~{compact_tokens} tokens, "
+            f"saving ~{padded_tokens - compact_tokens} tokens over padded rendering)"
+        )
+        return "".join(blocks)
     except Exception as e:
         logger.error(f"Error reading XLSX {file_path}: {e}")
         return ""
 
 
-def read_csv(file_path):
+def iter_csv_rows(file_path):
     """
-    Extracts text from a CSV file.
+    Streams the rows of a CSV file as comma-joined lines, using the file's
+    detected dialect.
 
     Args:
         file_path (str): Path to the CSV file.
 
-    Returns:
-        str: Extracted text.
+    Yields:
+        str: One line of text per row.
     """
-    content = ""
     try:
+        dialect = sniff_dialect(file_path)
         with open(file_path, newline="", encoding="utf-8") as csvfile:
-            reader = csv.reader(csvfile)
+            reader = csv.reader(csvfile, dialect)
             for row in reader:
-                content += ",".join(row) + "\n"
+                yield ",".join(row) + "\n"
         logger.info(f"Extracted data from CSV: {file_path}")
     except Exception as e:
         logger.error(f"Error reading CSV {file_path}: {e}")
-    return content
+
+
+def iter_csv(file_path):
+    """
+    Streams the text of a CSV file.
+
+    Files larger than ``CSV_SUMMARY_THRESHOLD_BYTES`` are summarised with
+    aggregate statistics instead of being reproduced row by row.
+
+    Args:
+        file_path (str): Path to the CSV file.
+
+    Yields:
+        str: The summary, or one line of text per row.
+    """
+    try:
+        summary = None
+        if os.path.getsize(file_path) > CSV_SUMMARY_THRESHOLD_BYTES:
+            summary = summarise_csv(file_path)
+    except Exception as e:
+        logger.error(f"Error summarising CSV {file_path}: {e}")
+        return
+    if summary is not None:
+        yield summary
+    else:
+        yield from iter_csv_rows(file_path)
+
+
+def read_csv(file_path):
+    """
+    Extracts text from a CSV file.
+
+    Args:
+        file_path (str): Path to the CSV file.
+
+    Returns:
+        str: Extracted text.
+    """
+    return "".join(iter_csv(file_path))
 
 
 def delete_dir_contents(directories):
@@ -0,0 +1,573 @@
+# quantiq/jobs.py
+"""
+Persistent job queue for analysis runs.
+
+Jobs are stored in SQLite and executed by worker processes, so a run
+survives browser disconnects and script reruns, and throughput scales by
+adding workers. Start extra workers with:
+
+    python -m quantiq.jobs --workers 4
+
+API keys of the submitting sessions never reach the database: the app
+hands them to its own workers over their stdin pipe and they stay in
+memory, so only those workers run jobs queued with a session key.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import shutil
+import sqlite3
+import argparse
+import threading
+import subprocess
+import multiprocessing
+from quantiq.config import RunConfig, resolve_api_key
+from quantiq.progress import Reporter
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# SQLite database holding the queue.
+JOBS_DB = os.getenv("QUANTIQ_JOBS_DB", os.path.join("cache", "jobs.db"))
+
+# Directory holding each job's snapshot of its input files.
+JOBS_DIR = os.getenv("QUANTIQ_JOBS_DIR", os.path.join("cache", "jobs"))
+
+# Worker processes the app starts alongside itself (0 to rely on external workers).
+JOB_WORKERS = int(os.getenv("QUANTIQ_JOB_WORKERS", 2))
+
+# Seconds between queue checks of an idle worker.
+JOB_POLL_SECONDS = float(os.getenv("QUANTIQ_JOB_POLL_SECONDS", 2))
+
+# A running job whose worker has not reported for this long is requeued.
+JOB_STALE_SECONDS = float(os.getenv("QUANTIQ_JOB_STALE_SECONDS", 120))
+
+# Attempts before a job that keeps losing its worker is marked failed.
+JOB_MAX_ATTEMPTS = int(os.getenv("QUANTIQ_JOB_MAX_ATTEMPTS", 3))
+
+# Seconds between heartbeats of a running job.
+_HEARTBEAT_SECONDS = 10
+
+# Minimum seconds between writes of a job's streaming report text.
+_LIVE_TEXT_SECONDS = 1.0
+
+# Seconds a worker waits for the key of a job it claimed to arrive.
+_KEY_WAIT_SECONDS = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    config TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    status_message TEXT NOT NULL DEFAULT '',
+    live_label TEXT NOT NULL DEFAULT '',
+    live_text TEXT NOT NULL DEFAULT '',
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    session_key INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id);
+"""
+
+
+def _connect():
+    os.makedirs(os.path.dirname(JOBS_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "session_key" not in columns:
+        try:
+            conn.execute("ALTER TABLE jobs ADD COLUMN session_key INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass  # Added by another connection meanwhile.
+    if "api_key" in columns:
+        # Queues that kept the session's key on disk: erase it.
+        try:
+            conn.execute("PRAGMA secure_delete = ON")
+            conn.execute("UPDATE jobs SET api_key = NULL")
+            conn.execute("ALTER TABLE jobs DROP COLUMN api_key")
+        except sqlite3.OperationalError:
+            pass  # Dropped by another connection, or SQLite predates DROP COLUMN.
+    return conn
+
+
+def _execute(sql, params=()):
+    conn = _connect()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def _execute_update(sql, params=()):
+    # Returns the number of rows the statement changed.
+    conn = _connect()
+    try:
+        return conn.execute(sql, params).rowcount
+    finally:
+        conn.close()
+
+
+def _snapshot(src_dir, dest_dir):
+    """
+    Copies the input files of a job, as hardlinks where possible, so later
+    uploads or a reset of the session do not change a queued job.
+    """
+    def link_or_copy(src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    shutil.copytree(src_dir, dest_dir, copy_function=link_or_copy)
+
+
+def submit_job(config, api_key=None):
+    """
+    Queues an analysis run.
+
+    The input directory is snapshotted into the job's own directory first.
+
+    Args:
+        config (RunConfig): Settings of the run.
+        api_key (str): Anthropic API key of the submitting session. It is
+            handed to this process's local workers in memory and never
+            stored in the queue. Without one, or without local workers,
+            the job runs with the worker's ``resolve_api_key``.
+
+    Returns:
+        str: ID of the new job.
+    """
+    job_id = uuid.uuid4().hex[:12]
+    input_dir = os.path.abspath(os.path.join(JOBS_DIR, job_id, "input"))
+    _snapshot(config.input_dir, input_dir)
+    config = RunConfig.from_dict({**config.to_dict(), "input_dir": input_dir})
+
+    # The key goes out before the job is queued, so no worker claims it first.
+    session_key = bool(api_key) and _hand_over_key(job_id, api_key)
+    if api_key and not session_key:
+        logger.warning(f"No local job workers to hand the session's API key to; job {job_id} uses the workers' key.")
+    _execute(
+        "INSERT INTO jobs (id, mode, config, status, created_at, session_key) VALUES (?, ?, ?, 'queued', ?, ?)",
+        (job_id, config.mode, json.dumps(config.to_dict()), time.time(), int(session_key)),
+    )
+    logger.info(f"Queued {config.mode} job {job_id}.")
+    return job_id
+
+
+def get_job(job_id):
+    """
+    Returns a job as a dict, or None if it does not exist.
+    """
+    rows = _execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    return dict(rows[0]) if rows else None
+
+
+def get_job_events(job_id, after_id=0):
+    """
+    Returns the progress messages of a job newer than ``after_id``, oldest first.
+    """
+    rows = _execute(
+        "SELECT id, created_at, level, message FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+        (job_id, after_id),
+    )
+    return [dict(row) for row in rows]
+
+
+def requeue_stale_jobs():
+    """
+    Puts running jobs whose worker stopped reporting back in the queue, or
+    marks them failed once they have used up their attempts.
+
+    Returns:
+        list: IDs of the jobs marked failed.
+    """
+    cutoff = time.time() - JOB_STALE_SECONDS
+    failed = []
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        stale = conn.execute(
+            "SELECT id, attempts FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (cutoff,)
+        ).fetchall()
+        for row in stale:
+            if row["attempts"] >= JOB_MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', worker = NULL, error = ?, finished_at = ? WHERE id = ?",
+                    ("Worker stopped responding", time.time(), row["id"]),
+                )
+                failed.append(row["id"])
+            else:
+                conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ?", (row["id"],))
+            logger.warning(f"Job {row['id']} lost its worker; requeued or failed.")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return failed
+
+
+def claim_job(worker, session_keys=False):
+    """
+    Atomically takes the oldest queued job for ``worker``.
+
+    Args:
+        worker (str): Name of the claiming worker.
+        session_keys (bool): Whether the worker holds the API keys handed
+            over by the app. Jobs queued with a session key are left to
+            workers that do.
+
+    Returns:
+        dict: The claimed job, or None if the queue is empty.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' AND (session_key = 0 OR ?) ORDER BY created_at LIMIT 1",
+            (int(session_keys),),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+            "started_at = ?, heartbeat_at = ? WHERE id = ?",
+            (worker, now, now, row["id"]),
+        )
+        conn.execute("COMMIT")
+        return dict(row)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+class JobReporter(Reporter):
+    """
+    Records a job's progress in the queue database, where the UI polls it.
+
+    Writes only take effect while ``worker`` still owns the job, so a worker
+    whose job was requeued cannot overwrite the progress of the new attempt.
+    """
+
+    def __init__(self, job_id, worker):
+        super().__init__()
+        self.job_id = job_id
+        self.worker = worker
+        self.lost = False
+
+    def _update(self, **columns):
+        columns["heartbeat_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        updated = _execute_update(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ?",
+            (*columns.values(), self.job_id, self.worker),
+        )
+        if not updated and not self.lost:
+            self.lost = True
+            logger.warning(f"Job {self.job_id} no longer belongs to worker {self.worker}; progress not recorded.")
+
+    def _event(self, level, message):
+        _execute(
+            "INSERT INTO job_events (job_id, created_at, level, message) "
+            "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM jobs WHERE id = ? AND worker = ?)",
+            (self.job_id, time.time(), level, message, self.job_id, self.worker),
+        )
+
+    def info(self, message):
+        super().info(message)
+        self._event("info", message)
+
+    def status(self, message):
+        super().status(message)
+        self._update(status_message=message)
+
+    def failure(self, message, fatal=False):
+        super().failure(message, fatal)
+        self._event("error" if fatal else "warning", message)
+
+    def progress(self, fraction):
+        self._update(progress=min(max(fraction, 0.0), 1.0))
+
+    def stream(self, label):
+        last_written = 0.0
+
+        def on_text(text, done):
+            nonlocal last_written
+            now = time.monotonic()
+            if done or now - last_written >= _LIVE_TEXT_SECONDS:
+                last_written = now
+                self._update(live_label=label, live_text=text)
+
+        return on_text
+
+    def heartbeat(self):
+        self._update()
+
+
+def _heartbeat(reporter, stop):
+    # Keeps a job marked alive through long model calls.
+    while not stop.wait(_HEARTBEAT_SECONDS):
+        try:
+            reporter.heartbeat()
+        except sqlite3.Error as e:
+            logger.warning(f"Heartbeat for job {reporter.job_id} failed: {e}")
+
+
+def _finish_job(job_id, worker, status, error):
+    # Records the outcome, unless the job was requeued and another worker
+    # took it over; returns whether it was recorded.
+    updated = _execute_update(
+        "UPDATE jobs SET status = ?, error = ?, status_message = '', finished_at = ?, "
+        "progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END "
+        "WHERE id = ? AND worker = ? AND status = 'running'",
+        (status, error, time.time(), status, job_id, worker),
+    )
+    if not updated:
+        # Requeued while this worker was unresponsive: the new attempt owns
+        # the job and still reads its input snapshot.
+        logger.warning(f"Job {job_id} {status} on {worker} after it was requeued; outcome discarded.")
+        return False
+    shutil.rmtree(os.path.join(JOBS_DIR, job_id), ignore_errors=True)
+    logger.info(f"Job {job_id} {status}.")
+    return True
+
+
+def run_job(job, worker, api_key=None):
+    """
+    Runs a job claimed by ``worker`` to completion and records its outcome,
+    unless the job has since been requeued and taken by another worker.
+
+    Args:
+        job (dict): The claimed job.
+        worker (str): Name of the worker running it.
+        api_key (str): The submitting session's API key, if it handed one
+            over; otherwise the job runs with ``resolve_api_key``.
+
+    Returns:
+        bool: Whether the outcome was recorded.
+    """
+    from quantiq.llm import LLMClient
+    from quantiq.orchestrator import run_mode
+
+    job_id = job["id"]
+    config = RunConfig.from_dict(json.loads(job["config"]))
+    reporter = JobReporter(job_id, worker)
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(reporter, stop), daemon=True).start()
+
+    logger.info(f"Running {config.mode} job {job_id}.")
+    try:
+        os.makedirs(config.output_dir, exist_ok=True)
+        client = LLMClient(api_key=api_key or resolve_api_key(), use_cache=config.use_cache)
+        run_mode(client, config, reporter)
+        if config.use_cache:
+            reporter.info(f"Response cache: {client.cache_stats.summary()}.")
+        status, error = ("failed", reporter.failures[-1]) if reporter.fatal else ("succeeded", None)
+    except Exception as e:
+        logger.error(f"Error in job {job_id}: {e}")
+        status, error = "failed", str(e)
+    finally:
+        stop.set()
+
+    return _finish_job(job_id, worker, status, error)
+
+
+def _parent_alive(parent_pid):
+    if parent_pid is None:
+        return True
+    try:
+        os.kill(parent_pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _receive_session_keys(key_queue, session_keys, job_id=None):
+    # Moves the keys the supervisor forwarded into ``session_keys``. With a
+    # ``job_id``, waits a little for its key, which may still be in transit.
+    deadline = time.monotonic() + _KEY_WAIT_SECONDS
+    while True:
+        try:
+            while True:
+                message = key_queue.get_nowait()
+                session_keys[message["job_id"]] = message["api_key"]
+        except queue.Empty:
+            pass
+        if job_id is None or job_id in session_keys or time.monotonic() >= deadline:
+            return session_keys.get(job_id)
+        try:
+            message = key_queue.get(timeout=deadline - time.monotonic())
+            session_keys[message["job_id"]] = message["api_key"]
+        except queue.Empty:
+            pass
+
+
+def _forget_finished_keys(session_keys):
+    # Drops the keys of jobs that finished, here or on another worker.
+    if not session_keys:
+        return
+    job_ids = list(session_keys)
+    rows = _execute(
+        f"SELECT id FROM jobs WHERE id IN ({', '.join('?' * len(job_ids))}) AND status IN ('queued', 'running')",
+        job_ids,
+    )
+    for job_id in set(job_ids) - {row["id"] for row in rows}:
+        del session_keys[job_id]
+
+
+def worker_loop(parent_pid=None, poll_seconds=None, key_queue=None):
+    """
+    Claims and runs jobs until the parent process (if given) exits.
+
+    Args:
+        parent_pid (int): Process whose exit stops the worker.
+        poll_seconds (float): Seconds between queue checks while idle.
+        key_queue (multiprocessing.Queue): API keys handed over by the app.
+            The worker keeps them in memory, by job ID; without a queue it
+            only runs jobs queued without a key.
+    """
+    poll_seconds = JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+    worker = f"{os.uname().nodename}:{os.getpid()}"
+    session_keys = {}
+    logger.info(f"Job worker {worker} started.")
+    while _parent_alive(parent_pid):
+        try:
+            requeue_stale_jobs()
+            if key_queue is not None:
+                _receive_session_keys(key_queue, session_keys)
+                _forget_finished_keys(session_keys)
+            job = claim_job(worker, session_keys=key_queue is not None)
+        except sqlite3.Error as e:
+            logger.error(f"Job queue unavailable: {e}")
+            job = None
+        if job is None:
+            time.sleep(poll_seconds)
+            continue
+        if not job["session_key"]:
+            run_job(job, worker)
+            continue
+        api_key = _receive_session_keys(key_queue, session_keys, job["id"])
+        if api_key is None:
+            # Queued before the app (and the keys it held) restarted.
+            _finish_job(
+                job["id"], worker, "failed", "The submitting session's API key is no longer available; run it again."
+            )
+            continue
+        if run_job(job, worker, api_key=api_key):
+            session_keys.pop(job["id"], None)
+    logger.info(f"Job worker {worker} stopping: parent process exited.")
+
+
+_local_workers = None
+_local_workers_lock = threading.Lock()
+
+
+def start_local_workers(count=None):
+    """
+    Starts the app's own worker processes once per server process. They stop
+    by themselves when the server exits, and receive the API keys of
+    submitting sessions from ``submit_job`` over their stdin pipe.
+    """
+    global _local_workers
+    count = JOB_WORKERS if count is None else count
+    with _local_workers_lock:
+        if count <= 0 or (_local_workers is not None and _local_workers.poll() is None):
+            return
+        _local_workers = subprocess.Popen(
+            [
+                sys.executable, "-m", "quantiq.jobs", "--workers", str(count),
+                "--parent-pid", str(os.getpid()), "--keys-from-stdin",
+            ],
+            stdin=subprocess.PIPE,
+            text=True,
+        )
+        logger.info(f"Started {count} local job workers.")
+
+
+def _hand_over_key(job_id, api_key):
+    # Sends a session's key to the local workers; False if none are running.
+    with _local_workers_lock:
+        if _local_workers is None or _local_workers.poll() is not None:
+            return False
+        try:
+            _local_workers.stdin.write(json.dumps({"job_id": job_id, "api_key": api_key}) + "\n")
+            _local_workers.stdin.flush()
+        except OSError as e:
+            logger.error(f"Could not hand the API key of job {job_id} to the local workers: {e}")
+            return False
+        return True
+
+
+def _forward_keys(key_queues):
+    # Passes each key the app writes to stdin on to every worker, until the
+    # app closes the pipe.
+    for line in sys.stdin:
+        try:
+            message = json.loads(line)
+            message = {"job_id": message["job_id"], "api_key": message["api_key"]}
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignored a malformed API key hand-over.")
+            continue
+        for key_queue in key_queues:
+            key_queue.put(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Quant-IQ job workers.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--parent-pid", type=int, default=None, help="Exit when this process exits")
+    parser.add_argument(
+        "--keys-from-stdin", action="store_true", help="Receive the API keys of submitting sessions on stdin"
+    )
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    # The workers divide the account's rate limits between them, unless told
+    # how many processes share them in total.
+    os.environ.setdefault("QUANTIQ_RATE_LIMIT_PROCESSES", str(workers))
+
+    context = multiprocessing.get_context("spawn")
+    key_queues = [context.Queue() if args.keys_from_stdin else None for _ in range(workers)]
+    if args.keys_from_stdin:
+        threading.Thread(target=_forward_keys, args=(key_queues,), daemon=True).start()
+    processes = [
+        context.Process(target=worker_loop, args=(args.parent_pid, None, key_queue)) for key_queue in key_queues
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
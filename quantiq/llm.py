@@ -0,0 +1,582 @@
+# quantiq/llm.py
+
+import os
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from anthropic import (
+    Anthropic,
+    AsyncAnthropic,
+    APIConnectionError,
+    APIStatusError,
+    RateLimitError,
+)
+from quantiq.text_utils import CHARS_PER_TOKEN
+from quantiq.response_cache import (
+    CacheStats,
+    get_cached_response,
+    put_cached_response,
+    request_key,
+)
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# Request and input-token ceilings per minute, shared by every model call in
+# the process. Set either to 0 to disable that bucket.
+REQUESTS_PER_MINUTE = int(os.getenv("QUANTIQ_REQUESTS_PER_MINUTE", 50))
+INPUT_TOKENS_PER_MINUTE = int(os.getenv("QUANTIQ_INPUT_TOKENS_PER_MINUTE", 200000))
+
+# Processes drawing on the same account, e.g. all job workers; each one's
+# buckets get an equal share of the ceilings above.
+RATE_LIMIT_PROCESSES = max(1, int(os.getenv("QUANTIQ_RATE_LIMIT_PROCESSES", 1)))
+
+# Attempts after the first one for rate-limited, overloaded or failed calls.
+MAX_RETRIES = int(os.getenv("QUANTIQ_MAX_RETRIES", 6))
+
+# Base and cap of the exponential backoff between retries, in seconds.
+BACKOFF_BASE_SECONDS = float(os.getenv("QUANTIQ_BACKOFF_BASE_SECONDS", 1.0))
+BACKOFF_MAX_SECONDS = float(os.getenv("QUANTIQ_BACKOFF_MAX_SECONDS", 60.0))
+
+# Starting and maximum number of model calls in flight. The limit grows by
+# about one per round of successful calls and halves on each throttle.
+INITIAL_CONCURRENCY = int(os.getenv("QUANTIQ_INITIAL_CONCURRENCY", 4))
+MAX_CONCURRENCY = int(os.getenv("QUANTIQ_MAX_CONCURRENCY", 16))
+
+# Seconds between checks while an async caller waits for a concurrency slot.
+_ASYNC_POLL_SECONDS = 0.05
+
+# Minimum seconds between partial-text callbacks of a streamed call; the
+# received deltas are only joined for those.
+_STREAM_REFRESH_SECONDS = 0.1
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``rate_per_minute``.
+
+    A request larger than the bucket's capacity is let through once the
+    bucket is full and leaves it in debt, so oversized requests are delayed
+    rather than blocked forever.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """
+        Takes ``amount`` from the bucket if available.
+
+        Returns:
+            float: 0 if the amount was taken, otherwise the seconds to wait
+                before trying again.
+        """
+        with self.lock:
+            self._refill()
+            needed = min(amount, self.capacity)
+            if self.level >= needed:
+                self.level -= amount
+                return 0.0
+            return (needed - self.level) / self.rate
+
+    def adjust(self, amount):
+        """
+        Corrects an earlier reservation by ``amount`` (positive to take more).
+        """
+        with self.lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+
+class AdaptiveConcurrency:
+    """
+    Additive-increase / multiplicative-decrease limit on calls in flight.
+
+    Each success raises the limit by ``1 / limit`` (about one per round of
+    calls); each throttle (429 or overload) halves it.
+    """
+
+    def __init__(self, initial, maximum, minimum=1):
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def try_enter(self):
+        with self.condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def enter(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    async def enter_async(self):
+        while not self.try_enter():
+            await asyncio.sleep(_ASYNC_POLL_SECONDS)
+
+    def exit(self, outcome):
+        """
+        Releases a slot and adapts the limit.
+
+        Args:
+            outcome (str): ``"success"``, ``"throttled"`` or ``"error"``.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                previous = int(self.limit)
+                self.limit = max(self.minimum, self.limit / 2)
+                if int(self.limit) != previous:
+                    logger.info(f"Throttled: model call concurrency lowered to {int(self.limit)}.")
+            elif outcome == "success":
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class RateLimiter:
+    """
+    Process-wide limits shared by every model call: request and input-token
+    buckets, an adaptive concurrency limit, and a cooldown set from
+    retry-after headers so one throttled call pauses the others too.
+
+    The buckets hold this process's share of the per-minute ceilings when
+    ``RATE_LIMIT_PROCESSES`` processes use the same account.
+    """
+
+    def __init__(self):
+        requests, tokens = (limit / RATE_LIMIT_PROCESSES for limit in (REQUESTS_PER_MINUTE, INPUT_TOKENS_PER_MINUTE))
+        self.requests = TokenBucket(requests) if requests > 0 else None
+        self.tokens = TokenBucket(tokens) if tokens > 0 else None
+        self.concurrency = AdaptiveConcurrency(INITIAL_CONCURRENCY, MAX_CONCURRENCY)
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def wait_time(self, input_tokens):
+        """
+        Returns the seconds to wait before the call may start, or 0 once the
+        call has been admitted by both buckets.
+        """
+        cooldown = self.resume_at - time.monotonic()
+        if cooldown > 0:
+            return cooldown
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+            if wait:
+                return wait
+        if self.tokens is not None:
+            wait = self.tokens.reserve(input_tokens)
+            if wait:
+                if self.requests is not None:
+                    self.requests.adjust(-1)
+                return wait
+        return 0.0
+
+    def settle(self, estimated_tokens, usage):
+        # Replace the estimate with the input tokens actually billed.
+        if self.tokens is None or usage is None:
+            return
+        actual = (getattr(usage, "input_tokens", 0) or 0) + (
+            getattr(usage, "cache_creation_input_tokens", 0) or 0
+        )
+        self.tokens.adjust(actual - estimated_tokens)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """
+    Returns the process-wide rate limiter, creating it on first use.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def _text_length(value):
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_text_length(v) for k, v in value.items() if k in ("text", "content"))
+    if isinstance(value, (list, tuple)):
+        return sum(_text_length(v) for v in value)
+    return 0
+
+
+def request_tokens(request):
+    """
+    Estimates the input tokens of a Messages API request.
+    """
+    chars = _text_length(request.get("system", "")) + _text_length(request.get("messages", []))
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def cached_system(text):
+    """
+    Returns a system prompt as a text block with a cache breakpoint, so the
+    prompt is cached and reused by later requests that start with it. An
+    empty prompt gives no blocks, as the API rejects empty text blocks.
+    """
+    if not text:
+        return []
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+def cached_text(text):
+    """
+    Returns a message text block with a cache breakpoint, for content such as
+    document text that several requests repeat verbatim.
+    """
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def response_text(response):
+    """
+    Returns the text of a response, as the modes read it. Tool use blocks
+    carry no text and are skipped.
+    """
+    return "".join(block.text for block in response.content if block.type == "text")
+
+
+def _log_usage(response, elapsed, first_token):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    first = f"first token after {first_token:.1f}s" if first_token is not None else "no text"
+    logger.info(
+        f"Model call done in {elapsed:.1f}s ({first}): {usage.input_tokens} input tokens "
+        f"(cache write {getattr(usage, 'cache_creation_input_tokens', 0) or 0}, "
+        f"cache read {getattr(usage, 'cache_read_input_tokens', 0) or 0}), "
+        f"{usage.output_tokens} output tokens."
+    )
+
+
+class _TextCallback:
+    """
+    Wraps an ``on_text`` callback so that an exception it raises (a Streamlit
+    rerun or stop, or a UI error) does not abort the model call while it
+    holds a concurrency slot. The callback is switched off after its first
+    error, and the error is re-raised by ``raise_error`` once the call has
+    finished and released its slot.
+
+    Streamed deltas are collected with ``add`` and joined only when the
+    callback is due, at most every ``_STREAM_REFRESH_SECONDS``.
+    """
+
+    def __init__(self, on_text):
+        self.on_text = on_text
+        self.error = None
+        self.start()
+
+    @property
+    def active(self):
+        return self.on_text is not None and self.error is None
+
+    def start(self):
+        # Each attempt of a call streams its text from scratch.
+        self.deltas = []
+        self.refreshed = None
+
+    def add(self, delta):
+        if not self.active:
+            return
+        self.deltas.append(delta)
+        now = time.monotonic()
+        if self.refreshed is None or now - self.refreshed >= _STREAM_REFRESH_SECONDS:
+            self.refreshed = now
+            self("".join(self.deltas), False)
+
+    def __call__(self, text, done):
+        if not self.active:
+            return
+        try:
+            self.on_text(text, done)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException as e:
+            logger.info(f"Live text callback stopped: {type(e).__name__}.")
+            self.error = e
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+
+def _finish(limiter, estimate, response, started, first_token, on_text):
+    limiter.settle(estimate, getattr(response, "usage", None))
+    _log_usage(response, time.monotonic() - started, first_token)
+    on_text(response_text(response), True)
+
+
+def lookup_response(client, request):
+    """
+    Returns ``(key, cached_response)`` for a request. Lookups are skipped when
+    the client bypasses the cache, but the key is still returned so the fresh
+    response replaces the stored one.
+    """
+    key = request_key(request)
+    if not client.use_cache:
+        return key, None
+    cached = get_cached_response(key)
+    client.cache_stats.record(cached is not None)
+    if cached is not None:
+        logger.info(f"Model call served from the response cache ({key[:12]}).")
+    return key, cached
+
+
+def _retry_after(error):
+    # Seconds requested by the server, from retry-after-ms or retry-after.
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _classify(error):
+    """
+    Returns ``(retryable, throttled)`` for an exception raised by a call.
+    """
+    if isinstance(error, RateLimitError):
+        return True, True
+    if isinstance(error, APIStatusError):
+        if error.status_code == 529:
+            return True, True
+        return error.status_code >= 500 or error.status_code in (408, 409), False
+    if isinstance(error, APIConnectionError):
+        return True, False
+    return False, False
+
+
+def _backoff(attempt, error):
+    # Full jitter, but never sooner than the server asked for.
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, BACKOFF_BASE_SECONDS))
+    return retry_after, delay
+
+
+def _outcome(error):
+    # Outcome of a failed call, as reported to the concurrency limit.
+    return "throttled" if _classify(error)[1] else "error"
+
+
+def _handle_failure(limiter, error, attempt, description):
+    """
+    Decides whether to retry a failed call.
+
+    Returns:
+        float: Seconds to sleep before retrying. The error is re-raised when
+            it is not retryable or the retries are used up.
+    """
+    retryable, _ = _classify(error)
+    if not retryable or attempt >= MAX_RETRIES:
+        raise error
+    retry_after, delay = _backoff(attempt, error)
+    if retry_after is not None:
+        limiter.pause(retry_after)
+    logger.warning(
+        f"{description} failed ({type(error).__name__}: {error}); "
+        f"retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s."
+    )
+    return delay
+
+
+class _Messages:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, on_text=None, **request):
+        return self._client.create(on_text=on_text, **request)
+
+
+class LLMClient:
+    """
+    Anthropic client wrapper used by every analysis mode.
+
+    ``client.messages.create(**request)`` returns the same message as the SDK
+    call, but streams it: ``on_text(text, done)``, if given, is called with the
+    text received so far as it arrives (at most every ``_STREAM_REFRESH_SECONDS``),
+    and once more with ``done=True`` and the final text (also on a cache hit,
+    and from scratch again if a failed call is retried). Time to first token and total duration are logged for
+    every call. Before each call it waits for the shared request and token
+    buckets and a concurrency slot, and retries rate-limit, overload, server and connection errors with jittered
+    exponential backoff that honours retry-after headers. The SDK's own
+    retries are disabled so calls are not retried twice.
+
+    Responses are stored in the on-disk response cache, and identical requests
+    are answered from it unless ``use_cache`` is False (the per-run bypass);
+    ``cache_stats`` counts the hits and misses of this client.
+
+    ``client.aio()`` returns the async counterpart, sharing the same limits
+    and cache statistics.
+    """
+
+    def __init__(self, api_key, base_url=None, limiter=None, use_cache=True, cache_stats=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limiter = limiter or get_limiter()
+        self.use_cache = use_cache
+        self.cache_stats = cache_stats or CacheStats()
+        self.sdk = Anthropic(api_key=api_key, base_url=base_url, max_retries=0)
+        self.messages = _Messages(self)
+
+    def create(self, on_text=None, **request):
+        key, cached = lookup_response(self, request)
+        if cached is not None:
+            if on_text is not None:
+                on_text(response_text(cached), True)
+            return cached
+        limiter = self.limiter
+        estimate = request_tokens(request)
+        callback = _TextCallback(on_text)
+        for attempt in range(MAX_RETRIES + 1):
+            while (wait := limiter.wait_time(estimate)) > 0:
+                time.sleep(wait)
+            limiter.concurrency.enter()
+            started = time.monotonic()
+            # The slot is released on any exit, including BaseExceptions such
+            # as KeyboardInterrupt or a Streamlit rerun.
+            outcome = "error"
+            try:
+                response, first_token = self._stream(request, callback, started)
+                outcome = "success"
+            except Exception as e:
+                outcome = _outcome(e)
+                delay = _handle_failure(limiter, e, attempt, "Model call")
+            finally:
+                limiter.concurrency.exit(outcome)
+            if outcome != "success":
+                time.sleep(delay)
+                continue
+            _finish(limiter, estimate, response, started, first_token, callback)
+            put_cached_response(key, response)
+            callback.raise_error()
+            return response
+
+    def _stream(self, request, on_text, started):
+        first_token = None
+        on_text.start()
+        with self.sdk.messages.stream(**request) as stream:
+            for delta in stream.text_stream:
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                on_text.add(delta)
+            return stream.get_final_message(), first_token
+
+    def aio(self):
+        """
+        Returns an ``AsyncLLMClient`` with the same credentials and limits.
+        Use it as an async context manager inside one event loop.
+        """
+        return AsyncLLMClient(
+            self.api_key, self.base_url, self.limiter, self.use_cache, self.cache_stats
+        )
+
+
+class _AsyncMessages:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, on_text=None, **request):
+        return await self._client.create(on_text=on_text, **request)
+
+
+class AsyncLLMClient:
+    """
+    Async counterpart of ``LLMClient`` built on ``AsyncAnthropic``.
+    """
+
+    def __init__(self, api_key, base_url=None, limiter=None, use_cache=True, cache_stats=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limiter = limiter or get_limiter()
+        self.use_cache = use_cache
+        self.cache_stats = cache_stats or CacheStats()
+        self.sdk = AsyncAnthropic(api_key=api_key, base_url=base_url, max_retries=0)
+        self.messages = _AsyncMessages(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.sdk.close()
+
+    async def _stream(self, request, on_text, started):
+        first_token = None
+        on_text.start()
+        async with self.sdk.messages.stream(**request) as stream:
+            async for delta in stream.text_stream:
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                on_text.add(delta)
+            return await stream.get_final_message(), first_token
+
+    async def create(self, on_text=None, **request):
+        key, cached = lookup_response(self, request)
+        if cached is not None:
+            if on_text is not None:
+                on_text(response_text(cached), True)
+            return cached
+        limiter = self.limiter
+        estimate = request_tokens(request)
+        callback = _TextCallback(on_text)
+        for attempt in range(MAX_RETRIES + 1):
+            while (wait := limiter.wait_time(estimate)) > 0:
+                await asyncio.sleep(wait)
+            await limiter.concurrency.enter_async()
+            started = time.monotonic()
+            # Released on cancellation too, not only on errors.
+            outcome = "error"
+            try:
+                response, first_token = await self._stream(request, callback, started)
+                outcome = "success"
+            except Exception as e:
+                outcome = _outcome(e)
+                delay = _handle_failure(limiter, e, attempt, "Model call")
+            finally:
+                limiter.concurrency.exit(outcome)
+            if outcome != "success":
+                await asyncio.sleep(delay)
+                continue
+            _finish(limiter, estimate, response, started, first_token, callback)
+            put_cached_response(key, response)
+            callback.raise_error()
+            return response
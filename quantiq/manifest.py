@@ -0,0 +1,114 @@
+# quantiq/manifest.py
+
+import os
+import json
+import hashlib
+import threading
+from quantiq.analysis import MAP_CHUNK_TOKENS, MAP_REDUCE_THRESHOLD_TOKENS, MODEL, _load_prompt
+from quantiq.blob_store import known_digest
+from quantiq.file_handler import PAGE_SELECTION_BUDGET_TOKENS, _extractor_version
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# Name of the run manifest kept next to the reports in the output directory.
+MANIFEST_NAME = "quantiq_manifest.json"
+
+# Bumped when the report pipeline changes in a way that makes old reports stale.
+MANIFEST_VERSION = 1
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """
+    Returns the SHA-256 digest of a file, reusing the blob store's digest for
+    uploads linked from it.
+    """
+    digest = known_digest(file_path)
+    if digest is not None:
+        return digest
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def company_fingerprint(file_paths, system_prompt, send_full_text):
+    """
+    Fingerprints everything a company's report depends on: the content of its
+    input files and the extractor version and limits that read each one, the
+    prompts, the model and the analysis settings.
+
+    Returns:
+        str: Hex digest that changes whenever the report would.
+    """
+    inputs = sorted(
+        (os.path.basename(path), file_digest(path), _extractor_version(path)) for path in file_paths
+    )
+    payload = {
+        "version": MANIFEST_VERSION,
+        "inputs": inputs,
+        "system_prompt": system_prompt,
+        "map_prompt": _load_prompt("prompts/map_extraction.txt"),
+        "model": MODEL,
+        "settings": {
+            "send_full_text": bool(send_full_text),
+            "page_selection_budget_tokens": PAGE_SELECTION_BUDGET_TOKENS,
+            "map_reduce_threshold_tokens": MAP_REDUCE_THRESHOLD_TOKENS,
+            "map_chunk_tokens": MAP_CHUNK_TOKENS,
+        },
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class RunManifest:
+    """
+    Records, per company, the fingerprint of the inputs a report was built
+    from and where the report was written, so a re-run can reuse reports
+    whose inputs have not changed.
+
+    The manifest is a JSON file in the output directory, so it is cleared
+    together with the reports on reset.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("companies", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable run manifest {self.path}: {e}")
+
+    def is_current(self, company_name, fingerprint):
+        """
+        Returns True if the company's report was built from the same inputs
+        and is still on disk.
+        """
+        with self.lock:
+            entry = self.entries.get(company_name)
+        return (
+            entry is not None
+            and entry.get("fingerprint") == fingerprint
+            and os.path.exists(entry.get("output", ""))
+        )
+
+    def record(self, company_name, fingerprint, output_path):
+        with self.lock:
+            self.entries[company_name] = {"fingerprint": fingerprint, "output": output_path}
+
+    def save(self):
+        """
+        Writes the manifest atomically.
+        """
+        with self.lock:
+            data = {"version": MANIFEST_VERSION, "companies": dict(self.entries)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
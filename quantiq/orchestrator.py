@@ -1,62 +1,257 @@
 import os
-import streamlit as st
-from quantiq.analysis import quantiq_analysis
-from quantiq.reporting import add_style, html_to_pdf
-from quantiq.download_manager import zipdir
+import asyncio
+from contextlib import nullcontext
+from quantiq.analysis import DEFAULT_SYSTEM_PROMPT, quantiq_analysis_async
+from quantiq.config import RunConfig
+from quantiq.batch import run_batch_analyses
+from quantiq.manifest import RunManifest, company_fingerprint
+from quantiq.render_pipeline import RenderPipeline, StageTracker
+from quantiq.progress import StreamlitReporter
 from quantiq.logging_setup import set_logging
 
 logger = set_logging()
 
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".xlsx", ".csv")
 
-def process_bulk_directory(client):
-    bulk_dir = st.session_state.bulk_dir
-    output_dir = st.session_state.bulk_output_dir
 
+def _company_files(file_dir):
+    return [
+        os.path.join(file_dir, f)
+        for f in os.listdir(file_dir)
+        if os.path.isfile(os.path.join(file_dir, f))
+        and f.endswith(SUPPORTED_EXTENSIONS)
+    ]
+
+
+def collect_companies(bulk_dir):
+    """
+    Lists the companies to analyse in a bulk directory.
+
+    Each subdirectory is one company. Files placed directly in the bulk
+    directory, with no subdirectories, are analysed together as "Analysis".
+
+    Returns:
+        list: ``(company_name, file_paths)`` pairs in directory order.
+    """
     subdirs = [
         d for d in os.listdir(bulk_dir)
         if os.path.isdir(os.path.join(bulk_dir, d))
     ]
 
     if not subdirs:
-        files = [
-            os.path.join(bulk_dir, f)
-            for f in os.listdir(bulk_dir)
-            if f.endswith((".pdf", ".docx", ".xlsx", ".csv"))
-        ]
-        if files:
-            subdirs = [None]
-
-    progress = st.progress(0)
-    total = len(subdirs)
-
-    for idx, subdir in enumerate(subdirs):
-        if subdir is None:
-            company_name = "Analysis"
-            file_dir = bulk_dir
-        else:
-            company_name = subdir
-            file_dir = os.path.join(bulk_dir, subdir)
-
-        file_paths = [
-            os.path.join(file_dir, f)
-            for f in os.listdir(file_dir)
-            if os.path.isfile(os.path.join(file_dir, f))
-            and f.endswith((".pdf", ".docx", ".xlsx", ".csv"))
-        ]
+        files = _company_files(bulk_dir)
+        return [("Analysis", files)] if files else []
 
+    companies = []
+    for subdir in subdirs:
+        file_paths = _company_files(os.path.join(bulk_dir, subdir))
         if not file_paths:
-            logger.warning(f"No processable files in {file_dir}")
+            logger.warning(f"No processable files in {os.path.join(bulk_dir, subdir)}")
             continue
+        companies.append((subdir, file_paths))
+    return companies
+
+
+async def _analyse_companies(
+    client, companies, system_prompt, send_full_text, concurrency, finish, on_complete, stream, tracker
+):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyse(company_name, file_paths):
+        async with semaphore:
+            on_text = stream(company_name) if stream is not None else None
+            with tracker.track("Model") if tracker is not None else nullcontext():
+                result = await quantiq_analysis_async(
+                    client, file_paths, company_name, system_prompt, send_full_text, on_text
+                )
+        # Post-processing (e.g. queueing the PDF render) runs outside the
+        # semaphore, so the next analysis can start right away.
+        if result and finish is not None:
+            await asyncio.to_thread(finish, company_name, result)
+        return company_name, result
+
+    results = {}
+    tasks = [asyncio.create_task(analyse(name, paths)) for name, paths in companies]
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        company_name, result = await task
+        results[company_name] = result
+        if on_complete is not None:
+            on_complete(company_name, result, done, len(tasks))
+    return results
+
+
+def run_company_analyses(
+    client, companies, config, finish=None, on_complete=None, stream=None, tracker=None
+):
+    """
+    Analyses several companies concurrently with the async model client.
+
+    At most ``concurrency`` analyses are in flight at once. Each one builds
+    the same requests as ``quantiq_analysis``, so the reports match the
+    sequential path; only the order in which they finish differs.
+
+    Args:
+        client: ``LLMClient`` instance; its async counterpart shares the
+            same rate limits.
+        companies (list): ``(company_name, file_paths)`` pairs.
+        config (RunConfig): Run settings; ``concurrency`` bounds the
+            analyses in flight.
+        finish (callable): Optional ``finish(company_name, result)`` run in a
+            worker thread after each successful analysis.
+        on_complete (callable): Optional ``on_complete(company_name, result,
+            done, total)`` called on the calling thread as each company
+            finishes; ``result`` is None if the analysis failed.
+        stream (callable): Optional ``stream(company_name)`` called as each
+            analysis starts; returns the ``on_text`` callback its report is
+            streamed to.
+        tracker (StageTracker): Optional tracker the time spent in each
+            analysis is recorded on, as the "Model" stage.
+
+    Returns:
+        dict: Report content (or None on failure) per company, in input order.
+    """
+    concurrency = max(1, int(config.concurrency))
+    system_prompt = config.system_prompt or DEFAULT_SYSTEM_PROMPT
+    send_full_text = config.send_full_text
+
+    async def main():
+        async with client.aio() as async_client:
+            return await _analyse_companies(
+                async_client,
+                companies,
+                system_prompt,
+                send_full_text,
+                concurrency,
+                finish,
+                on_complete,
+                stream,
+                tracker,
+            )
+
+    logger.info(f"Analysing {len(companies)} companies, {concurrency} at a time.")
+    results = asyncio.run(main())
+    return {name: results.get(name) for name, _ in companies}
 
-        st.text(f"Analyzing: {company_name}")
-        result = quantiq_analysis(client, file_paths, company_name)
 
+def company_progress(reporter):
+    """
+    Returns an ``on_complete`` callback for ``run_company_analyses`` that
+    reports each finished company and the overall progress to ``reporter``.
+    """
+    def report(company_name, result, done, total):
         if result:
-            output_filename = f"{company_name}_quantiq_analysis.pdf"
-            html_to_pdf(result, output_filename, output_dir)
-            logger.info(f"Generated report for {company_name}")
+            reporter.info(f"Analyzed: {company_name} ({done}/{total})")
+        else:
+            reporter.failure(f"Analysis failed for {company_name}.")
+        reporter.progress(done / total)
+
+    return report
+
+
+def process_bulk_directory(client, config=None, reporter=None):
+    """
+    Analyses every company in the input directory and writes one PDF report
+    per company.
+
+    Parameters:
+    - client: ``LLMClient`` instance.
+    - config: ``RunConfig``; defaults to the current session's settings.
+    - reporter: ``Reporter`` receiving progress; defaults to the Streamlit page.
+    """
+    config = config or RunConfig.from_session()
+    reporter = reporter or StreamlitReporter()
+    output_dir = config.output_dir
+
+    companies = collect_companies(config.input_dir)
+    if not companies:
+        reporter.failure(f"No processable files in {config.input_dir}", fatal=True)
+        return
+
+    system_prompt = config.system_prompt or DEFAULT_SYSTEM_PROMPT
+    manifest = RunManifest(output_dir)
+    fingerprints = {
+        name: company_fingerprint(paths, system_prompt, config.send_full_text) for name, paths in companies
+    }
+    total = len(companies)
+    if config.reuse_reports:
+        companies = [(name, paths) for name, paths in companies if not manifest.is_current(name, fingerprints[name])]
+    reused = total - len(companies)
+
+    reporter.progress(0)
+    tracker = StageTracker()
+    unrendered = []
+
+    # Model responses feed the render queue; worker processes render the PDFs
+    # while the remaining analyses are still in flight.
+    with RenderPipeline(tracker) as pipeline:
 
-        progress.progress((idx + 1) / total)
+        def render(company_name, result):
+            filename = f"{company_name}_quantiq_analysis.pdf"
+            output_path = os.path.join(output_dir, filename)
 
-    progress.empty()
+            def written(future):
+                # Only reports this run actually wrote go into the manifest.
+                if future.exception() is None:
+                    manifest.record(company_name, fingerprints[company_name], output_path)
+                else:
+                    unrendered.append(company_name)
+
+            pipeline.submit(result, filename, output_dir).add_done_callback(written)
+
+        if config.batch_mode:
+
+            def batch_progress(stage, done, total):
+                reporter.status(f"{stage}: {done}/{total} requests done")
+                reporter.progress(done / total)
+
+            with tracker.track("Model"):
+                results = run_batch_analyses(
+                    client,
+                    companies,
+                    system_prompt=system_prompt,
+                    send_full_text=config.send_full_text,
+                    on_progress=batch_progress,
+                )
+            report = company_progress(reporter)
+            for done, (company_name, result) in enumerate(results.items(), start=1):
+                if result:
+                    render(company_name, result)
+                report(company_name, result, done, len(results))
+        else:
+            run_company_analyses(
+                client,
+                companies,
+                config,
+                finish=render,
+                on_complete=company_progress(reporter),
+                stream=reporter.stream,
+                tracker=tracker,
+            )
+        reporter.status("Rendering reports...")
+
+    manifest.save()
+    reporter.done()
+    for company_name in unrendered:
+        reporter.failure(f"Could not render the report for {company_name}.")
+    reporter.info(f"Recomputed {len(companies)} companies; reused {reused} unchanged reports.")
+    reporter.info(f"Pipeline utilisation: {tracker.describe()}")
     logger.info("Bulk processing complete.")
+
+
+def run_mode(client, config, reporter):
+    """
+    Runs the analysis mode selected in ``config``.
+
+    Parameters:
+    - client: ``LLMClient`` instance.
+    - config: ``RunConfig`` of the run.
+    - reporter: ``Reporter`` receiving progress.
+    """
+    if config.mode == "Comparative":
+        from quantiq.comparative import run_comparative_analysis
+        run_comparative_analysis(client, config, reporter)
+    elif config.mode == "DCF Valuation":
+        from quantiq.dcf import run_dcf_analysis
+        run_dcf_analysis(client, config, reporter)
+    else:
+        process_bulk_directory(client, config, reporter)
@@ -0,0 +1,86 @@
+# quantiq/page_classifier.py
+
+import re
+from quantiq.text_utils import estimate_tokens
+
+STATEMENT_TITLE = re.compile(
+    r"\b(?:statements? of (?:consolidated )?(?:income|operations|earnings|comprehensive income|"
+    r"financial position|cash flows?|changes in (?:stockholders'?|shareholders'?|members'?)?\s*equity)|"
+    r"balance sheets?|income statements?|cash flow statements?|profit and loss|"
+    r"notes to (?:the )?(?:consolidated )?financial statements)\b",
+    re.I,
+)
+
+LINE_ITEM = re.compile(
+    r"\b(?:revenues?|net sales|turnover|cost of (?:sales|goods sold|revenues?)|gross (?:profit|margin)|"
+    r"operating (?:income|expenses|profit|loss)|ebitda|net (?:income|loss|profit|earnings)|"
+    r"earnings per share|total assets|total liabilities|current (?:assets|liabilities)|"
+    r"inventor(?:y|ies)|receivables?|payables?|retained earnings|(?:stockholders|shareholders)'? equity|"
+    r"depreciation|amortization|capital expenditures?|(?:operating|investing|financing) activities|"
+    r"cash and cash equivalents|borrowings|long-term debt|interest expense|income taxes?)\b",
+    re.I,
+)
+
+NUMBER = re.compile(r"^\(?[-–]?[$€£]?\d[\d,]*(?:\.\d+)?\)?%?$")
+
+
+def score_page(text):
+    """
+    Scores how likely a page is to hold financial-statement content.
+
+    The score combines statement titles (income statement, balance sheet,
+    cash flow statement, notes), financial line-item keywords and the share of
+    tokens that are numbers. Narrative pages score near zero; statement pages
+    typically score above 3.
+
+    Args:
+        text (str): Text of the page.
+
+    Returns:
+        float: Page score.
+    """
+    tokens = text.split()
+    if not tokens:
+        return 0.0
+    titles = len(STATEMENT_TITLE.findall(text))
+    line_items = len(LINE_ITEM.findall(text))
+    number_density = sum(1 for token in tokens if NUMBER.match(token)) / len(tokens)
+    return 3.0 * min(titles, 2) + min(line_items, 15) / 5.0 + 4.0 * number_density
+
+
+def select_pages(chunks, token_budget):
+    """
+    Keeps the highest-scoring pages that fit within a token budget.
+
+    Chunks without a score (spreadsheets, CSVs, Word documents) are always
+    kept and count against the budget first. Scored pages are then added in
+    descending score order while they fit, and the result is returned in the
+    original document order. If everything fits, nothing is dropped.
+
+    Args:
+        chunks (list): ``(text, score)`` pairs in document order, where
+            ``score`` is None for chunks that must always be kept.
+        token_budget (int): Maximum estimated tokens to keep.
+
+    Returns:
+        tuple: ``(texts, dropped)`` — the kept texts in document order and
+            the number of pages dropped.
+    """
+    tokens = [estimate_tokens(text) for text, _ in chunks]
+    if sum(tokens) <= token_budget:
+        return [text for text, _ in chunks], 0
+
+    keep = [score is None for _, score in chunks]
+    used = sum(t for t, kept in zip(tokens, keep) if kept)
+
+    ranked = sorted(
+        (idx for idx, (_, score) in enumerate(chunks) if score is not None),
+        key=lambda idx: (-chunks[idx][1], idx),
+    )
+    for idx in ranked:
+        if used + tokens[idx] <= token_budget:
+            keep[idx] = True
+            used += tokens[idx]
+
+    texts = [text for (text, _), kept in zip(chunks, keep) if kept]
+    return texts, len(chunks) - len(texts)
@@ -0,0 +1,136 @@
+# quantiq/progress.py
+
+import sys
+import threading
+import streamlit as st
+from quantiq.utils import live_report
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+
+class Reporter:
+    """
+    Receives the progress of an analysis run.
+
+    The modes report through a reporter instead of calling Streamlit, so the
+    same code runs on the page, in a job worker or from the command line.
+    This base class only logs; subclasses also show the progress somewhere.
+    """
+
+    def __init__(self):
+        self.failures = []
+        self.fatal = False
+
+    def info(self, message):
+        logger.info(message)
+
+    def status(self, message):
+        """
+        Shows a transient status line that replaces the previous one.
+        """
+        logger.info(message)
+
+    def failure(self, message, fatal=False):
+        """
+        Reports a company that could not be analysed (or, with ``fatal``, a
+        run that cannot continue). Failures are kept in ``failures``, and
+        ``fatal`` is set once the run has been abandoned.
+        """
+        self.failures.append(message)
+        self.fatal = self.fatal or fatal
+        logger.error(message)
+
+    def progress(self, fraction):
+        pass
+
+    def stream(self, label):
+        """
+        Returns an ``on_text(text, done)`` callback that shows a report as it
+        streams in, or None if this reporter does not show live text.
+        """
+        return None
+
+    def done(self):
+        pass
+
+
+class StreamlitReporter(Reporter):
+    """
+    Reports progress on the current Streamlit page.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._bar = None
+        self._status = None
+
+    def info(self, message):
+        super().info(message)
+        st.text(message)
+
+    def status(self, message):
+        super().status(message)
+        if self._status is None:
+            self._status = st.empty()
+        self._status.text(message)
+
+    def failure(self, message, fatal=False):
+        super().failure(message, fatal)
+        (st.error if fatal else st.warning)(message)
+
+    def progress(self, fraction):
+        if self._bar is None:
+            self._bar = st.progress(0)
+        self._bar.progress(min(max(fraction, 0.0), 1.0))
+
+    def stream(self, label):
+        return live_report(label)
+
+    def done(self):
+        for element in (self._bar, self._status):
+            if element is not None:
+                element.empty()
+        self._bar = None
+        self._status = None
+
+
+class ConsoleReporter(Reporter):
+    """
+    Prints progress to stdout for command-line runs. With ``stream_text``,
+    report text is also written to stdout as it streams in.
+    """
+
+    def __init__(self, stream_text=False, out=None):
+        super().__init__()
+        self.stream_text = stream_text
+        self.out = out or sys.stdout
+        self._lock = threading.Lock()
+
+    def _print(self, text):
+        with self._lock:
+            self.out.write(text)
+            self.out.flush()
+
+    def info(self, message):
+        super().info(message)
+        self._print(f"{message}\n")
+
+    def status(self, message):
+        super().status(message)
+        self._print(f"{message}\n")
+
+    def stream(self, label):
+        if not self.stream_text:
+            return None
+        written = 0
+
+        def on_text(text, done):
+            nonlocal written
+            if written == 0:
+                self._print(f"\n=== {label} ===\n")
+            self._print(text[written:] + ("\n" if done else ""))
+            written = len(text)
+
+        return on_text
@@ -0,0 +1,186 @@
+# quantiq/render_pipeline.py
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfWriter
+from quantiq.reporting import html_to_pdf
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# Worker processes rendering PDFs while model calls are in flight.
+RENDER_WORKERS = int(os.getenv("QUANTIQ_RENDER_WORKERS", 2))
+
+
+def _union(intervals):
+    """
+    Merges ``(start, end)`` intervals into disjoint, sorted ones.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _length(intervals):
+    return sum(end - start for start, end in intervals)
+
+
+def _intersection(a, b):
+    overlap = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            overlap.append([start, end])
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return overlap
+
+
+class StageTracker:
+    """
+    Records when each pipeline stage is working, to report how busy every
+    stage was and how much the stages overlapped.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.intervals = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, start, end):
+        with self.lock:
+            self.intervals.setdefault(stage, []).append((start, end))
+
+    @contextmanager
+    def track(self, stage):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(stage, start, time.time())
+
+    def summary(self):
+        """
+        Returns the utilisation of each stage over the run.
+
+        Returns:
+            dict: Per stage, ``busy`` (share of wall time with at least one
+                job running), ``jobs`` and ``job_seconds``; plus ``wall`` (run
+                duration in seconds) and, with two or more stages,
+                ``overlap`` (share of wall time all stages were busy at once).
+        """
+        with self.lock:
+            intervals = {stage: list(items) for stage, items in self.intervals.items()}
+        wall = max(time.time() - self.started, 1e-9)
+        summary = {"wall": wall}
+        unions = []
+        for stage, items in intervals.items():
+            union = _union(items)
+            unions.append(union)
+            summary[stage] = {
+                "busy": _length(union) / wall,
+                "jobs": len(items),
+                "job_seconds": sum(end - start for start, end in items),
+            }
+        if len(unions) > 1:
+            overlap = unions[0]
+            for union in unions[1:]:
+                overlap = _intersection(overlap, union)
+            summary["overlap"] = _length(overlap) / wall
+        return summary
+
+    def describe(self):
+        """
+        Returns the utilisation summary as one line of text.
+        """
+        summary = self.summary()
+        parts = [
+            f"{stage} busy {stats['busy']:.0%} ({stats['jobs']} jobs, {stats['job_seconds']:.1f} job-seconds)"
+            for stage, stats in summary.items()
+            if isinstance(stats, dict)
+        ]
+        if "overlap" in summary:
+            parts.append(f"stages overlapped {summary['overlap']:.0%}")
+        return f"{summary['wall']:.1f}s wall time: " + "; ".join(parts)
+
+
+def _render(html_content, filename, output_dir):
+    # Runs in a worker process; returns its own timing for the tracker.
+    start = time.time()
+    html_to_pdf(html_content, filename, output_dir)
+    return start, time.time()
+
+
+class RenderPipeline:
+    """
+    Render stage of the report pipeline.
+
+    Model responses are queued with ``submit`` and rendered to PDF by worker
+    processes, so WeasyPrint's CPU work overlaps with the model calls still in
+    flight instead of delaying the next request. ``close`` waits for every
+    queued render. Use it as a context manager.
+    """
+
+    def __init__(self, tracker=None, workers=None):
+        self.tracker = tracker or StageTracker()
+        self.executor = ProcessPoolExecutor(max_workers=workers or RENDER_WORKERS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _done(self, future):
+        try:
+            start, end = future.result()
+        except Exception as e:
+            logger.error(f"Error in render worker: {e}")
+            return
+        self.tracker.record("Render", start, end)
+
+    def submit(self, html_content, filename, output_dir):
+        """
+        Queues one report for rendering to ``output_dir/filename``.
+
+        Returns:
+            Future: Completes when the PDF has been written, or holds the
+                render error.
+        """
+        future = self.executor.submit(_render, html_content, filename, output_dir)
+        future.add_done_callback(self._done)
+        return future
+
+    def close(self):
+        """
+        Waits for all queued renders and stops the workers.
+        """
+        self.executor.shutdown(wait=True)
+
+
+def merge_pdfs(paths, output_path):
+    """
+    Concatenates PDF files into one.
+
+    Args:
+        paths (list): PDF files in the order they should appear.
+        output_path (str): Path of the merged PDF.
+    """
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    logger.info(f"Merged {len(paths)} sections into {output_path}.")
@@ -155,6 +155,9 @@ def html_to_pdf(html_content, filename, output_dir):
         html_content (str): Styled HTML content.
         filename (str): Name of the output PDF file.
         output_dir (str): Directory to save the PDF.
+
+    Raises:
+        Exception: Any error from styling or rendering, after logging it.
     """
     try:
         string = add_style(html_content)
@@ -167,6 +170,7 @@ def html_to_pdf(html_content, filename, output_dir):
         logger.info(f"PDF generated and saved at {save_path}.")
     except Exception as e:
         logger.error(f"Error in html_to_pdf function: {e}")
+        raise
 
 
 def insert_style_and_image(html_content, image_path):
@@ -0,0 +1,124 @@
+# quantiq/response_cache.py
+
+import os
+import json
+import hashlib
+import threading
+from anthropic.types import Message
+from quantiq.disk_cache import CompressedCache
+from quantiq.logging_setup import set_logging
+
+# Initialize logger
+logger = set_logging()
+
+# Directory holding the compressed model responses.
+CACHE_DIR = os.getenv(
+    "QUANTIQ_RESPONSE_CACHE_DIR", os.path.join("cache", "responses")
+)
+
+# Upper bound on the on-disk size of the cache before LRU eviction kicks in.
+CACHE_MAX_BYTES = int(os.getenv("QUANTIQ_RESPONSE_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+# Age after which a cached response is no longer served.
+CACHE_TTL_SECONDS = float(os.getenv("QUANTIQ_RESPONSE_CACHE_TTL_HOURS", 168)) * 3600
+
+
+class CacheStats:
+    """
+    Hit and miss counts of the response cache for one run.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        return f"{self.hits} of {self.hits + self.misses} model calls served from cache ({self.hit_rate:.0%})"
+
+
+def request_key(request):
+    """
+    Computes the cache key of a Messages API request from its model, system
+    prompt, max_tokens and messages, plus its tools when it has any.
+
+    Returns:
+        str: Hex digest identifying the request.
+    """
+    payload = {
+        "model": request.get("model"),
+        "system": request.get("system"),
+        "max_tokens": request.get("max_tokens"),
+        "messages": request.get("messages"),
+    }
+    for name in ("tools", "tool_choice"):
+        if request.get(name) is not None:
+            payload[name] = request[name]
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _cache():
+    return CompressedCache(CACHE_DIR, CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS, label="response cache")
+
+
+def get_cached_response(key):
+    """
+    Looks up a stored response that is younger than the TTL.
+
+    The TTL is measured from when the response was stored; a hit also keeps
+    the entry from being evicted as least recently used.
+
+    Args:
+        key (str): Request key from ``request_key``.
+
+    Returns:
+        Message: Cached response, or None on a miss.
+    """
+    cache = _cache()
+    data = cache.get(key)
+    if data is None:
+        return None
+    try:
+        return Message.model_validate(data)
+    except Exception as e:
+        logger.warning(f"Discarding invalid response cache entry {key}: {e}")
+        try:
+            os.remove(cache.path(key))
+        except OSError:
+            pass
+        return None
+
+
+def put_cached_response(key, response):
+    """
+    Stores a response in the cache, compressed, then enforces the size bound.
+
+    Args:
+        key (str): Request key from ``request_key``.
+        response (Message): Response to store.
+    """
+    _cache().put(key, response.model_dump(mode="json"))
+
+
+def evict_cache(max_bytes=None):
+    """
+    Deletes expired entries, then the least recently used ones until the
+    cache fits in max_bytes.
+
+    Args:
+        max_bytes (int): Size bound in bytes. Defaults to ``CACHE_MAX_BYTES``.
+    """
+    _cache().evict(max_bytes)
@@ -0,0 +1,256 @@
+# quantiq/text_utils.py
+
+import re
+import math
+from collections import Counter, defaultdict
+
+# Rough characters-per-token ratio for English financial text. Good enough to
+# budget requests without calling a tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of model tokens in a piece of text.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Estimated token count.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_by_tokens(chunks, token_budget):
+    """
+    Groups text chunks into pieces that each fit within a token budget.
+
+    Chunks (for example PDF pages) are kept whole where possible. A single
+    chunk larger than the budget is split on line boundaries, and a single
+    line larger than the budget is split by characters.
+
+    Args:
+        chunks (iterable): Text chunks in document order.
+        token_budget (int): Maximum estimated tokens per piece.
+
+    Returns:
+        list: Text pieces in document order.
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    pieces = []
+    current = []
+    current_chars = 0
+
+    def flush():
+        nonlocal current, current_chars
+        if current:
+            pieces.append("".join(current))
+        current = []
+        current_chars = 0
+
+    for chunk in chunks:
+        if current_chars + len(chunk) <= max_chars:
+            current.append(chunk)
+            current_chars += len(chunk)
+            continue
+
+        flush()
+        if len(chunk) <= max_chars:
+            current.append(chunk)
+            current_chars = len(chunk)
+            continue
+
+        for line in chunk.splitlines(keepends=True):
+            while len(line) > max_chars:
+                flush()
+                pieces.append(line[:max_chars])
+                line = line[max_chars:]
+            if current_chars + len(line) > max_chars:
+                flush()
+            current.append(line)
+            current_chars += len(line)
+
+    flush()
+    return pieces
+
+
+def _clean_cell(value):
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def encode_table(rows):
+    """
+    Encodes a table compactly as pipe-delimited lines, one per row.
+
+    Cell whitespace is collapsed and no padding is added, which keeps the
+    token count close to the content itself.
+
+    Args:
+        rows (list): Rows of cell values.
+
+    Returns:
+        str: Encoded table, one line per row.
+    """
+    return "\n".join("|".join(_clean_cell(cell) for cell in row) for row in rows)
+
+
+def render_padded_table(rows):
+    """
+    Renders a table with space-padded, aligned columns, the way
+    ``DataFrame.to_string`` does. Used as the baseline when measuring how many
+    tokens the compact encoding saves.
+
+    Args:
+        rows (list): Rows of cell values.
+
+    Returns:
+        str: Rendered table.
+    """
+    rows = [[_clean_cell(cell) for cell in row] for row in rows]
+    if not rows:
+        return ""
+    column_count = max(len(row) for row in rows)
+    widths = [
+        max(len(row[col]) if col < len(row) else 0 for row in rows)
+        for col in range(column_count)
+    ]
+    return "\n".join(
+        "  ".join(
+            (row[col] if col < len(row) else "").rjust(widths[col])
+            for col in range(column_count)
+        )
+        for row in rows
+    )
+
+
+PAGE_NUMBER_LINE = re.compile(
+    r"^(?:page\s*)?[-–(\[]?\s*\d{1,4}\s*[-–)\]]?(?:\s*(?:of|/)\s*\d{1,4})?$", re.I
+)
+EDGE_NUMBER = re.compile(r"^\d{1,4}\s+|\s+\d{1,4}$")
+DIGITS = re.compile(r"\d+")
+HORIZONTAL_SPACE = re.compile(r"[ \t\xa0\u2000-\u200b]+")
+
+# Non-empty lines at the top and bottom of a page that may hold a page
+# number, alone or in a running header or footer. Elsewhere such lines are
+# kept: extracted statements often put each cell (a year, an amount, "(120)")
+# on its own line.
+PAGE_EDGE_LINES = 2
+
+
+def _numbered_key(line):
+    """
+    Splits a line that may carry a page number into a template, with the
+    number replaced, and the number: a line holding only a page number
+    ("12", "- 12 -", "Page 12 of 40") or a line with a number at either end.
+    Returns None for other lines.
+    """
+    if PAGE_NUMBER_LINE.match(line):
+        match = DIGITS.search(line)
+        return DIGITS.sub("#", line, count=1), int(match.group())
+    match = EDGE_NUMBER.search(line)
+    if match is None:
+        return None
+    return EDGE_NUMBER.sub("#", line, count=1), int(match.group().strip())
+
+
+def _is_page_sequence(occurrences):
+    # Page numbers rise at least as fast as the page position; pages without
+    # text are missing from the list, so they may rise faster.
+    return all(
+        number > prev_number and number - prev_number >= index - prev_index
+        for (prev_index, prev_number), (index, number) in zip(occurrences, occurrences[1:])
+    )
+
+
+def _edge_lines(lines):
+    # Indices of the non-empty lines at the top and bottom of a page,
+    # outermost first: last line, first line, second-to-last, second...
+    content = [idx for idx, line in enumerate(lines) if line]
+    edges = []
+    for depth in range(PAGE_EDGE_LINES):
+        for idx in content[-1 - depth:len(content) - depth] + content[depth:depth + 1]:
+            if idx not in edges:
+                edges.append(idx)
+    return edges
+
+
+def normalise_pages(pages, min_repeat_ratio=0.5, min_repeat_pages=3):
+    """
+    Removes running headers, footers, page numbers and repeated disclaimers
+    from extracted pages, and collapses runs of whitespace.
+
+    A line counts as boilerplate when it appears unchanged on at least
+    ``min_repeat_ratio`` of the pages (and on no fewer than
+    ``min_repeat_pages`` pages). Page numbers, alone on a line or at either
+    end of a header or footer, are dropped only at the top or bottom of a
+    page, and only when the same line rises from page to page across that
+    many pages; a lone figure such as "(56)" or "2023" is always kept.
+
+    Args:
+        pages (list): Text of each page in order.
+        min_repeat_ratio (float): Share of pages a line must appear on.
+        min_repeat_pages (int): Minimum number of pages a line must appear on.
+
+    Returns:
+        list: Normalised text of each page, each ending in a newline. Pages
+            left empty are dropped.
+    """
+    page_lines = [
+        [HORIZONTAL_SPACE.sub(" ", line).strip() for line in page.splitlines()]
+        for page in pages
+    ]
+    page_edges = [_edge_lines(lines) for lines in page_lines]
+
+    repeated = set()
+    # Page number of each page, by (template, page index).
+    page_numbers = {}
+    if len(pages) >= min_repeat_pages:
+        threshold = max(min_repeat_pages, math.ceil(min_repeat_ratio * len(pages)))
+        counts = Counter()
+        occurrences = defaultdict(dict)
+        for index, (lines, edges) in enumerate(zip(page_lines, page_edges)):
+            counts.update(
+                {
+                    line.lower()
+                    for line in lines
+                    if line and len(line) <= 200 and not PAGE_NUMBER_LINE.match(line)
+                }
+            )
+            for idx in edges:
+                key = _numbered_key(lines[idx].lower())
+                if key is not None:
+                    # The outermost candidate of a page is its page number.
+                    occurrences[key[0]].setdefault(index, key[1])
+        repeated = {line for line, count in counts.items() if count >= threshold}
+        for template, by_page in occurrences.items():
+            if len(by_page) >= threshold and _is_page_sequence(sorted(by_page.items())):
+                page_numbers.update(((template, index), number) for index, number in by_page.items())
+
+    def is_boilerplate(line, index, at_edge):
+        key = line.lower()
+        if key in repeated:
+            return True
+        if not at_edge:
+            return False
+        numbered_key = _numbered_key(key)
+        return numbered_key is not None and page_numbers.get((numbered_key[0], index)) == numbered_key[1]
+
+    normalised = []
+    for index, (lines, edges) in enumerate(zip(page_lines, page_edges)):
+        kept = []
+        for idx, line in enumerate(lines):
+            if not line:
+                if kept and kept[-1]:
+                    kept.append("")
+                continue
+            if is_boilerplate(line, index, idx in edges):
+                continue
+            kept.append(line)
+        while kept and not kept[-1]:
+            kept.pop()
+        if kept:
+            normalised.append("\n".join(kept) + "\n")
+    return normalised
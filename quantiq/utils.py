@@ -1,8 +1,10 @@
 # quantiq/utils.py
 
 import os
+import time
 import shutil
 import streamlit as st
+from quantiq.blob_store import prune_blobs
 from quantiq.logging_setup import set_logging
 
 # Initialize logger
@@ -40,6 +42,7 @@ def reset_run():
             st.session_state.bulk_output_dir,
         ]
         delete_dir_contents(directories)
+        prune_blobs()
         st.session_state.bulk_file_uploaded = False
         st.session_state.reset_clicked = True
         st.rerun()
@@ -48,6 +51,39 @@ def reset_run():
         logger.error(f"Error in reset_run function: {e}")
 
 
+def live_report(label, refresh_seconds=0.3):
+    """
+    Shows a report on the page while it streams in.
+
+    The text is redrawn at most every ``refresh_seconds`` while it arrives,
+    and the finished report is folded into a collapsed expander.
+
+    Args:
+        label (str): Heading shown above the report.
+        refresh_seconds (float): Minimum time between redraws.
+
+    Returns:
+        callable: ``on_text(text, done)`` callback for ``LLMClient`` calls.
+    """
+    placeholder = st.empty()
+    last_drawn = 0.0
+
+    def on_text(text, done):
+        nonlocal last_drawn
+        now = time.monotonic()
+        if done:
+            with placeholder.container():
+                with st.expander(label):
+                    st.markdown(text, unsafe_allow_html=True)
+        elif now - last_drawn >= refresh_seconds:
+            last_drawn = now
+            with placeholder.container():
+                st.caption(f"{label} (generating...)")
+                st.markdown(text, unsafe_allow_html=True)
+
+    return on_text
+
+
 def feedback():
     """
     Provides a feedback mechanism with thumbs up/down.
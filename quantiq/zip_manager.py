@@ -6,9 +6,48 @@ from collections import defaultdict
 import re
 import shutil
 import spacy
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 import subprocess
 import sys
+import tempfile
+import threading
+from quantiq.blob_store import store_upload
+
+# Root directory for the per-run scratch directories that ZIP uploads are
+# extracted into before being organised into the bulk directory.
+SCRATCH_ROOT = os.getenv("QUANTIQ_SCRATCH_DIR", "tmp")
+
+# Limits on the uncompressed size of a single ZIP member and of the whole archive.
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("QUANTIQ_ZIP_MAX_MEMBER_MB", 200)) * 1024 * 1024
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("QUANTIQ_ZIP_MAX_TOTAL_MB", 1024)) * 1024 * 1024
+
+NER_MODEL = 'en_core_web_sm'
+
+# Pipeline components that entity recognition does not use. The ner component
+# of the en_core_web models has its own embedding layer, so the shared
+# tok2vec can be left out along with the tagger and parser.
+NER_EXCLUDE = ['tok2vec', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'senter']
+
+# Length of the normalised-name prefix used to block candidate pairs before
+# fuzzy matching; only names sharing a prefix are compared.
+BLOCK_PREFIX_LENGTH = 3
+
+# Rows of the similarity matrix scored per rapidfuzz call, bounding memory
+# for very large blocks.
+SIMILARITY_BATCH_ROWS = 1000
+
+# Words dropped before company names are compared: legal forms, and the
+# document-type words that filenames often carry next to the company name.
+COMPANY_STOPWORDS = {
+    'the', 'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd',
+    'limited', 'llc', 'plc', 'lp', 'llp', 'group', 'holdings', 'sa', 'ag', 'gmbh', 'nv', 'bv',
+    'annual', 'report', 'reports', 'financial', 'financials', 'statement', 'statements',
+    'balance', 'sheet', 'income', 'cash', 'flow', 'flows', 'results', 'quarterly', 'interim',
+    'audited', 'accounts', 'fy', 'q1', 'q2', 'q3', 'q4', '10', 'k', 'q', '10k', '10q', 'draft', 'final',
+}
+
+_nlp = None
+_nlp_lock = threading.Lock()
 
 
 def ensure_spacy_model(model_name='en_core_web_sm'):
@@ -19,10 +58,9 @@ def ensure_spacy_model(model_name='en_core_web_sm'):
     Parameters:
     - model_name (str): The name of the spaCy model to ensure.
     """
-    try:
-        spacy.load(model_name)
+    if spacy.util.is_package(model_name):
         logging.info(f"spaCy model '{model_name}' is already installed.")
-    except OSError:
+    else:
         logging.warning(f"spaCy model '{model_name}' not found. Installing...")
         st.info(f"spaCy model '{model_name}' not found. Installing...")
         try:
@@ -37,6 +75,35 @@ def ensure_spacy_model(model_name='en_core_web_sm'):
             raise e
 
 
+def get_nlp(model_name=NER_MODEL):
+    """
+    Returns the process-wide spaCy pipeline used to find company names,
+    loading it on first use with only the components NER needs.
+
+    Parameters:
+    - model_name (str): The name of the spaCy model to load.
+
+    Returns:
+    - spacy.language.Language: The shared pipeline.
+    """
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            ensure_spacy_model(model_name)
+            _nlp = spacy.load(model_name, exclude=NER_EXCLUDE)
+            logging.info(f"spaCy model '{model_name}' loaded with components {_nlp.pipe_names}.")
+        return _nlp
+
+
+def warm_up_nlp():
+    """
+    Starts loading the shared spaCy pipeline in a background thread, so that
+    uploads do not wait for the model to load. Safe to call on every rerun.
+    """
+    if _nlp is None and not _nlp_lock.locked():
+        threading.Thread(target=get_nlp, name="spacy-warm-up", daemon=True).start()
+
+
 def sanitize_folder_name(name):
     """
     Sanitizes the folder name by removing or replacing characters not allowed in file system names.
@@ -72,53 +139,132 @@ def get_representative_company_name(names):
     return sorted_names[0][0] if sorted_names else 'Cluster'
 
 
-def organize_files_with_ner(files, output_dir, similarity_threshold=80, nlp=None):
+def extract_company_names(base_names, nlp=None, batch_size=256):
     """
-    Organizes a list of files into directories based on company names extracted using NER.
-    
+    Extracts a company name from each filename.
+
+    Filenames are run through spaCy in batches with ``nlp.pipe``; ORG entities
+    are used when found, otherwise the leading capitalised words.
+
     Parameters:
-    - files (list): List of file paths to organize.
-    - output_dir (str): The directory where organized folders will be created.
-    - similarity_threshold (int): The minimum similarity score to consider company names as similar (0-100).
-    - nlp (spacy.lang): The spaCy language model.
+    - base_names (list): File names without directories.
+    - nlp (spacy.lang): The spaCy language model, or None to use only the fallback.
+    - batch_size (int): Number of names per spaCy batch.
+
+    Returns:
+    - list: One company name per file name.
     """
-    company_names = []
-    base_names = [os.path.basename(f) for f in files]
+    stems = [os.path.splitext(name)[0] for name in base_names]
+    docs = nlp.pipe(stems, batch_size=batch_size) if nlp is not None else [None] * len(stems)
 
-    # Extract company names using NER
-    for name in base_names:
-        # Remove file extension
-        name_without_ext = os.path.splitext(name)[0]
-        doc = nlp(name_without_ext)
-        orgs = [ent.text for ent in doc.ents if ent.label_ == 'ORG']
+    company_names = []
+    for stem, doc in zip(stems, docs):
+        orgs = [ent.text for ent in doc.ents if ent.label_ == 'ORG'] if doc is not None else []
         if orgs:
             company_name = ' '.join(orgs)
         else:
             # Fallback to regex to extract capitalized words at the start
-            match = re.match(r'^((?:[A-Z][\w&]*\s?)+)', name_without_ext)
-            company_name = match.group(
-                1).strip() if match else name_without_ext
+            match = re.match(r'^((?:[A-Z][\w&]*\s?)+)', stem)
+            company_name = match.group(1).strip() if match else stem
         company_names.append(company_name)
+    return company_names
+
+
+def normalize_company_name(name):
+    """
+    Normalizes a company name for comparison: lowercase, with punctuation,
+    years, legal-form words such as "Inc" or "Ltd" and document-type words
+    such as "Annual Report" removed.
+
+    Parameters:
+    - name (str): Company name.
+
+    Returns:
+    - str: Normalized name.
+    """
+    tokens = re.sub(r'[^0-9a-z&]+', ' ', name.lower()).split()
+    kept = [t for t in tokens if t not in COMPANY_STOPWORDS and not re.fullmatch(r'(19|20)\d\d', t)]
+    return ' '.join(kept or tokens)
+
+
+def group_company_names(company_names, similarity_threshold=80):
+    """
+    Groups company names that refer to the same company.
 
-    # Initialize clusters
-    clusters = []
-    clustered = [False] * len(company_names)
+    Names are normalized and deduplicated, blocked on their first
+    ``BLOCK_PREFIX_LENGTH`` characters, and scored within each block with
+    rapidfuzz's vectorised ``cdist``. Pairs scoring at least the threshold are
+    merged with union-find, so the grouping is transitive and independent of
+    input order.
 
-    for i, name_i in enumerate(company_names):
-        if clustered[i]:
+    Parameters:
+    - company_names (list): Company name of each file.
+    - similarity_threshold (int): The minimum similarity score to consider company names as similar (0-100).
+
+    Returns:
+    - list: Clusters as lists of indices into ``company_names``, ordered by
+      their first index.
+    """
+    parent = list(range(len(company_names)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    # Identical normalized names are merged without scoring
+    first_by_name = {}
+    for i, name in enumerate(company_names):
+        normalized = normalize_company_name(name)
+        if normalized in first_by_name:
+            union(first_by_name[normalized], i)
+        else:
+            first_by_name[normalized] = i
+
+    blocks = defaultdict(list)
+    for normalized in first_by_name:
+        blocks[normalized[:BLOCK_PREFIX_LENGTH]].append(normalized)
+
+    for names in blocks.values():
+        if len(names) < 2:
             continue
-        # Start a new cluster
-        cluster = [i]
-        clustered[i] = True
-        for j in range(i + 1, len(company_names)):
-            if clustered[j]:
-                continue
-            # Compute similarity score between company names
-            score = fuzz.token_set_ratio(name_i, company_names[j])
-            if score >= similarity_threshold:
-                cluster.append(j)
-                clustered[j] = True
-        clusters.append(cluster)
+        for start in range(0, len(names), SIMILARITY_BATCH_ROWS):
+            scores = process.cdist(
+                names[start:start + SIMILARITY_BATCH_ROWS],
+                names,
+                scorer=fuzz.token_set_ratio,
+                score_cutoff=similarity_threshold,
+                workers=-1,
+            )
+            for row, col in zip(*scores.nonzero()):
+                if start + row < col:
+                    union(first_by_name[names[start + row]], first_by_name[names[col]])
+
+    clusters = defaultdict(list)
+    for i in range(len(company_names)):
+        clusters[find(i)].append(i)
+    return [clusters[root] for root in sorted(clusters)]
+
+
+def organize_files_with_ner(files, output_dir, similarity_threshold=80, nlp=None):
+    """
+    Organizes a list of files into directories based on company names extracted using NER.
+    
+    Parameters:
+    - files (list): List of file paths to organize.
+    - output_dir (str): The directory where organized folders will be created.
+    - similarity_threshold (int): The minimum similarity score to consider company names as similar (0-100).
+    - nlp (spacy.lang): The spaCy language model.
+    """
+    base_names = [os.path.basename(f) for f in files]
+    company_names = extract_company_names(base_names, nlp=nlp)
+    clusters = group_company_names(company_names, similarity_threshold)
 
     # Create folders and move files
     for idx, cluster in enumerate(clusters):
@@ -144,6 +290,62 @@ def organize_files_with_ner(files, output_dir, similarity_threshold=80, nlp=None
                     src_file)}' to '{company_name}' folder.""")
 
 
+def extract_zip(zip_source, dest_dir, max_member_bytes=None, max_total_bytes=None):
+    """
+    Extracts a ZIP archive member by member, streaming each one to disk.
+
+    The archive is read straight from ``zip_source`` (a path or a seekable
+    file object such as an uploaded file), so no temporary copy of the archive
+    is written. Each member is stored in the content-addressed blob store and
+    hardlinked into ``dest_dir``, so duplicate documents share one copy. Size
+    limits are enforced on the bytes actually decompressed, not just on the
+    sizes declared in the archive, and members that would be written outside
+    ``dest_dir`` are rejected.
+
+    Parameters:
+    - zip_source: Path or file object of the ZIP archive.
+    - dest_dir (str): Directory to extract into.
+    - max_member_bytes (int): Limit for a single member. Defaults to ZIP_MAX_MEMBER_BYTES.
+    - max_total_bytes (int): Limit for the whole archive. Defaults to ZIP_MAX_TOTAL_BYTES.
+
+    Returns:
+    - list: Paths of the extracted files.
+
+    Raises:
+    - ValueError: If a member has an unsafe path or a size limit is exceeded.
+    """
+    max_member_bytes = max_member_bytes or ZIP_MAX_MEMBER_BYTES
+    max_total_bytes = max_total_bytes or ZIP_MAX_TOTAL_BYTES
+    dest_root = os.path.realpath(dest_dir)
+    extracted = []
+    total = 0
+
+    with zipfile.ZipFile(zip_source, 'r') as z:
+        for info in z.infolist():
+            target = os.path.realpath(os.path.join(dest_root, info.filename))
+            if os.path.commonpath([dest_root, target]) != dest_root:
+                raise ValueError(f"Unsafe path in zip file: '{info.filename}'")
+            if info.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            if info.file_size > max_member_bytes:
+                raise ValueError(f"'{info.filename}' exceeds the {max_member_bytes} byte member limit")
+            if total + info.file_size > max_total_bytes:
+                raise ValueError(f"Zip file exceeds the {max_total_bytes} byte total limit")
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with z.open(info) as src:
+                try:
+                    store_upload(src, target, max_bytes=min(max_member_bytes, max_total_bytes - total))
+                except ValueError:
+                    raise ValueError(f"'{info.filename}' exceeds the zip size limits")
+            total += os.path.getsize(target)
+            extracted.append(target)
+
+    logging.info(f"Extracted {len(extracted)} files ({total} bytes) to '{dest_dir}'.")
+    return extracted
+
+
 def handle_zipped_files(uploaded_file):
     """
     Handle uploaded zip file, extracting its contents to the bulk directory.
@@ -156,29 +358,20 @@ def handle_zipped_files(uploaded_file):
     Returns:
     - dict: A dictionary mapping relative directory paths to lists of file paths.
     """
-    temp_zip_path = "temp.zip"
-    temp_extract_dir = "temp_extract_dir"
+    temp_extract_dir = None
 
     try:
-        # Ensure spaCy model is installed
-        ensure_spacy_model('en_core_web_sm')
-
-        # Load spaCy model
-        nlp = spacy.load('en_core_web_sm')
-        logging.info("spaCy model loaded successfully.")
-
-        # Save the uploaded zip file temporarily
-        with open(temp_zip_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        logging.info(f"Temp zip file created at '{temp_zip_path}'.")
-        # st.info("Uploaded zip file saved temporarily.")
-
-        # Extract all contents to a temporary directory
-        with zipfile.ZipFile(temp_zip_path, 'r') as z:
-            z.extractall(temp_extract_dir)
+        # Shared, preloaded spaCy model
+        nlp = get_nlp()
+
+        # Extract straight from the uploaded buffer into a scratch directory
+        # unique to this run, so concurrent uploads cannot collide.
+        os.makedirs(SCRATCH_ROOT, exist_ok=True)
+        temp_extract_dir = tempfile.mkdtemp(prefix="zip_", dir=SCRATCH_ROOT)
+        uploaded_file.seek(0)
+        extract_zip(uploaded_file, temp_extract_dir)
         logging.info(f"""Files extracted to temporary directory '{
                      temp_extract_dir}'.""")
-        # st.info("Files extracted to temporary directory.")
 
         # List all files and directories in the extracted content
         root_files = []
@@ -232,20 +425,19 @@ def handle_zipped_files(uploaded_file):
                 # st.toast(f"Found {len(files)} files in '{relative_dir}'")
                 logging.debug(f"Found {len(files)} files in '{relative_dir}'.")
 
-        # Clean up temporary files and directories
-        try:
-            os.remove(temp_zip_path)
-            logging.info(f"Temporary zip file '{temp_zip_path}' deleted.")
-            shutil.rmtree(temp_extract_dir)
-            logging.info(f"""Temporary extraction directory '{
-                         temp_extract_dir}' deleted.""")
-        except Exception as e:
-            logging.warning(f"Failed to clean up temporary files: {e}")
-            st.warning("Failed to clean up some temporary files.")
-
         return all_subdirectories
 
     except Exception as e:
         logging.error(f"Error handling zip file: {e}")
         st.error(f"Error processing files: {e}")
         return None
+
+    finally:
+        # Clean up the scratch directory
+        if temp_extract_dir:
+            try:
+                shutil.rmtree(temp_extract_dir)
+                logging.info(f"""Temporary extraction directory '{
+                             temp_extract_dir}' deleted.""")
+            except Exception as e:
+                logging.warning(f"Failed to clean up temporary files: {e}")
@@ -0,0 +1,151 @@
+# scripts/batch_stub_server.py
+"""
+Local stand-in for the Message Batches API, for exercising batch mode offline.
+
+Batches report ``in_progress`` for ``--delay`` seconds after submission and
+then end, every request succeeding with a short placeholder report (or
+erroring, for a ``--error-every`` share of them). Run it from the repository
+root and point the app or the SDK at it:
+
+    python scripts/batch_stub_server.py --port 8787 --delay 5
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8787 streamlit run app.py
+"""
+
+import re
+import json
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_PATH = re.compile(r"^/v1/messages/batches/(?P<id>[\w-]+)(?P<results>/results)?$")
+
+_batches = {}
+_lock = threading.Lock()
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _text_length(value):
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_text_length(v) for k, v in value.items() if k in ("text", "content"))
+    if isinstance(value, list):
+        return sum(_text_length(v) for v in value)
+    return 0
+
+
+def _result(custom_id, params, index, error_every):
+    if error_every and (index + 1) % error_every == 0:
+        return {
+            "type": "errored",
+            "error": {"type": "error", "error": {"type": "api_error", "message": "Stand-in error"}},
+        }
+    chars = _text_length(params.get("system", "")) + _text_length(params.get("messages", []))
+    text = f"<h2>Stand-in report</h2>\n<p>Request {custom_id}: {chars} characters of input.</p>\n"
+    return {
+        "type": "succeeded",
+        "message": {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model", "stub"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": chars // 4, "output_tokens": len(text) // 4},
+        },
+    }
+
+
+class BatchHandler(BaseHTTPRequestHandler):
+    delay = 5.0
+    error_every = 0
+
+    def _send_json(self, status, payload, content_type="application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _batch_view(self, batch):
+        ended = time.time() >= batch["ends_at"]
+        results = batch["results"]
+        succeeded = sum(1 for r in results if r["result"]["type"] == "succeeded")
+        base = f"http://{self.headers.get('host', '127.0.0.1')}"
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else len(results),
+                "succeeded": succeeded if ended else 0,
+                "errored": len(results) - succeeded if ended else 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": _timestamp(batch["created_at"]),
+            "expires_at": _timestamp(batch["created_at"] + timedelta(days=1).total_seconds()),
+            "ended_at": _timestamp(batch["ends_at"]) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{base}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/v1/messages/batches":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+        now = time.time()
+        batch = {
+            "id": f"msgbatch_{uuid.uuid4().hex[:24]}",
+            "created_at": now,
+            "ends_at": now + self.delay,
+            "results": [
+                {"custom_id": r["custom_id"], "result": _result(r["custom_id"], r["params"], idx, self.error_every)}
+                for idx, r in enumerate(body["requests"])
+            ],
+        }
+        with _lock:
+            _batches[batch["id"]] = batch
+        self._send_json(200, self._batch_view(batch))
+
+    def do_GET(self):
+        match = BATCH_PATH.match(self.path.split("?")[0])
+        with _lock:
+            batch = _batches.get(match.group("id")) if match else None
+        if batch is None:
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        if match.group("results"):
+            lines = "".join(json.dumps(r) + "\n" for r in batch["results"])
+            self._send_json(200, lines.encode("utf-8"), "application/binary")
+        else:
+            self._send_json(200, self._batch_view(batch))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--delay", type=float, default=5.0, help="Seconds each batch stays in progress")
+    parser.add_argument("--error-every", type=int, default=0, help="Make every Nth request of a batch error")
+    args = parser.parse_args()
+
+    BatchHandler.delay = args.delay
+    BatchHandler.error_every = args.error_every
+    server = ThreadingHTTPServer((args.host, args.port), BatchHandler)
+    print(f"Stand-in batch API listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# tests/test_analysis.py
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import quantiq.analysis as analysis
+import quantiq.batch as batch
+import quantiq.extraction_cache as extraction_cache
+from quantiq.config import RunConfig
+from quantiq.orchestrator import run_company_analyses
+from quantiq.response_cache import request_key
+
+
+def response(request):
+    # The text depends only on the request, so notes and reports are the
+    # same whichever path sent it.
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=f"Notes {request_key(request)[:12]}")])
+
+
+class FakeAsyncClient:
+    def __init__(self, requests):
+        self.requests = requests
+        self.messages = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def create(self, on_text=None, **request):
+        self.requests.append(request)
+        await asyncio.sleep(0)
+        return response(request)
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = []
+
+    def aio(self):
+        return FakeAsyncClient(self.requests)
+
+
+def canonical(requests):
+    return sorted(json.dumps(request, sort_keys=True) for request in requests)
+
+
+@pytest.fixture
+def companies(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache, "CACHE_DIR", str(tmp_path / "extraction"))
+    # Small enough that the largest company goes through map-reduce.
+    monkeypatch.setattr(analysis, "MAP_REDUCE_THRESHOLD_TOKENS", 2000)
+    monkeypatch.setattr(analysis, "MAP_CHUNK_TOKENS", 600)
+    monkeypatch.setattr(batch, "MAP_CHUNK_TOKENS", 600)
+    companies = []
+    for idx, rows in enumerate([20, 60, 900]):
+        path = tmp_path / f"company{idx}.csv"
+        path.write_text("".join(f"2024-01-{row % 28 + 1:02d},{4000 + idx},Invoice {row},{row * 1.5:.2f}\n"
+                                for row in range(rows)))
+        companies.append((f"Company {idx}", [str(path)]))
+    return companies
+
+
+def run(companies, concurrency):
+    client = FakeClient()
+    config = RunConfig(input_dir="", output_dir="", system_prompt="You are an analyst.", concurrency=concurrency)
+    results = run_company_analyses(client, companies, config)
+    return client.requests, results
+
+
+def test_concurrent_analyses_send_the_same_requests_as_sequential_ones(companies):
+    sequential, sequential_results = run(companies, concurrency=1)
+    concurrent, concurrent_results = run(companies, concurrency=3)
+
+    assert sum(request["max_tokens"] == 2048 for request in sequential) > 1
+    assert canonical(concurrent) == canonical(sequential)
+    assert concurrent_results == sequential_results
+
+
+def test_blocking_wrapper_sends_the_same_requests(companies):
+    sequential, results = run(companies, concurrency=1)
+    client = FakeClient()
+
+    reports = [
+        analysis.quantiq_analysis(client, paths, name, "You are an analyst.", False) for name, paths in companies
+    ]
+
+    assert canonical(client.requests) == canonical(sequential)
+    assert reports == [results[name] for name, _ in companies]
+
+
+def test_batches_send_the_same_requests(companies, monkeypatch):
+    sequential, results = run(companies, concurrency=1)
+    sent = []
+
+    def fake_run_batch(client, requests, poll_seconds=None, on_progress=None):
+        sent.extend(requests.values())
+        return {custom_id: response(request) for custom_id, request in requests.items()}
+
+    monkeypatch.setattr(batch, "run_batch", fake_run_batch)
+
+    assert batch.run_batch_analyses(None, companies, "You are an analyst.", False) == results
+    assert canonical(sent) == canonical(sequential)
@@ -0,0 +1,98 @@
+# tests/test_dcf.py
+
+from types import SimpleNamespace
+
+import pytest
+
+import quantiq.dcf as dcf
+import quantiq.extraction_cache as extraction_cache
+from quantiq.config import RunConfig
+from quantiq.progress import Reporter
+
+FINANCIALS = {
+    "currency": "USD",
+    "units": "thousands",
+    "years": ["2023", "2024"],
+    "revenue": [900, 1000],
+    "total_debt": 200,
+    "cash": 50,
+    "total_equity": 800,
+    "shares_outstanding": 100,
+    "shares_units": "thousands",
+}
+ASSUMPTIONS = {
+    "risk_free_rate": 0.04,
+    "equity_risk_premium": 0.06,
+    "beta": 1.0,
+    "pre_tax_cost_of_debt": 0.05,
+    "tax_rate": 0.25,
+    "revenue_growth": [0.03],
+    "ebitda_margin": [0.2],
+    "depreciation_pct_revenue": 0.05,
+    "capex_pct_revenue": 0.05,
+    "working_capital_pct_revenue_change": 0.1,
+    "terminal_growth": 0.02,
+}
+
+
+def tool_call(idx, name, data):
+    block = SimpleNamespace(type="tool_use", id=f"toolu_{idx}", name=name, input=data)
+    return SimpleNamespace(content=[block])
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.messages = self
+
+    def create(self, **request):
+        self.requests.append(request)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    company = tmp_path / "input" / "acme"
+    company.mkdir(parents=True)
+    (company / "ledger.csv").write_text("year,revenue\n2024,1000\n")
+    monkeypatch.setattr(extraction_cache, "CACHE_DIR", str(tmp_path / "extraction"))
+    monkeypatch.setattr(dcf, "html_to_pdf", lambda html, filename, output_dir: None)
+    return RunConfig(input_dir=str(tmp_path / "input"), output_dir=str(tmp_path / "output"))
+
+
+def test_assumptions_recorded_in_step_one_are_refused_and_asked_again(config):
+    client = FakeClient([
+        tool_call(1, "record_assumptions", ASSUMPTIONS),
+        tool_call(2, "record_financials", FINANCIALS),
+        tool_call(3, "record_assumptions", ASSUMPTIONS),
+    ])
+    reporter = Reporter()
+
+    dcf.run_dcf_analysis(client, config, reporter)
+
+    assert not reporter.failures
+    retry = client.requests[1]["messages"]
+    assert [block["name"] for block in retry[1]["content"]] == ["record_assumptions"]
+    assert retry[2]["content"][0] == {
+        "type": "tool_result",
+        "tool_use_id": "toolu_1",
+        "content": "Not recorded: the financial data must be extracted first.",
+        "is_error": True,
+    }
+    # Every turn keeps the same tools and tool_choice, and extends the
+    # previous messages, so the cached prefix still applies.
+    assert len({str(request["tool_choice"]) for request in client.requests}) == 1
+    assert client.requests[2]["messages"][:3] == retry[:3]
+    assert client.requests[2]["messages"][4]["content"][0]["tool_use_id"] == "toolu_2"
+
+
+def test_extraction_fails_once_the_attempts_are_used_up(config):
+    client = FakeClient([tool_call(idx, "record_assumptions", ASSUMPTIONS) for idx in range(2)])
+    reporter = Reporter()
+
+    dcf.run_dcf_analysis(client, config, reporter)
+
+    assert reporter.fatal
+    assert reporter.failures == ["No financial data could be extracted for acme."]
+    assert len(client.requests) == 2
@@ -0,0 +1,143 @@
+# tests/test_dcf_engine.py
+
+import math
+
+import numpy as np
+import pytest
+
+from quantiq.dcf_engine import Assumptions, Financials, run_dcf, simulate_dcf
+
+
+def financials(**overrides):
+    data = {
+        "currency": "USD",
+        "units": "thousands",
+        "years": ["2022", "2023", "2024"],
+        "revenue": [800, 900, 1000],
+        "total_debt": 200,
+        "cash": 50,
+        "total_equity": 800,
+        "shares_outstanding": 100,
+        "shares_units": "thousands",
+    }
+    return Financials.from_tool_input({**data, **overrides})
+
+
+def assumptions(**overrides):
+    data = {
+        "risk_free_rate": 0.04,
+        "equity_risk_premium": 0.06,
+        "beta": 1.0,
+        "pre_tax_cost_of_debt": 0.05,
+        "tax_rate": 0.25,
+        "revenue_growth": [0.0],
+        "ebitda_margin": [0.2],
+        "depreciation_pct_revenue": 0.05,
+        "capex_pct_revenue": 0.05,
+        "working_capital_pct_revenue_change": 0.1,
+        "terminal_growth": 0.02,
+    }
+    return Assumptions.from_tool_input({**data, **overrides})
+
+
+def test_run_dcf_matches_a_hand_valuation():
+    result = run_dcf(financials(), assumptions())
+
+    # Flat revenue of 1,000: EBIT 150, NOPAT 112.5, capex equals D&A and
+    # working capital does not move, so free cash flow is 112.5 a year.
+    wacc = 0.8 * 0.10 + 0.2 * 0.05 * 0.75
+    annuity = sum((1 + wacc) ** -year for year in range(1, 6))
+    terminal_value = 112.5 * 1.02 / (wacc - 0.02)
+    enterprise_value = 112.5 * annuity + terminal_value * (1 + wacc) ** -5
+
+    assert result.wacc["wacc"] == pytest.approx(wacc)
+    assert result.projection["free_cash_flow"] == pytest.approx([112.5] * 5)
+    assert result.terminal["terminal_value"] == pytest.approx(terminal_value)
+    assert result.valuation["enterprise_value"] == pytest.approx(enterprise_value)
+    assert result.valuation["equity_value"] == pytest.approx(enterprise_value - 200 + 50)
+    assert result.valuation["price_per_share"] == pytest.approx((enterprise_value - 150) / 100)
+
+
+def test_sensitivity_grid_contains_the_base_case():
+    result = run_dcf(financials(), assumptions(terminal_growth=0.0237))
+    sensitivity = result.sensitivity
+    row, column = sensitivity["base"]
+
+    assert sensitivity["per_share"]
+    assert sensitivity["wacc"][row] == pytest.approx(result.wacc["wacc"], abs=1e-6)
+    assert sensitivity["growth"][column] == pytest.approx(0.0237, abs=1e-6)
+    assert sensitivity["values"][row][column] == pytest.approx(result.valuation["price_per_share"], rel=1e-4)
+    # Higher WACC or lower growth lowers the value.
+    assert np.all(np.diff(sensitivity["values"], axis=0) < 0)
+    assert np.all(np.diff(sensitivity["values"], axis=1) > 0)
+
+
+def test_sensitivity_is_equity_value_without_a_share_count():
+    result = run_dcf(financials(shares_outstanding=None), assumptions())
+    row, column = result.sensitivity["base"]
+
+    assert not result.sensitivity["per_share"]
+    assert math.isnan(result.valuation["price_per_share"])
+    assert result.sensitivity["values"][row][column] == pytest.approx(result.valuation["equity_value"], rel=1e-4)
+
+
+@pytest.mark.parametrize(
+    "units, shares, shares_units, expected",
+    [
+        ("thousands", 50, "millions", 50_000),
+        ("USD millions", 50_000_000, "units", 50),
+        ("thousands", 50_000, "thousands", 50_000),
+        ("thousands", 50_000, None, 50_000),
+    ],
+)
+def test_shares_are_converted_to_the_units_of_the_amounts(units, shares, shares_units, expected):
+    extracted = financials(units=units, shares_outstanding=shares, shares_units=shares_units)
+
+    assert extracted.balance_sheet["shares_outstanding"] == pytest.approx(expected)
+
+
+def test_run_dcf_needs_revenue():
+    with pytest.raises(ValueError, match="revenue"):
+        run_dcf(financials(revenue=[None, None, None]), assumptions())
+
+
+def test_run_dcf_names_missing_assumptions():
+    with pytest.raises(ValueError, match="beta, terminal_growth"):
+        run_dcf(financials(), assumptions(beta=None, terminal_growth="n/a"))
+
+
+def test_run_dcf_needs_wacc_above_terminal_growth():
+    with pytest.raises(ValueError, match="must exceed the terminal growth rate"):
+        run_dcf(financials(), assumptions(terminal_growth=0.12))
+
+
+def test_simulate_dcf_values_100k_scenarios_well_under_a_second():
+    simulation = simulate_dcf(financials(), assumptions(), scenarios=100_000, seed=1)
+
+    assert simulation.scenarios == 100_000
+    assert simulation.seconds < 1.0
+    assert simulation.invalid == 0
+    assert simulation.values.shape == (100_000,)
+    assert simulation.percentiles[5] < simulation.percentiles[50] < simulation.percentiles[95]
+    base = run_dcf(financials(), assumptions()).valuation["price_per_share"]
+    assert simulation.percentiles[5] < base < simulation.percentiles[95]
+
+
+def test_simulate_dcf_drops_scenarios_with_wacc_at_or_below_terminal_growth():
+    base = run_dcf(financials(), assumptions())
+    distributions = {
+        "revenue_growth": {"distribution": "fixed"},
+        "ebitda_margin": {"distribution": "fixed"},
+        "wacc": {"distribution": "uniform", "low": -0.08, "high": 0.0},
+        "terminal_growth": {"distribution": "fixed"},
+    }
+
+    simulation = simulate_dcf(financials(), assumptions(), scenarios=10_000, distributions=distributions, seed=3)
+
+    # Only the WACC draw consumes random numbers, so it can be replayed.
+    wacc = base.wacc["wacc"] + np.random.default_rng(3).uniform(-0.08, 0.0, 10_000)
+    expected = int((wacc <= 0.02).sum())
+    assert 0 < expected < 10_000
+    assert simulation.invalid == expected
+    assert simulation.values.size == 10_000 - expected
+    assert np.isfinite(simulation.values).all()
@@ -0,0 +1,103 @@
+# tests/test_disk_cache.py
+
+import os
+import time
+
+import pytest
+
+from quantiq.disk_cache import CompressedCache
+from quantiq.response_cache import request_key
+
+REQUEST = {
+    "model": "claude-sonnet-4-6",
+    "system": [{"type": "text", "text": "You are an analyst."}],
+    "max_tokens": 1024,
+    "messages": [{"role": "user", "content": "Summarise the results."}],
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CompressedCache(str(tmp_path / "cache"), max_bytes=10_000_000)
+
+
+def age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_values_and_lists_round_trip(cache):
+    cache.put("value", {"text": "Revenue 120", "pages": [1, 2]})
+    cache.put_list("list", (f"page {idx}\n" for idx in range(3)))
+
+    assert cache.get("value") == {"text": "Revenue 120", "pages": [1, 2]}
+    assert cache.get("list") == ["page 0\n", "page 1\n", "page 2\n"]
+    assert cache.get("missing") is None
+
+
+def test_least_recently_used_entries_are_evicted_first(cache):
+    for key in "abc":
+        cache.put(key, "x" * 1000)
+    for seconds, key in zip((30, 20, 10), "abc"):
+        age(cache.path(key), seconds)
+    # Reading "a" makes it the most recently used entry.
+    assert cache.get("a") is not None
+
+    cache.evict(max_bytes=os.path.getsize(cache.path("a")) * 2)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_put_enforces_the_size_bound(tmp_path):
+    cache = CompressedCache(str(tmp_path / "cache"), max_bytes=1)
+
+    cache.put("a", "first")
+
+    assert os.listdir(cache.directory) == []
+
+
+def test_entries_expire_from_when_they_were_stored(cache):
+    cache.ttl_seconds = 0.2
+    cache.put("key", "value")
+    time.sleep(0.1)
+    assert cache.get("key") == "value"
+
+    # Reads refresh the modification time but not the age of the entry.
+    time.sleep(0.15)
+    assert cache.get("key") is None
+    assert not os.path.exists(cache.path("key"))
+
+
+def test_eviction_drops_expired_entries_within_the_size_bound(cache):
+    cache.ttl_seconds = 60
+    cache.put("old", "value")
+    cache.put("new", "value")
+    age(cache.path("old"), 120)
+
+    cache.evict()
+
+    assert not os.path.exists(cache.path("old"))
+    assert os.path.exists(cache.path("new"))
+
+
+@pytest.mark.parametrize("content", [b"not zlib", b"x\x9c\x03\x00\x00\x00\x00\x01", b""])
+def test_corrupt_entries_are_discarded(cache, content):
+    cache.put("key", "value")
+    with open(cache.path("key"), "wb") as f:
+        f.write(content)
+
+    assert cache.get("key") is None
+    assert not os.path.exists(cache.path("key"))
+
+
+def test_request_key_covers_what_changes_the_response():
+    key = request_key(REQUEST)
+
+    assert key == request_key({**REQUEST, "metadata": {"user_id": "someone"}, "stream": True})
+    assert key == request_key(dict(reversed(list(REQUEST.items()))))
+    assert key != request_key({**REQUEST, "max_tokens": 2048})
+    assert key != request_key({**REQUEST, "model": "claude-haiku-4-5"})
+    assert key != request_key({**REQUEST, "system": "You are an auditor."})
+    assert key != request_key({**REQUEST, "tools": [{"name": "record_financials"}]})
+    assert key != request_key({**REQUEST, "messages": [{"role": "user", "content": "Summarise the risks."}]})
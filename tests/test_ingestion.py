@@ -0,0 +1,104 @@
+# tests/test_ingestion.py
+
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+import docx
+import pytest
+
+import quantiq.extraction_cache as extraction_cache
+import quantiq.file_handler as file_handler
+from quantiq.file_handler import (
+    INGEST_CHUNK_CHARS,
+    ingest_files,
+    iter_ingest,
+    profile_ingestion,
+    read_docx,
+)
+
+# Peak traced memory while ingesting, as a multiple of the extracted text.
+# The chunks and the joined text are both alive at the end, so 2x is the floor.
+PEAK_MEMORY_RATIO = 2.25
+
+
+@pytest.fixture(autouse=True)
+def extraction_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache, "CACHE_DIR", str(tmp_path / "extraction"))
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    path = tmp_path / "ledger.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "account", "description", "debit", "credit"])
+        for i in range(100000):
+            writer.writerow([f"2024-01-{i % 28 + 1:02d}", 4000 + i % 50, f"Invoice {i}", f"{i * 1.5:.2f}", ""])
+    return str(path)
+
+
+def test_profile_ingestion_peak_memory_is_bounded(ledger):
+    result = profile_ingestion([ledger])
+
+    assert result["chars"] > 4_000_000
+    assert result["peak_bytes"] < PEAK_MEMORY_RATIO * result["chars"]
+
+
+def test_csv_is_streamed_in_row_chunks(ledger):
+    chunks = list(iter_ingest([ledger], max_workers=1))
+
+    assert len(chunks) > 1
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    assert max(len(chunk) for chunk in chunks[:-1]) < INGEST_CHUNK_CHARS + 100
+    with open(ledger, newline="") as f:
+        assert "".join(chunks) == "".join(",".join(row) + "\n" for row in csv.reader(f))
+
+
+def test_docx_chunks_match_read_docx(tmp_path):
+    path = str(tmp_path / "report.docx")
+    document = docx.Document()
+    document.add_paragraph("Annual report")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text, table.cell(0, 1).text = "Revenue", "2024"
+    table.cell(1, 0).text, table.cell(1, 1).text = "120", "(45)"
+    document.add_paragraph("Notes follow.")
+    document.save(path)
+
+    text = "".join(iter_ingest([path], max_workers=1))
+
+    assert text == read_docx(path)
+    assert text.startswith("Annual report\n[Table 1]\n")
+    assert "(45)" in text and text.endswith("Notes follow.\n")
+
+
+@pytest.fixture
+def shared_pool(monkeypatch):
+    # A pool of four workers regardless of the machine, torn down afterwards.
+    monkeypatch.setattr(file_handler, "INGEST_WORKERS", 4)
+    monkeypatch.setattr(file_handler, "_pool", None)
+    # Every call extracts, so each one goes through the shared pool.
+    monkeypatch.setattr(file_handler, "get_cached_chunks", lambda digest, version: None)
+    yield
+    if file_handler._pool is not None:
+        file_handler._pool.shutdown(wait=True)
+
+
+def test_concurrent_ingestion_shares_one_pool(tmp_path, shared_pool):
+    company_files = []
+    for company in range(6):
+        paths = []
+        for idx in range(company + 1):
+            path = tmp_path / f"company{company}_{idx}.csv"
+            path.write_text("".join(f"{company},{idx},{row}\n" for row in range(200)))
+            paths.append(str(path))
+        company_files.append(paths)
+    expected = ["".join(open(path).read() for path in paths) for paths in company_files]
+
+    def ingest(company):
+        return [ingest_files(company_files[company], max_workers=8) for _ in range(10)]
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(ingest, range(6)))
+
+    for company, texts in enumerate(results):
+        assert texts == [expected[company]] * 10
@@ -0,0 +1,79 @@
+# tests/test_jobs.py
+
+import queue as queue_module
+import sqlite3
+import threading
+
+import pytest
+
+import quantiq.jobs as jobs
+from quantiq.config import RunConfig
+
+API_KEY = "sk-ant-REDACTED"
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DB", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(jobs, "JOBS_DIR", str(tmp_path / "jobs"))
+    input_dir = tmp_path / "input"
+    (input_dir / "acme").mkdir(parents=True)
+    (input_dir / "acme" / "report.txt").write_text("Revenue 120")
+    return RunConfig(input_dir=str(input_dir), output_dir=str(tmp_path / "output"))
+
+
+def test_session_key_is_handed_over_and_never_stored(queue, tmp_path, monkeypatch):
+    handed_over = {}
+    monkeypatch.setattr(jobs, "_hand_over_key", lambda job_id, key: handed_over.setdefault(job_id, key) == key)
+
+    job_id = jobs.submit_job(queue, api_key=API_KEY)
+
+    assert handed_over == {job_id: API_KEY}
+    assert jobs.get_job(job_id)["session_key"] == 1
+    assert jobs.claim_job("external:1") is None
+    assert jobs.claim_job("local:1", session_keys=True)["id"] == job_id
+    for path in tmp_path.glob("jobs.db*"):
+        assert API_KEY.encode() not in path.read_bytes()
+
+
+def test_without_local_workers_the_job_uses_the_workers_key(queue):
+    job_id = jobs.submit_job(queue, api_key=API_KEY)
+
+    assert jobs.get_job(job_id)["session_key"] == 0
+    assert jobs.claim_job("external:1")["id"] == job_id
+
+
+def test_keys_stored_by_older_queues_are_erased(queue):
+    conn = sqlite3.connect(jobs.JOBS_DB)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, mode TEXT NOT NULL, config TEXT NOT NULL, status TEXT NOT NULL, "
+        "progress REAL NOT NULL DEFAULT 0, status_message TEXT NOT NULL DEFAULT '', "
+        "live_label TEXT NOT NULL DEFAULT '', live_text TEXT NOT NULL DEFAULT '', error TEXT, worker TEXT, "
+        "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+        "heartbeat_at REAL, api_key TEXT)"
+    )
+    conn.execute(
+        "INSERT INTO jobs (id, mode, config, status, created_at, api_key) VALUES ('old', 'Standard', '{}', 'queued', 0, ?)",
+        (API_KEY,),
+    )
+    conn.commit()
+    conn.close()
+
+    job = jobs.get_job("old")
+
+    assert job.get("api_key") is None
+    assert job["session_key"] == 0
+    assert API_KEY.encode() not in open(jobs.JOBS_DB, "rb").read()
+
+
+def test_worker_waits_briefly_for_a_key_in_transit(monkeypatch):
+    monkeypatch.setattr(jobs, "_KEY_WAIT_SECONDS", 0.2)
+    key_queue = queue_module.Queue()
+    key_queue.put({"job_id": "a", "api_key": "key-a"})
+    session_keys = {}
+
+    assert jobs._receive_session_keys(key_queue, session_keys) is None
+    assert session_keys == {"a": "key-a"}
+    threading.Timer(0.05, key_queue.put, args=({"job_id": "b", "api_key": "key-b"},)).start()
+    assert jobs._receive_session_keys(key_queue, session_keys, "b") == "key-b"
+    assert jobs._receive_session_keys(key_queue, session_keys, "lost") is None
@@ -0,0 +1,258 @@
+# tests/test_llm.py
+
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+import anthropic
+import httpx
+import pytest
+from anthropic.types import Message, TextBlock, Usage
+
+import quantiq.llm as llm
+import quantiq.response_cache as response_cache
+from quantiq.llm import AdaptiveConcurrency, LLMClient, RateLimiter, TokenBucket
+
+REQUEST = {
+    "model": "claude-sonnet-4-6",
+    "max_tokens": 256,
+    "messages": [{"role": "user", "content": "Summarise the results."}],
+}
+
+
+class FakeClock:
+    """Stands in for the ``time`` module, so waits take no real time."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000.0 + self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeStream:
+    def __init__(self, deltas, message):
+        self.text_stream = iter(deltas)
+        self.message = message
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def get_final_message(self):
+        return self.message
+
+
+class FakeSDK:
+    """Plays one outcome per call: an exception to raise, a stream, or the text to stream."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.messages = self
+
+    def stream(self, **request):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if isinstance(outcome, FakeStream):
+            return outcome
+        return FakeStream(outcome, message(outcome))
+
+
+def message(deltas):
+    return Message(
+        id="msg_1",
+        type="message",
+        role="assistant",
+        model=REQUEST["model"],
+        content=[TextBlock(type="text", text="".join(deltas))],
+        stop_reason="end_turn",
+        stop_sequence=None,
+        usage=Usage(input_tokens=10, output_tokens=5),
+    )
+
+
+def status_error(status, headers=None, cls=anthropic.APIStatusError):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls(f"status {status}", response=response, body=None)
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    clock = FakeClock()
+    monkeypatch.setattr(llm, "time", clock)
+    monkeypatch.setattr(response_cache, "CACHE_DIR", str(tmp_path / "responses"))
+    return clock
+
+
+def client_for(outcomes):
+    client = LLMClient(api_key="test-key", limiter=RateLimiter(), use_cache=False)
+    client.sdk = FakeSDK(outcomes)
+    return client
+
+
+def test_token_bucket_waits_for_refill_and_lets_oversized_requests_through(clock):
+    bucket = TokenBucket(60)
+
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.sleep(1.0)
+    assert bucket.reserve(1) == 0
+    clock.sleep(60.0)
+    # Larger than the bucket: admitted when full, then the debt is repaid.
+    assert bucket.reserve(90) == 0
+    assert bucket.reserve(1) == pytest.approx(31.0)
+
+
+def test_adaptive_concurrency_grows_on_success_and_halves_on_throttle(clock):
+    concurrency = AdaptiveConcurrency(initial=4, maximum=5)
+
+    for _ in range(4):
+        assert concurrency.try_enter()
+    assert not concurrency.try_enter()
+    for _ in range(4):
+        concurrency.exit("success")
+    assert concurrency.limit == pytest.approx(5.0, abs=0.1)
+    concurrency.enter()
+    concurrency.exit("throttled")
+    assert int(concurrency.limit) == 2
+    concurrency.enter()
+    concurrency.exit("error")
+    assert int(concurrency.limit) == 2
+    for _ in range(3):
+        concurrency.enter()
+        concurrency.exit("throttled")
+    assert concurrency.limit == 1
+    assert concurrency.in_flight == 0
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"retry-after-ms": "1500"}, 1.5),
+        ({"retry-after": "7"}, 7.0),
+        ({"retry-after": format_datetime(datetime.fromtimestamp(1_700_001_030, timezone.utc), usegmt=True)}, 30.0),
+        ({}, None),
+        ({"retry-after": "soon"}, None),
+    ],
+)
+def test_retry_after_reads_both_headers_and_http_dates(clock, headers, expected):
+    retry_after = llm._retry_after(status_error(429, headers, anthropic.RateLimitError))
+
+    assert retry_after == (None if expected is None else pytest.approx(expected, abs=1.0))
+
+
+def test_429_retry_after_is_honoured(clock):
+    client = client_for([status_error(429, {"retry-after": "20"}, anthropic.RateLimitError), ["Revenue ", "rose."]])
+
+    response = client.messages.create(**REQUEST)
+
+    assert llm.response_text(response) == "Revenue rose."
+    assert client.sdk.calls == 2
+    assert sum(clock.sleeps) >= 20
+    # The pause applies to every call sharing the limiter, not just this one.
+    assert client.limiter.resume_at >= 1000.0 + 20
+    assert int(client.limiter.concurrency.limit) == 2
+    assert client.limiter.concurrency.in_flight == 0
+
+
+def test_529_is_throttled_and_halves_the_limit(clock):
+    client = client_for([status_error(529), status_error(529), ["Done."]])
+
+    response = client.messages.create(**REQUEST)
+
+    assert llm.response_text(response) == "Done."
+    assert client.sdk.calls == 3
+    # Halved twice from 4 to 1, then raised by 1 / 1 for the success.
+    assert client.limiter.concurrency.limit == pytest.approx(2.0)
+
+
+def test_non_retryable_errors_are_raised_at_once(clock):
+    client = client_for([status_error(400, cls=anthropic.BadRequestError), ["unused"]])
+
+    with pytest.raises(anthropic.BadRequestError):
+        client.messages.create(**REQUEST)
+
+    assert client.sdk.calls == 1
+    assert clock.sleeps == []
+    assert int(client.limiter.concurrency.limit) == llm.INITIAL_CONCURRENCY
+    assert client.limiter.concurrency.in_flight == 0
+
+
+def test_retries_stop_after_max_retries(clock, monkeypatch):
+    monkeypatch.setattr(llm, "MAX_RETRIES", 2)
+    client = client_for([status_error(500, cls=anthropic.InternalServerError)] * 3)
+
+    with pytest.raises(anthropic.InternalServerError):
+        client.messages.create(**REQUEST)
+
+    assert client.sdk.calls == 3
+    assert client.limiter.concurrency.in_flight == 0
+
+
+@pytest.mark.parametrize("interrupt", [KeyboardInterrupt(), SystemExit(1), GeneratorExit()])
+def test_slot_is_released_on_base_exceptions(clock, interrupt):
+    client = client_for([interrupt])
+
+    with pytest.raises(type(interrupt)):
+        client.messages.create(**REQUEST)
+
+    assert client.limiter.concurrency.in_flight == 0
+
+
+DELTAS = ["Revenue ", "rose 12% to €1.2bn", "; margins — ", "steady", " 📈", "\n\n| Year | 2024 |\n"]
+
+
+def test_streamed_text_matches_the_final_message_byte_for_byte(clock, monkeypatch):
+    monkeypatch.setattr(llm, "_STREAM_REFRESH_SECONDS", 0)
+    received = []
+    client = client_for([DELTAS, DELTAS])
+
+    streamed = client.messages.create(**REQUEST, on_text=lambda text, done: received.append((text, done)))
+    plain = client.messages.create(**REQUEST)
+
+    final_text, done = received[-1]
+    assert done
+    assert final_text.encode("utf-8") == "".join(DELTAS).encode("utf-8")
+    assert final_text.encode("utf-8") == llm.response_text(plain).encode("utf-8")
+    assert llm.response_text(streamed) == llm.response_text(plain)
+    partials = [text for text, done in received[:-1]]
+    assert partials == ["".join(DELTAS[:idx]) for idx in range(1, len(DELTAS) + 1)]
+
+
+def test_deltas_are_joined_only_when_the_callback_is_due(clock):
+    received = []
+    deltas = [f"token{idx} " for idx in range(5000)]
+    client = client_for([deltas])
+
+    client.messages.create(**REQUEST, on_text=lambda text, done: received.append((text, done)))
+
+    # The fake clock stands still, so only the first delta is shown before the end.
+    assert received == [(deltas[0], False), ("".join(deltas), True)]
+
+
+def test_a_retried_stream_starts_from_scratch(clock, monkeypatch):
+    monkeypatch.setattr(llm, "_STREAM_REFRESH_SECONDS", 0)
+
+    def overloaded_midway():
+        yield "partial answer"
+        raise status_error(529)
+
+    received = []
+    client = client_for([FakeStream(overloaded_midway(), None), ["Final ", "answer."]])
+
+    client.messages.create(**REQUEST, on_text=lambda text, done: received.append(text))
+
+    assert received == ["partial answer", "Final ", "Final answer.", "Final answer."]
@@ -0,0 +1,55 @@
+# tests/test_manifest.py
+
+import pytest
+
+import quantiq.file_handler as file_handler
+from quantiq.manifest import company_fingerprint
+
+PROMPT = "You are an analyst."
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    paths = []
+    for name, content in [("ledger.csv", "2024,4000,120\n"), ("report.pdf", "%PDF-1.4\n"), ("notes.xlsx", "PK")]:
+        path = tmp_path / name
+        path.write_text(content)
+        paths.append(str(path))
+    return paths
+
+
+def test_fingerprint_is_stable_and_ignores_input_order(inputs):
+    assert company_fingerprint(inputs, PROMPT, False) == company_fingerprint(inputs[::-1], PROMPT, False)
+
+
+def test_fingerprint_changes_with_the_content_and_settings(inputs):
+    before = company_fingerprint(inputs, PROMPT, False)
+
+    assert company_fingerprint(inputs, PROMPT, True) != before
+    assert company_fingerprint(inputs, "You are an auditor.", False) != before
+    with open(inputs[0], "a") as f:
+        f.write("2024,4001,95\n")
+    assert company_fingerprint(inputs, PROMPT, False) != before
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("EXTRACTOR_VERSIONS", {**file_handler.EXTRACTOR_VERSIONS, ".pdf": 99}),
+        ("EXTRACTOR_VERSIONS", {**file_handler.EXTRACTOR_VERSIONS, ".csv": 99}),
+        ("XLSX_MAX_ROWS_PER_SHEET", file_handler.XLSX_MAX_ROWS_PER_SHEET + 1),
+        ("CSV_SUMMARY_THRESHOLD_BYTES", file_handler.CSV_SUMMARY_THRESHOLD_BYTES + 1),
+    ],
+)
+def test_fingerprint_changes_with_the_extractors(inputs, monkeypatch, name, value):
+    before = company_fingerprint(inputs, PROMPT, False)
+    monkeypatch.setattr(file_handler, name, value)
+
+    assert company_fingerprint(inputs, PROMPT, False) != before
+
+
+def test_extractors_of_other_file_types_do_not_matter(inputs, monkeypatch):
+    before = company_fingerprint(inputs, PROMPT, False)
+    monkeypatch.setattr(file_handler, "EXTRACTOR_VERSIONS", {**file_handler.EXTRACTOR_VERSIONS, ".docx": 99})
+
+    assert company_fingerprint(inputs, PROMPT, False) == before
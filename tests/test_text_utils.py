@@ -0,0 +1,66 @@
+# tests/test_text_utils.py
+
+from quantiq.text_utils import normalise_pages
+
+
+BODIES = [
+    "Income statement\nRevenue 2024\n1,250\nCost of sales\n(700)",
+    "Balance sheet\nTotal assets\n4,100\nTotal equity\n2,030",
+    "Cash flow statement\nNet change in cash\n(56)\nCapital expenditure\n(310)",
+    "Notes\nShares outstanding\n1,200\nDividend per share\n0.45",
+    "Segment results\nAmericas\n640\nEurope\n410",
+]
+
+
+def with_edges(header, footer, bodies=BODIES):
+    return [f"{header(idx)}\n{body}\n{footer(idx)}\n" for idx, body in enumerate(bodies)]
+
+
+def test_lone_figures_at_page_edges_are_kept():
+    pages = ["Cash flow statement\nNet change in cash\n(56)\n", "Balance sheet\nTotal equity\n2023\n"]
+
+    assert normalise_pages(pages) == pages
+
+
+def test_rising_page_numbers_and_repeated_lines_are_removed():
+    pages = with_edges(lambda idx: "ACME Corp Annual Report 2023", lambda idx: f"Confidential\n{idx + 3}")
+
+    assert normalise_pages(pages) == [body + "\n" for body in BODIES]
+
+
+def test_page_numbers_may_skip_pages_without_text():
+    numbers = [1, 2, 5, 6, 9]
+    pages = with_edges(lambda idx: "Annual report", lambda idx: str(numbers[idx]))
+
+    assert normalise_pages(pages) == [body + "\n" for body in BODIES]
+
+
+def test_lone_numbers_that_do_not_rise_are_kept():
+    pages = with_edges(lambda idx: "Annual report", lambda idx: "(120)")
+
+    assert normalise_pages(pages) == [body + "\n(120)\n" for body in BODIES]
+
+
+def test_page_of_total_footers_are_removed():
+    pages = with_edges(lambda idx: "Annual report", lambda idx: f"Page {idx + 1} of 5")
+
+    assert normalise_pages(pages) == [body + "\n" for body in BODIES]
+
+
+def test_headers_with_a_page_number_are_removed_but_years_are_not():
+    pages = with_edges(lambda idx: f"ACME Annual Report {idx + 10}", lambda idx: "Confidential")
+
+    assert normalise_pages(pages) == [body + "\n" for body in BODIES]
+    assert "Revenue 2024" in normalise_pages(pages)[0]
+
+
+def test_whitespace_is_collapsed_and_blank_runs_shortened():
+    pages = ["Revenue\t\t 120\xa0000\n\n\n\nNet income   45\n\n"]
+
+    assert normalise_pages(pages) == ["Revenue 120 000\n\nNet income 45\n"]
+
+
+def test_pages_left_empty_are_dropped():
+    pages = [f"Disclaimer\n{idx + 1}\n" for idx in range(3)] + ["Disclaimer\nBalance sheet\n4\n"]
+
+    assert normalise_pages(pages) == ["Balance sheet\n"]
@@ -0,0 +1,57 @@
+# tests/test_zip_manager.py
+
+import os
+import random
+import sys
+
+from rapidfuzz import fuzz
+
+from quantiq.zip_manager import extract_company_names, group_company_names, normalize_company_name
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_grouping import purity, synthetic_filenames  # noqa: E402
+
+
+def similarity(a, b):
+    return fuzz.token_set_ratio(normalize_company_name(a), normalize_company_name(b))
+
+
+def as_name_sets(clusters, names):
+    return {frozenset(names[i] for i in cluster) for cluster in clusters}
+
+
+def test_grouping_is_transitive():
+    names = ["Northwind Traders", "Northwind Energy Partners", "Northwind Holdings"]
+    # The two long names only match through the bare "Northwind".
+    assert similarity(names[0], names[1]) < 80
+    assert similarity(names[0], names[2]) >= 80 and similarity(names[1], names[2]) >= 80
+
+    assert group_company_names(names) == [[0, 1, 2]]
+
+
+def test_names_are_only_compared_within_their_prefix_block():
+    names = ["Zenith Acme Ltd", "Acme Zenith", "ZENITH ACME Annual Report 2023"]
+    assert similarity(names[0], names[1]) == 100
+
+    assert group_company_names(names) == [[0, 2], [1]]
+
+
+def test_grouping_does_not_depend_on_input_order():
+    filenames, _ = synthetic_filenames(500, seed=4)
+    names = extract_company_names(filenames)
+    shuffled = names[:]
+    random.Random(1).shuffle(shuffled)
+
+    assert as_name_sets(group_company_names(shuffled), shuffled) == as_name_sets(group_company_names(names), names)
+
+
+def test_synthetic_filenames_are_grouped_by_company():
+    filenames, labels = synthetic_filenames(1000)
+
+    clusters = group_company_names(extract_company_names(filenames))
+
+    assert purity(clusters, labels) >= 0.99
+    assert abs(len(clusters) - len(set(labels))) <= 2
+    assert sorted(i for cluster in clusters for i in cluster) == list(range(1000))
+    assert [cluster[0] for cluster in clusters] == sorted(cluster[0] for cluster in clusters)